@@ -1,21 +1,77 @@
-from fastapi import FastAPI, Form, UploadFile, File, Query
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, Form, UploadFile, File, Query, Header, Request, HTTPException
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager, asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future, as_completed
+from functools import lru_cache, partial
+import argparse
+import asyncio
+import csv
+import hashlib
+import io
+import logging
+import mimetypes
+import queue
+import re
+import statistics
+import unicodedata
+import multiprocessing
+import shutil
+import signal
+import socket
+import sqlite3
+import string
+import subprocess
+import sys
+import tempfile
+import threading
 import time
 import uuid
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
-from weasyprint import HTML, CSS
+from starlette.background import BackgroundTask
+from weasyprint import HTML, CSS, default_url_fetcher
 from weasyprint.text.fonts import FontConfiguration
+from PIL import Image, ImageOps
 import os
 import psycopg2
-from urllib.parse import urlparse
+import psycopg2.errors
+import psycopg2.pool
+
+try:
+    import psycopg
+    import psycopg_pool
+except ImportError:         # the async request path then falls back to psycopg2 on the threadpool
+    psycopg = psycopg_pool = None
+
+try:
+    import pikepdf
+except ImportError:         # PDFs are then served as WeasyPrint writes them (not linearized)
+    pikepdf = None
+
+try:
+    import xlsxwriter
+except ImportError:         # only needed for /admin/export.xlsx
+    xlsxwriter = None
+
+try:
+    import boto3
+    import botocore.exceptions
+    from boto3.s3.transfer import TransferConfig
+except ImportError:         # only needed for STORAGE_URL=s3://…
+    boto3 = None
+from urllib.parse import urlparse, urlencode
 
 app = FastAPI()
 
+log = logging.getLogger("jyotish")
+
+IST = ZoneInfo("Asia/Kolkata")      # business timezone; timestamps are stored in UTC and shown in IST
+
 UPLOAD_DIR = "uploads"
 REPORT_DIR = "reports"
 
@@ -26,9 +82,7 @@ if not os.path.exists(REPORT_DIR):
 if not os.path.exists(UPLOAD_DIR):
     os.makedirs(UPLOAD_DIR)
 
-# ---- THEN MOUNT ----
-app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
-app.mount("/reports", StaticFiles(directory=REPORT_DIR), name="reports")
+# /uploads and /reports are served from object storage, see OBJECT STORAGE below
 
 app.add_middleware(
     CORSMiddleware,
@@ -38,130 +92,2241 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ---------- DATABASE SETUP ----------
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS clients (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        client_code TEXT,
-        name TEXT,
-        phone TEXT,              -- ✅ ADD THIS
-        dob TEXT,
-        tob TEXT,
-        place TEXT,
-        plan TEXT,
-        questions TEXT,
-        images TEXT,
-        source TEXT,
-        status TEXT,
-        payment_status TEXT DEFAULT 'Pending',  -- ✅ ADD THIS
-        payment_date TEXT,
-        payment_ref TEXT,
-        ai_draft TEXT,
-        created_at TEXT
-    )
-    """)
-    conn.commit()
-    conn.close()
+# ---------- DATABASE BACKENDS ----------
+# DATABASE_URL picks the engine: postgres://… for production, sqlite:///path.db for laptops / CI.
+# All queries are written once with "?" placeholders; each backend adapts them to its driver.
 
-init_db()
+DATABASE_URL = os.environ.get("DATABASE_URL", "")
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))          # seconds to wait for a free slot
+DB_POOL_HEALTHCHECK_IDLE = float(os.environ.get("DB_POOL_HEALTHCHECK_IDLE", "30"))  # ping conns idle longer than this
 
-def ensure_client_code_column():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    try:
-        c.execute("ALTER TABLE clients ADD COLUMN client_code TEXT")
-        conn.commit()
-    except:
-        pass
-    conn.close()
 
-ensure_client_code_column()
+class PoolTimeout(Exception):
+    pass
 
-def ensure_phone_and_payment_columns():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    try:
-        c.execute("ALTER TABLE clients ADD COLUMN phone TEXT")
-    except:
-        pass
-    try:
-        c.execute("ALTER TABLE clients ADD COLUMN payment_status TEXT DEFAULT 'Unpaid'")
-    except:
-        pass
-    try:
-        c.execute("ALTER TABLE clients ADD COLUMN payment_date TEXT")
-    except:
-        pass
+
+@lru_cache(maxsize=512)
+def qmark_to_pyformat(sql):
+    # "?" -> "%s" for psycopg2; literal "%" (LIKE, pg_trgm's % operator) must be doubled first
+    return sql.replace("%", "%%").replace("?", "%s")
+
+
+class QmarkCursor(psycopg2.extensions.cursor):
+
+    def execute(self, query, vars=None):
+        if vars is not None:
+            query = qmark_to_pyformat(query)
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        return super().executemany(qmark_to_pyformat(query), vars_list)
+
+
+class DBPool:
+
+    def __init__(self, database_url, minconn, maxconn, timeout, healthcheck_idle):
+        result = urlparse(database_url)
+
+        self._pool = psycopg2.pool.ThreadedConnectionPool(
+            minconn,
+            maxconn,
+            database=result.path[1:],
+            user=result.username,
+            password=result.password,
+            host=result.hostname,
+            port=result.port,
+            sslmode=os.environ.get("DB_SSLMODE", "require"),
+            cursor_factory=QmarkCursor
+        )
+
+        # ThreadedConnectionPool raises when exhausted, the semaphore makes callers wait instead
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._returned_at = {}
+
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.checkouts = 0
+        self.waited_checkouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.timeouts = 0
+        self.health_failures = 0
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+
+        idle_since = self._returned_at.get(id(conn))
+        if idle_since is not None and time.monotonic() - idle_since < self.healthcheck_idle:
+            return True
+
+        try:
+            with conn.cursor() as c:
+                c.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        start = time.monotonic()
+
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise PoolTimeout(f"no database connection free after {self.timeout}s")
+
+        waited = time.monotonic() - start
+
+        try:
+            # stale idle connections are dropped and replaced, at most one pass over the pool
+            for _ in range(self.maxconn + 1):
+                conn = self._pool.getconn()
+                if self._is_healthy(conn):
+                    break
+                with self._lock:
+                    self.health_failures += 1
+                self._returned_at.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+            else:
+                raise psycopg2.OperationalError("could not get a healthy database connection")
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            if waited > 0.001:
+                self.waited_checkouts += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+        return conn
+
+    def putconn(self, conn):
+        close = bool(conn.closed)
+
+        if not close:
+            try:
+                # never hand the next caller a half-finished transaction
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                close = True
+
+        if close:
+            self._returned_at.pop(id(conn), None)
+        else:
+            self._returned_at[id(conn)] = time.monotonic()
+
+        self._pool.putconn(conn, close=close)
+
+        with self._lock:
+            self.in_use -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "idle": len(self._pool._pool),
+                "checkouts": self.checkouts,
+                "waited_checkouts": self.waited_checkouts,
+                "wait_time_total_ms": round(self.wait_time_total * 1000, 2),
+                "wait_time_avg_ms": round(self.wait_time_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_time_max_ms": round(self.wait_time_max * 1000, 2),
+                "timeouts": self.timeouts,
+                "health_failures": self.health_failures,
+            }
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+class PostgresDatabase:
+
+    dialect = "postgres"
+
+    def __init__(self, database_url):
+        self.database_url = database_url
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def pool(self):
+        # a forked child (worker process) must not reuse the parent's sockets
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    self._pool = DBPool(self.database_url, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_HEALTHCHECK_IDLE)
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    @contextmanager
+    def connection(self):
+        pool = self.pool()
+        conn = pool.getconn()
+        try:
+            yield conn
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn)
+
+    def stream_connection(self):
+        # pooled connections are not tied to a thread; the stream gives this one back on the thread that used it
+        return self.connection()
+
+    def stats(self):
+        return {"backend": self.dialect, **self.pool().stats()}
+
+    def close(self):
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.closeall()
+
+
+# -------- SQLITE (WAL) --------
+SQLITE_TS_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+IST_TEXT_FORMAT = "%Y-%m-%d %H:%M:%S"           # what the app used to store as TEXT; reports still print it
+IST_DISPLAY_FORMAT = "%d-%m-%Y %I:%M %p"        # dashboard column
+SQLITE_FOR_UPDATE_RE = re.compile(r"\s+FOR\s+UPDATE(\s+SKIP\s+LOCKED)?", re.IGNORECASE)
+
+
+def sqlite_timestamp(value):
+    # one fixed-width UTC text format, so timestamps compare correctly as strings
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime(SQLITE_TS_FORMAT)[:-3] + "+00:00"
+
+
+def sqlite_now():
+    return sqlite_timestamp(datetime.now(timezone.utc))
+
+
+def sqlite_ist_format(fmt, value):
+    # SQLite twin of the Postgres ist_text() / ist_display() SQL functions (migration 5)
+    if not value:
+        return None
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(IST).strftime(fmt)
+
+
+def sqlite_phone_norm(phone):
+    # only the pre-migration-12 generated column calls this; kept so older databases can still be migrated
+    return re.sub(r"\D", "", phone or "")[-10:]
+
+
+@lru_cache(maxsize=512)
+def sqlite_sql(sql):
+    # the whole database is one write lock in SQLite, so row-lock clauses are simply dropped
+    return SQLITE_FOR_UPDATE_RE.sub("", sql)
+
+
+sqlite3.register_adapter(datetime, sqlite_timestamp)
+
+
+class SQLiteCursor:
+
+    itersize = 2000     # accepted for parity with psycopg2 named cursors; SQLite steps rows lazily anyway
+
+    def __init__(self, raw):
+        self._c = raw
+
+    def execute(self, sql, params=()):
+        self._c.execute(sqlite_sql(sql), params)
+        return self
+
+    def executemany(self, sql, params_list):
+        self._c.executemany(sqlite_sql(sql), params_list)
+        return self
+
+    def fetchone(self):
+        return self._c.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._c.fetchmany(size or self.itersize)
+
+    def fetchall(self):
+        return self._c.fetchall()
+
+    def __iter__(self):
+        return iter(self._c)
+
+    @property
+    def rowcount(self):
+        return self._c.rowcount
+
+    @property
+    def description(self):
+        return self._c.description
+
+    def close(self):
+        self._c.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SQLiteConnection:
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.closed = False
+
+    def cursor(self, name=None):
+        return SQLiteCursor(self.raw.cursor())
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        self.raw.close()
+        self.closed = True
+
+
+class SQLiteDatabase:
+
+    dialect = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        raw = sqlite3.connect(self.path, timeout=30, check_same_thread=False, cached_statements=512)
+        raw.execute("PRAGMA journal_mode=WAL")          # readers never block the writer
+        raw.execute("PRAGMA synchronous=NORMAL")
+        raw.execute("PRAGMA busy_timeout=30000")
+        raw.create_function("now", 0, sqlite_now)
+        raw.create_function("phone_norm", 1, sqlite_phone_norm, deterministic=True)
+        raw.create_function("ist_text", 1, partial(sqlite_ist_format, IST_TEXT_FORMAT), deterministic=True)
+        raw.create_function("ist_display", 1, partial(sqlite_ist_format, IST_DISPLAY_FORMAT), deterministic=True)
+        return SQLiteConnection(raw)
+
+    @contextmanager
+    def connection(self):
+        # one connection per thread (and per process after fork); SQLite connections are cheap to keep
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+
+        try:
+            yield conn
+        finally:
+            conn.rollback()
+
+    @contextmanager
+    def stream_connection(self):
+        # a connection of its own, so a long read never shares (or rolls back) a request thread's connection
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def stats(self):
+        return {"backend": self.dialect, "path": self.path}
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_database = None
+_database_lock = threading.Lock()
+
+
+def get_database():
+    global _database
+
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                if DATABASE_URL.startswith("sqlite:///"):
+                    # sqlite:///relative.db or sqlite:////absolute/path.db
+                    _database = SQLiteDatabase(DATABASE_URL[len("sqlite:///"):])
+                else:
+                    _database = PostgresDatabase(DATABASE_URL)
+
+    return _database
+
+
+def db_conn():
+    return get_database().connection()
+
+
+@app.on_event("shutdown")
+def close_database():
+    if _database is not None:
+        _database.close()
+
+
+# -------- ASYNC PATH (psycopg 3) --------
+# The hot endpoints await Postgres on the event loop instead of holding a threadpool thread per request.
+# SQLite, ASYNC_DB=0 or a missing psycopg 3 keep the same endpoints on the sync repository via the threadpool.
+
+ASYNC_DB = os.environ.get("ASYNC_DB", "1") != "0"
+
+
+def async_db_enabled():
+    return ASYNC_DB and psycopg_pool is not None and not DATABASE_URL.startswith("sqlite:///")
+
+
+if psycopg is not None:
+
+    class AsyncQmarkCursor(psycopg.AsyncCursor):
+
+        async def execute(self, query, params=None, **kwargs):
+            if params is not None:
+                query = qmark_to_pyformat(query)
+            return await super().execute(query, params, **kwargs)
+
+
+class AsyncPostgresDatabase:
+
+    dialect = "postgres"
+
+    def __init__(self, database_url):
+        self.database_url = database_url
+        self._pool = None
+        self._pool_key = None
+        self._opened = None
+
+    async def pool(self):
+        # bound to the process and the event loop that opened it
+        key = (os.getpid(), id(asyncio.get_running_loop()))
+        if self._pool_key != key:
+            self._pool = psycopg_pool.AsyncConnectionPool(
+                self.database_url,
+                min_size=DB_POOL_MIN,
+                max_size=DB_POOL_MAX,
+                timeout=DB_POOL_TIMEOUT,
+                kwargs={"sslmode": os.environ.get("DB_SSLMODE", "require"), "cursor_factory": AsyncQmarkCursor},
+                open=False,
+            )
+            self._pool_key = key
+            self._opened = asyncio.ensure_future(self._pool.open())
+        pool, opened = self._pool, self._opened
+        try:
+            # shielded: one cancelled request must not cancel the open the others are waiting on
+            await asyncio.shield(opened)
+        except Exception:
+            # e.g. the database isn't reachable yet at boot – forget this pool so the next call retries
+            if self._opened is opened:
+                self._pool_key = None
+                self._opened = None
+                self._pool = None
+            raise
+        return pool
+
+    @asynccontextmanager
+    async def connection(self):
+        pool = await self.pool()
+        try:
+            conn = await pool.getconn()
+        except psycopg_pool.PoolTimeout:
+            raise PoolTimeout(f"no database connection free after {DB_POOL_TIMEOUT}s")
+
+        try:
+            yield conn
+        finally:
+            # never hand the next caller a half-finished transaction
+            try:
+                if conn.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+                    await conn.rollback()
+            except psycopg.Error:
+                pass
+            await pool.putconn(conn)
+
+    def stats(self):
+        if self._pool is None:
+            return {}
+        return self._pool.get_stats()
+
+    async def close(self):
+        if self._pool is not None and self._pool_key[0] == os.getpid():
+            await self._pool.close()
+            self._pool = self._pool_key = None
+
+
+_async_database = None
+
+
+def get_async_database():
+    global _async_database
+    if _async_database is None:
+        _async_database = AsyncPostgresDatabase(DATABASE_URL)
+    return _async_database
+
+
+def adb_conn():
+    return get_async_database().connection()
+
+
+@app.on_event("shutdown")
+async def close_async_database():
+    if _async_database is not None:
+        await _async_database.close()
+
+# ---------- OBJECT STORAGE ----------
+# Uploads and reports are stored under keys "uploads/…" and "reports/…". STORAGE_URL picks where:
+# empty = the local folders (single instance), s3://bucket[/prefix] = any S3-compatible store (AWS, MinIO, moto_server),
+# which lets several instances share files. S3 downloads are redirects to presigned URLs; files a process needs locally
+# (photos for thumbnails) are fetched once into a size-bounded read-through cache.
+
+STORAGE_URL = os.environ.get("STORAGE_URL", "")
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL") or None                 # unset = AWS
+STORAGE_CACHE_DIR = os.environ.get("STORAGE_CACHE_DIR", "storage-cache")
+STORAGE_CACHE_MAX_BYTES = int(os.environ.get("STORAGE_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+STORAGE_URL_TTL = int(os.environ.get("STORAGE_URL_TTL", "3600"))            # presigned URL lifetime, seconds
+STORAGE_PART_SIZE = int(os.environ.get("STORAGE_PART_SIZE", str(8 * 1024 * 1024)))   # multipart upload part size
+
+
+def upload_key(name):
+    return f"{UPLOAD_DIR}/{name}"
+
+
+def report_key(client_code):
+    return f"{REPORT_DIR}/{client_code}.pdf"
+
+
+def _remove_file(path):
     try:
-        c.execute("ALTER TABLE clients ADD COLUMN payment_ref TEXT")
-    except:
+        os.remove(path)
+    except FileNotFoundError:
         pass
-    conn.commit()
-    conn.close()
-
-ensure_phone_and_payment_columns()
-
-# ---------- PAYMENT & PRIORITY COLUMNS ----------
-def ensure_payment_columns():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
-    columns = [
-        "phone TEXT",
-        "payment_status TEXT DEFAULT 'Pending'",
-        "payment_date TEXT",
-        "payment_ref TEXT",
-        "priority INTEGER DEFAULT 99",
-        "ai_generated INTEGER DEFAULT 0"
+
+
+class LocalStorage:
+
+    backend = "local"
+
+    def __init__(self, root="."):
+        self.root = root
+
+    def local_path(self, key):
+        return os.path.join(self.root, key)
+
+    def exists(self, key):
+        return os.path.exists(self.local_path(key))
+
+    def get_file(self, key):
+        path = self.local_path(key)
+        if not os.path.exists(path):
+            raise FileNotFoundError(key)
+        return path
+
+    def read_text(self, key):
+        with open(self.local_path(key)) as f:
+            return f.read()
+
+    def put_file(self, key, path):
+        # publishes a finished local file; it may be moved into place
+        dest = self.local_path(key)
+        if os.path.abspath(path) != os.path.abspath(dest):
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            os.replace(path, dest)
+
+    def put_text(self, key, text):
+        dest = self.local_path(key)
+        tmp_path = f"{dest}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, dest)
+
+    def put_stream(self, key, fileobj):
+        # written under a private name and renamed into place: concurrent writers of one key can't interleave
+        dest = self.local_path(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp_path = f"{dest}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                shutil.copyfileobj(fileobj, f, STORAGE_PART_SIZE)
+            os.replace(tmp_path, dest)
+        except BaseException:
+            _remove_file(tmp_path)
+            raise
+
+    def delete(self, key):
+        _remove_file(self.local_path(key))
+
+    def list(self, prefix):
+        for root, _, files in os.walk(self.local_path(prefix)):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, self.root).replace(os.sep, "/"), os.path.getmtime(path)
+
+    def response(self, key, download_name=None):
+        return FileResponse(self.local_path(key), filename=download_name)
+
+
+class S3Storage:
+
+    backend = "s3"
+
+    def __init__(self, bucket, prefix="", endpoint_url=None, cache_dir=STORAGE_CACHE_DIR):
+        if boto3 is None:
+            raise RuntimeError("STORAGE_URL is s3://… but boto3 is not installed (pip install boto3)")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.endpoint_url = endpoint_url
+        self.cache_dir = cache_dir
+        self.transfer = TransferConfig(multipart_threshold=STORAGE_PART_SIZE, multipart_chunksize=STORAGE_PART_SIZE)
+        self._client = None
+        self._client_pid = None
+        self._known = set()         # report keys seen to exist; reports are overwritten but never deleted
+        self._next_prune = 0
+
+    def client(self):
+        # boto3 clients are not fork-safe: one per process, credentials from the usual AWS_* variables
+        if self._client is None or self._client_pid != os.getpid():
+            self._client = boto3.client("s3", endpoint_url=self.endpoint_url)
+            self._client_pid = os.getpid()
+        return self._client
+
+    def _extra(self, key):
+        content_type = mimetypes.guess_type(key)[0]
+        return {"ContentType": content_type} if content_type else {}
+
+    def local_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _remember(self, key):
+        # never upload keys: `blobs gc` deletes them from another process, so a cached "exists" could go stale
+        if key.startswith(UPLOAD_DIR + "/"):
+            return
+        if len(self._known) > 100_000:
+            self._known.clear()
+        self._known.add(key)
+
+    def exists(self, key):
+        if key in self._known:
+            return True
+        try:
+            self.client().head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return False
+            raise
+        self._remember(key)
+        return True
+
+    def get_file(self, key):
+        path = self.local_path(key)
+        if os.path.exists(path):
+            os.utime(path)          # recently used, pruned last
+            return path
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            self.client().download_file(self.bucket, self.prefix + key, tmp_path, Config=self.transfer)
+        except botocore.exceptions.ClientError as e:
+            _remove_file(tmp_path)
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                raise FileNotFoundError(key) from e
+            raise
+        os.replace(tmp_path, path)
+        self._prune_cache()
+        return path
+
+    def read_text(self, key):
+        try:
+            body = self.client().get_object(Bucket=self.bucket, Key=self.prefix + key)["Body"]
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                raise FileNotFoundError(key) from e
+            raise
+        return body.read().decode()
+
+    def put_file(self, key, path):
+        self.client().upload_file(path, self.bucket, self.prefix + key, ExtraArgs=self._extra(key), Config=self.transfer)
+        self._remember(key)
+
+    def put_text(self, key, text):
+        self.client().put_object(Bucket=self.bucket, Key=self.prefix + key, Body=text.encode())
+        self._remember(key)
+
+    def put_stream(self, key, fileobj):
+        # multipart upload straight from the request's spooled file, no local copy
+        self.client().upload_fileobj(fileobj, self.bucket, self.prefix + key,
+                                     ExtraArgs=self._extra(key), Config=self.transfer)
+        self._remember(key)
+
+    def delete(self, key):
+        self.client().delete_object(Bucket=self.bucket, Key=self.prefix + key)
+        self._known.discard(key)
+        _remove_file(self.local_path(key))
+
+    def list(self, prefix):
+        pages = self.client().get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=self.prefix + prefix)
+        for page in pages:
+            for obj in page.get("Contents", []):
+                yield obj["Key"][len(self.prefix):], obj["LastModified"].timestamp()
+
+    def url(self, key, download_name=None):
+        params = {"Bucket": self.bucket, "Key": self.prefix + key}
+        if download_name:
+            params["ResponseContentDisposition"] = f'attachment; filename="{download_name}"'
+        return self.client().generate_presigned_url("get_object", Params=params, ExpiresIn=STORAGE_URL_TTL)
+
+    def response(self, key, download_name=None):
+        return RedirectResponse(self.url(key, download_name), status_code=302)
+
+    def _prune_cache(self):
+        # at most once a minute: drop least recently used files until the cache is back under 80% of its budget
+        if time.monotonic() < self._next_prune:
+            return
+        self._next_prune = time.monotonic() + 60
+
+        files = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        if total <= STORAGE_CACHE_MAX_BYTES:
+            return
+        for _, size, path in sorted(files):
+            _remove_file(path)
+            total -= size
+            if total <= STORAGE_CACHE_MAX_BYTES * 0.8:
+                break
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    global _storage
+
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                if STORAGE_URL.startswith("s3://"):
+                    bucket, _, prefix = STORAGE_URL[len("s3://"):].partition("/")
+                    _storage = S3Storage(bucket, prefix, S3_ENDPOINT_URL)
+                else:
+                    _storage = LocalStorage()
+
+    return _storage
+
+
+def stored_keys(keys):
+    storage = get_storage()
+    return {key for key in keys if storage.exists(key)}
+
+
+def _storage_response(key, download_name=None):
+    storage = get_storage()
+    if not storage.exists(key):
+        raise HTTPException(404)
+    return storage.response(key, download_name)
+
+
+@app.get("/uploads/{name:path}")
+def serve_upload(name: str):
+    if os.path.isabs(name) or ".." in name.split("/"):
+        raise HTTPException(404)
+    return _storage_response(upload_key(name))
+
+
+@app.get("/reports/{client_code}.pdf")
+def serve_report(client_code: str):
+    # the stable link sent on WhatsApp; presigned S3 URLs expire, so they are minted per click
+    return _storage_response(report_key(client_code))
+
+# ---------- SCHEMA MIGRATIONS ----------
+# Applied by `python main.py migrate` as a deploy step. Append new versions, never edit applied ones.
+# Each version carries the statements for both engines: {"postgres": [...], "sqlite": [...]}.
+# Postgres version 1 is written with IF NOT EXISTS so it also adopts databases created by the old import-time setup.
+
+SEARCH_INDEX_SQL = [
+    "CREATE INDEX IF NOT EXISTS clients_name_trgm_idx ON clients USING gin (lower(name) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS clients_code_trgm_idx ON clients USING gin (upper(client_code) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS clients_phone_norm_idx ON clients (phone_norm text_pattern_ops)",
+]
+
+SQLITE_PHONE_NORM_CHARS = 32     # the trailing characters scanned for digits; the number is the last 10 of them
+
+
+def sqlite_phone_norm_sql(column):
+    # built-in functions only, so the sqlite3 CLI, backups and DB browsers can write the table too.
+    # Same value as the Postgres column: every non-digit dropped (SQLite has no regexp_replace), last 10 digits.
+    value = f"coalesce({column}, '')"
+    digits = " || ".join(
+        f"CASE WHEN substr({value}, -{i}, 1) GLOB '[0-9]' THEN substr({value}, -{i}, 1) ELSE '' END"
+        for i in range(SQLITE_PHONE_NORM_CHARS, 0, -1)
+    )
+    return f"substr({digits}, -10)"
+
+
+SQLITE_PHONE_NORM_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS clients_phone_norm_insert AFTER INSERT ON clients
+    BEGIN
+        UPDATE clients SET phone_norm = {sqlite_phone_norm_sql('NEW.phone')} WHERE id = NEW.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS clients_phone_norm_update AFTER UPDATE OF phone ON clients
+    BEGIN
+        UPDATE clients SET phone_norm = {sqlite_phone_norm_sql('NEW.phone')} WHERE id = NEW.id;
+    END
+    """,
+]
+
+SQLITE_PHONE_NORM_SQL = [
+    "ALTER TABLE clients ADD COLUMN phone_norm TEXT",
+    f"UPDATE clients SET phone_norm = {sqlite_phone_norm_sql('phone')}",
+    *SQLITE_PHONE_NORM_TRIGGERS,
+    "CREATE INDEX IF NOT EXISTS clients_phone_norm_idx ON clients (phone_norm)",
+]
+
+CLIENT_TABLE_COLUMNS = """
+    client_code TEXT,
+    name TEXT,
+    phone TEXT,
+    dob TEXT,
+    tob TEXT,
+    place TEXT,
+    plan TEXT,
+    questions TEXT,
+    images TEXT,
+    source TEXT,
+    status TEXT,
+    payment_status TEXT DEFAULT 'Pending',
+    payment_date TEXT,
+    payment_ref TEXT,
+    ai_draft TEXT,
+    created_at TEXT,
+    priority INTEGER DEFAULT 99,
+    ai_generated INTEGER DEFAULT 0
+"""
+
+PLAN_TABLE_COLUMNS = """
+    id INTEGER PRIMARY KEY,
+    code TEXT NOT NULL UNIQUE,
+    label TEXT NOT NULL,
+    price INTEGER NOT NULL,
+    priority INTEGER NOT NULL,
+    depth_text TEXT NOT NULL,
+    year_limit INTEGER NOT NULL
+"""
+
+# the four plans the site has always sold; ids are stable and referenced by clients.plan_id
+PLAN_SEED_SQL = """
+INSERT INTO plans (id, code, label, price, priority, depth_text, year_limit) VALUES
+    (1, 'basic',    '₹51 – बेसिक प्लान',      51,  4, 'संक्षिप्त एवं स्पष्ट मार्गदर्शन',          1),
+    (2, 'advance',  '₹151 – एडवांस प्लान',    151, 3, 'विस्तृत व्यावहारिक विश्लेषण',             2),
+    (3, 'pro',      '₹251 – प्रो प्लान',       251, 2, 'गहन जीवन दिशा एवं भाग्य विश्लेषण',        4),
+    (4, 'ultimate', '₹501 – अल्टीमेट प्लान',   501, 1, 'अत्यंत गहन कर्मिक एवं आध्यात्मिक विश्लेषण', 7)
+ON CONFLICT (id) DO NOTHING
+"""
+
+# same precedence as the old "501" in plan / "251" in plan / "151" in plan checks
+PLAN_BACKFILL_SQL = """
+UPDATE clients SET plan_id = CASE
+    WHEN plan LIKE '%501%' THEN 4
+    WHEN plan LIKE '%251%' THEN 3
+    WHEN plan LIKE '%151%' THEN 2
+    ELSE 1
+END
+WHERE plan_id IS NULL
+"""
+
+# the old time-based codes were AVV-{year}-{0..99999}; sequence numbers start above that range
+CLIENT_CODE_START = 100_000
+CLIENT_CODE_BLOCK = 100         # codes reserved per database round trip; baked into the sequence increment
+
+# same-second submissions used to share a code: keep the first, suffix the rest with their id
+CLIENT_CODE_DEDUPE_SQL = """
+UPDATE clients SET client_code = client_code || '-' || id
+WHERE client_code IS NOT NULL
+  AND id NOT IN (SELECT MIN(id) FROM clients WHERE client_code IS NOT NULL GROUP BY client_code)
+"""
+
+# dashboard summary: client_stats holds one count per (dimension, value), daily_revenue one row per IST day.
+# Triggers keep both current inside the transaction that changed clients; reconcile_rollups() recounts them.
+ROLLUP_DIMENSIONS = (("status", "status"), ("payment_status", "payment_status"), ("plan", "plan_id"), ("source", "source"))
+ROLLUP_DAY_SQL = {
+    "postgres": "({row}payment_date AT TIME ZONE 'Asia/Kolkata')::date",
+    "sqlite": "date({row}payment_date, '+330 minutes')",
+}
+ROLLUP_PRICE_SQL = "coalesce((SELECT price FROM plans WHERE plans.id = {row}plan_id), 0)"
+
+
+def rollup_delta_sql(sources, dialect):
+    # sources: (FROM clause, row prefix, +1 / -1); a Postgres transition table or a SQLite OLD / NEW row
+    stats = "\n            UNION ALL ".join(
+        f"SELECT '{dimension}' AS dimension, coalesce(CAST({row}{column} AS TEXT), '') AS value, {sign} AS delta "
+        f"{source}"
+        for source, row, sign in sources for dimension, column in ROLLUP_DIMENSIONS
+    )
+    revenue = "\n            UNION ALL ".join(
+        f"SELECT {ROLLUP_DAY_SQL[dialect].format(row=row)} AS day, {sign} AS delta, "
+        f"{sign} * {ROLLUP_PRICE_SQL.format(row=row)} AS amount {source} "
+        f"WHERE {row}payment_status = 'Paid' AND {row}payment_date IS NOT NULL"
+        for source, row, sign in sources
+    )
+    # net deltas in key order: concurrent writers lock the counter rows in the same order (no deadlocks)
+    return f"""
+        INSERT INTO client_stats (dimension, value, total)
+        SELECT dimension, value, sum(delta) FROM (
+            {stats}
+        ) d WHERE true
+        GROUP BY dimension, value HAVING sum(delta) <> 0
+        ORDER BY dimension, value
+        ON CONFLICT (dimension, value) DO UPDATE SET total = client_stats.total + excluded.total;
+
+        INSERT INTO daily_revenue (day, payments, revenue)
+        SELECT day, sum(delta), sum(amount) FROM (
+            {revenue}
+        ) d WHERE true
+        GROUP BY day HAVING sum(delta) <> 0 OR sum(amount) <> 0
+        ORDER BY day
+        ON CONFLICT (day) DO UPDATE SET payments = daily_revenue.payments + excluded.payments,
+                                        revenue = daily_revenue.revenue + excluded.revenue;
+    """
+
+
+def rollup_recount_sql(dialect):
+    stats = " UNION ALL ".join(
+        f"SELECT '{dimension}', coalesce(CAST({column} AS TEXT), ''), count(*) FROM clients "
+        f"GROUP BY coalesce(CAST({column} AS TEXT), '')"
+        for dimension, column in ROLLUP_DIMENSIONS
+    )
+    day = ROLLUP_DAY_SQL[dialect].format(row="")
+    revenue = f"""
+        SELECT {day}, count(*), sum({ROLLUP_PRICE_SQL.format(row="clients.")}) FROM clients
+        WHERE payment_status = 'Paid' AND payment_date IS NOT NULL
+        GROUP BY {day}
+    """
+    return stats, revenue
+
+
+def rollup_migration(dialect):
+    stats_sql, revenue_sql = rollup_recount_sql(dialect)
+    statements = [
+        """
+        CREATE TABLE IF NOT EXISTS client_stats (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, value)
+        )
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS daily_revenue (
+            day {"DATE" if dialect == "postgres" else "TEXT"} PRIMARY KEY,
+            payments INTEGER NOT NULL DEFAULT 0,
+            revenue {"BIGINT" if dialect == "postgres" else "INTEGER"} NOT NULL DEFAULT 0
+        )
+        """,
     ]
 
-    for col in columns:
+    if dialect == "postgres":
+        # statement-level: a bulk mark-paid touches each counter row once, not once per client
+        for op, refs, sources in (
+            ("insert", "NEW TABLE AS new_rows", [("FROM new_rows r", "r.", 1)]),
+            ("update", "OLD TABLE AS old_rows NEW TABLE AS new_rows",
+             [("FROM old_rows r", "r.", -1), ("FROM new_rows r", "r.", 1)]),
+            ("delete", "OLD TABLE AS old_rows", [("FROM old_rows r", "r.", -1)]),
+        ):
+            statements += [
+                f"""
+                CREATE OR REPLACE FUNCTION clients_rollup_{op}() RETURNS trigger LANGUAGE plpgsql AS $$
+                BEGIN
+                    {rollup_delta_sql(sources, dialect)}
+                    RETURN NULL;
+                END
+                $$
+                """,
+                f"DROP TRIGGER IF EXISTS clients_rollup_{op} ON clients",
+                f"""
+                CREATE TRIGGER clients_rollup_{op} AFTER {op.upper()} ON clients
+                REFERENCING {refs} FOR EACH STATEMENT EXECUTE FUNCTION clients_rollup_{op}()
+                """,
+            ]
+    else:
+        changed = " OR ".join(
+            f"OLD.{column} IS NOT NEW.{column}" for column in ("status", "payment_status", "plan_id", "source", "payment_date")
+        )
+        for op, when, sources in (
+            ("insert", "", [("", "NEW.", 1)]),
+            ("update", f"WHEN {changed}", [("", "OLD.", -1), ("", "NEW.", 1)]),
+            ("delete", "", [("", "OLD.", -1)]),
+        ):
+            statements.append(f"""
+                CREATE TRIGGER IF NOT EXISTS clients_rollup_{op} AFTER {op.upper()} ON clients {when}
+                BEGIN
+                    {rollup_delta_sql(sources, dialect)}
+                END
+            """)
+
+    statements += [
+        f"INSERT INTO client_stats (dimension, value, total) {stats_sql}",
+        f"INSERT INTO daily_revenue (day, payments, revenue) {revenue_sql}",
+    ]
+    return statements
+
+
+# paid, AI draft written, not reviewed yet; the partial index (migration 11) holds only these rows
+REVIEW_QUEUE_WHERE = "payment_status = 'Paid' AND status = 'Pending' AND ai_generated = 1"
+
+
+MIGRATIONS = [
+    (1, "clients table", {
+        "postgres": [
+            f"CREATE TABLE IF NOT EXISTS clients (id SERIAL PRIMARY KEY, {CLIENT_TABLE_COLUMNS})",
+            "ALTER TABLE clients ADD COLUMN IF NOT EXISTS client_code TEXT",
+            "ALTER TABLE clients ADD COLUMN IF NOT EXISTS phone TEXT",
+            "ALTER TABLE clients ADD COLUMN IF NOT EXISTS payment_status TEXT DEFAULT 'Pending'",
+            "ALTER TABLE clients ADD COLUMN IF NOT EXISTS payment_date TEXT",
+            "ALTER TABLE clients ADD COLUMN IF NOT EXISTS payment_ref TEXT",
+            "ALTER TABLE clients ADD COLUMN IF NOT EXISTS priority INTEGER DEFAULT 99",
+            "ALTER TABLE clients ADD COLUMN IF NOT EXISTS ai_generated INTEGER DEFAULT 0",
+        ],
+        "sqlite": [
+            f"CREATE TABLE IF NOT EXISTS clients (id INTEGER PRIMARY KEY AUTOINCREMENT, {CLIENT_TABLE_COLUMNS})",
+        ],
+    }),
+    (2, "dashboard keyset index", {
+        # matches the dashboard ORDER BY so each page is a short index range scan
+        "postgres": ["CREATE INDEX IF NOT EXISTS clients_priority_id_idx ON clients (priority ASC, id DESC)"],
+        "sqlite": ["CREATE INDEX IF NOT EXISTS clients_priority_id_idx ON clients (priority ASC, id DESC)"],
+    }),
+    (3, "background jobs", {
+        "postgres": [
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id BIGSERIAL PRIMARY KEY,
+                kind TEXT NOT NULL,
+                client_id INTEGER NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued',     -- queued / running / done / dead
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 5,
+                run_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                locked_at TIMESTAMPTZ,
+                locked_by TEXT,
+                last_error TEXT,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                finished_at TIMESTAMPTZ
+            )
+            """,
+            # at most one live job per (kind, client) – repeated payments collapse into it
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_uniq
+            ON jobs (kind, client_id) WHERE state IN ('queued', 'running')
+            """,
+            "CREATE INDEX IF NOT EXISTS jobs_ready_idx ON jobs (run_at, id) WHERE state = 'queued'",
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                client_id INTEGER NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 5,
+                run_at TEXT NOT NULL DEFAULT (now()),
+                locked_at TEXT,
+                locked_by TEXT,
+                last_error TEXT,
+                created_at TEXT NOT NULL DEFAULT (now()),
+                finished_at TEXT
+            )
+            """,
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_uniq
+            ON jobs (kind, client_id) WHERE state IN ('queued', 'running')
+            """,
+            "CREATE INDEX IF NOT EXISTS jobs_ready_idx ON jobs (run_at, id) WHERE state = 'queued'",
+        ],
+    }),
+    (4, "client search", {
+        "postgres": [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            # last 10 digits = the mobile number without +91 / 0 / spaces / dashes
+            """
+            ALTER TABLE clients ADD COLUMN IF NOT EXISTS phone_norm TEXT
+            GENERATED ALWAYS AS (right(regexp_replace(coalesce(phone, ''), '[^0-9]', '', 'g'), 10)) STORED
+            """,
+            *SEARCH_INDEX_SQL,
+        ],
+        "sqlite": [
+            # phone_norm() is registered on every SQLite connection (see SQLiteDatabase); replaced in version 12
+            "ALTER TABLE clients ADD COLUMN phone_norm TEXT GENERATED ALWAYS AS (phone_norm(phone)) VIRTUAL",
+            "CREATE INDEX IF NOT EXISTS clients_phone_norm_idx ON clients (phone_norm)",
+        ],
+    }),
+    (5, "timestamp columns", {
+        "postgres": [
+            # the old TEXT values were IST wall-clock times
+            """
+            ALTER TABLE clients
+                ALTER COLUMN created_at TYPE TIMESTAMPTZ
+                    USING NULLIF(created_at, '')::timestamp AT TIME ZONE 'Asia/Kolkata',
+                ALTER COLUMN payment_date TYPE TIMESTAMPTZ
+                    USING NULLIF(payment_date, '')::timestamp AT TIME ZONE 'Asia/Kolkata',
+                ALTER COLUMN created_at SET DEFAULT now()
+            """,
+            "CREATE INDEX IF NOT EXISTS clients_created_at_idx ON clients (created_at)",
+            """
+            CREATE OR REPLACE FUNCTION ist_text(ts TIMESTAMPTZ) RETURNS TEXT
+            LANGUAGE sql STABLE AS $$ SELECT to_char(ts AT TIME ZONE 'Asia/Kolkata', 'YYYY-MM-DD HH24:MI:SS') $$
+            """,
+            """
+            CREATE OR REPLACE FUNCTION ist_display(ts TIMESTAMPTZ) RETURNS TEXT
+            LANGUAGE sql STABLE AS $$ SELECT to_char(ts AT TIME ZONE 'Asia/Kolkata', 'DD-MM-YYYY HH12:MI AM') $$
+            """,
+        ],
+        "sqlite": [
+            # no column types to change: rewrite to the fixed-width UTC text that sqlite_timestamp() writes,
+            # which sorts chronologically, so the index serves range filters
+            """
+            UPDATE clients
+            SET created_at = strftime('%Y-%m-%d %H:%M:%f', created_at, '-5 hours', '-30 minutes') || '+00:00'
+            WHERE created_at <> '' AND created_at NOT LIKE '%+00:00'
+            """,
+            """
+            UPDATE clients
+            SET payment_date = strftime('%Y-%m-%d %H:%M:%f', payment_date, '-5 hours', '-30 minutes') || '+00:00'
+            WHERE payment_date <> '' AND payment_date NOT LIKE '%+00:00'
+            """,
+            "UPDATE clients SET created_at = NULL WHERE created_at = ''",
+            "UPDATE clients SET payment_date = NULL WHERE payment_date = ''",
+            "CREATE INDEX IF NOT EXISTS clients_created_at_idx ON clients (created_at)",
+        ],
+    }),
+    (6, "plan catalog", {
+        "postgres": [
+            f"CREATE TABLE IF NOT EXISTS plans ({PLAN_TABLE_COLUMNS})",
+            PLAN_SEED_SQL,
+            "ALTER TABLE clients ADD COLUMN IF NOT EXISTS plan_id INTEGER REFERENCES plans (id)",
+            PLAN_BACKFILL_SQL,
+            "CREATE INDEX IF NOT EXISTS clients_plan_id_idx ON clients (plan_id)",
+        ],
+        "sqlite": [
+            f"CREATE TABLE IF NOT EXISTS plans ({PLAN_TABLE_COLUMNS})",
+            PLAN_SEED_SQL,
+            "ALTER TABLE clients ADD COLUMN plan_id INTEGER REFERENCES plans (id)",
+            PLAN_BACKFILL_SQL,
+            "CREATE INDEX IF NOT EXISTS clients_plan_id_idx ON clients (plan_id)",
+        ],
+    }),
+    (7, "client code allocator", {
+        "postgres": [
+            # one nextval() reserves a whole block of codes for the calling process
+            f"""
+            CREATE SEQUENCE IF NOT EXISTS client_code_seq
+            START WITH {CLIENT_CODE_START} INCREMENT BY {CLIENT_CODE_BLOCK}
+            """,
+            CLIENT_CODE_DEDUPE_SQL,
+            "CREATE UNIQUE INDEX IF NOT EXISTS clients_client_code_uniq ON clients (client_code)",
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS client_code_counter (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                next_value INTEGER NOT NULL
+            )
+            """,
+            f"INSERT INTO client_code_counter (id, next_value) VALUES (1, {CLIENT_CODE_START}) ON CONFLICT (id) DO NOTHING",
+            CLIENT_CODE_DEDUPE_SQL,
+            "CREATE UNIQUE INDEX IF NOT EXISTS clients_client_code_uniq ON clients (client_code)",
+        ],
+    }),
+    (8, "idempotency keys", {
+        "postgres": [
+            """
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                key TEXT PRIMARY KEY,
+                client_id INTEGER NOT NULL,
+                client_code TEXT NOT NULL,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idempotency_keys_created_at_idx ON idempotency_keys (created_at)",
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                key TEXT PRIMARY KEY,
+                client_id INTEGER NOT NULL,
+                client_code TEXT NOT NULL,
+                created_at TEXT NOT NULL DEFAULT (now())
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idempotency_keys_created_at_idx ON idempotency_keys (created_at)",
+        ],
+    }),
+    (9, "content-addressed uploads", {
+        "postgres": [
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                size BIGINT NOT NULL,
+                refcount INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS client_images (
+                client_id INTEGER NOT NULL REFERENCES clients (id),
+                position INTEGER NOT NULL,
+                sha256 TEXT NOT NULL REFERENCES blobs (sha256),
+                filename TEXT,
+                width INTEGER,
+                height INTEGER,
+                PRIMARY KEY (client_id, position)
+            )
+            """,
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                refcount INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL DEFAULT (now())
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS client_images (
+                client_id INTEGER NOT NULL REFERENCES clients (id),
+                position INTEGER NOT NULL,
+                sha256 TEXT NOT NULL REFERENCES blobs (sha256),
+                filename TEXT,
+                width INTEGER,
+                height INTEGER,
+                PRIMARY KEY (client_id, position)
+            )
+            """,
+        ],
+    }),
+    (10, "summary rollups", {
+        "postgres": rollup_migration("postgres"),
+        "sqlite": rollup_migration("sqlite"),
+    }),
+    (11, "review claims", {
+        # a claim is a lease: it lapses at claim_expires_at, so a closed tab never strands a client
+        "postgres": [
+            "ALTER TABLE clients ADD COLUMN IF NOT EXISTS claimed_by TEXT",
+            "ALTER TABLE clients ADD COLUMN IF NOT EXISTS claim_expires_at TIMESTAMPTZ",
+            f"CREATE INDEX IF NOT EXISTS clients_review_queue_idx ON clients (priority ASC, id DESC) WHERE {REVIEW_QUEUE_WHERE}",
+            "CREATE INDEX IF NOT EXISTS clients_claimed_by_idx ON clients (claimed_by) WHERE claimed_by IS NOT NULL",
+        ],
+        "sqlite": [
+            "ALTER TABLE clients ADD COLUMN claimed_by TEXT",
+            "ALTER TABLE clients ADD COLUMN claim_expires_at TEXT",
+            f"CREATE INDEX IF NOT EXISTS clients_review_queue_idx ON clients (priority ASC, id DESC) WHERE {REVIEW_QUEUE_WHERE}",
+            "CREATE INDEX IF NOT EXISTS clients_claimed_by_idx ON clients (claimed_by) WHERE claimed_by IS NOT NULL",
+        ],
+    }),
+    (12, "plain phone_norm column on SQLite", {
+        # Postgres computes it with built-ins already (version 4)
+        "postgres": [],
+        "sqlite": [
+            # the generated column called an app-registered function, which other SQLite tools don't have
+            "DROP INDEX IF EXISTS clients_phone_norm_idx",
+            "ALTER TABLE clients DROP COLUMN phone_norm",
+            *SQLITE_PHONE_NORM_SQL,
+        ],
+    }),
+    (13, "blob liveness from client_images", {
+        # nothing ever decremented refcount; the GC now asks client_images instead
+        "postgres": ["ALTER TABLE blobs DROP COLUMN IF EXISTS refcount"],
+        "sqlite": ["ALTER TABLE blobs DROP COLUMN refcount"],
+    }),
+    (14, "render job state", {
+        # one row per client: its latest PDF render, visible to every web worker
+        "postgres": [
+            """
+            CREATE TABLE IF NOT EXISTS render_jobs (
+                client_id INTEGER PRIMARY KEY,
+                state TEXT NOT NULL,                -- queued / rendering / done / failed
+                error TEXT,
+                submitted_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                finished_at TIMESTAMPTZ
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS render_jobs_active_idx ON render_jobs (submitted_at) WHERE state IN ('queued', 'rendering')",
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS render_jobs (
+                client_id INTEGER PRIMARY KEY,
+                state TEXT NOT NULL,
+                error TEXT,
+                submitted_at TEXT NOT NULL DEFAULT (now()),
+                finished_at TEXT
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS render_jobs_active_idx ON render_jobs (submitted_at) WHERE state IN ('queued', 'rendering')",
+        ],
+    }),
+    (15, "render batch state", {
+        # a single row: the dashboard batch is one at a time across every web worker
+        "postgres": [
+            """
+            CREATE TABLE IF NOT EXISTS render_batch (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                batch_id INTEGER NOT NULL DEFAULT 0,
+                total INTEGER,                      -- NULL while stale reports are still being found
+                running BOOLEAN NOT NULL DEFAULT false,
+                started_at TIMESTAMPTZ,
+                heartbeat_at TIMESTAMPTZ
+            )
+            """,
+            "INSERT INTO render_batch (id) VALUES (1) ON CONFLICT DO NOTHING",
+            "ALTER TABLE render_jobs ADD COLUMN IF NOT EXISTS batch_id INTEGER",
+            "CREATE INDEX IF NOT EXISTS render_jobs_batch_idx ON render_jobs (batch_id) WHERE batch_id IS NOT NULL",
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS render_batch (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                batch_id INTEGER NOT NULL DEFAULT 0,
+                total INTEGER,
+                running INTEGER NOT NULL DEFAULT 0,
+                started_at TEXT,
+                heartbeat_at TEXT
+            )
+            """,
+            "INSERT INTO render_batch (id) VALUES (1) ON CONFLICT DO NOTHING",
+            "ALTER TABLE render_jobs ADD COLUMN batch_id INTEGER",
+            "CREATE INDEX IF NOT EXISTS render_jobs_batch_idx ON render_jobs (batch_id) WHERE batch_id IS NOT NULL",
+        ],
+    }),
+    (16, "SQLite phone_norm drops every non-digit", {
+        "postgres": [],
+        "sqlite": [
+            # version 12's triggers only removed a fixed set of separators
+            "DROP TRIGGER IF EXISTS clients_phone_norm_insert",
+            "DROP TRIGGER IF EXISTS clients_phone_norm_update",
+            *SQLITE_PHONE_NORM_TRIGGERS,
+            f"UPDATE clients SET phone_norm = {sqlite_phone_norm_sql('phone')}",
+        ],
+    }),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+MIGRATION_LOCK_ID = 72_410_001      # pg advisory lock key, keeps two deploys from migrating at once
+
+
+def run_migrations():
+    database = get_database()
+
+    with db_conn() as conn:
+        c = conn.cursor()
+        if database.dialect == "postgres":
+            c.execute("SELECT pg_advisory_lock(?)", (MIGRATION_LOCK_ID,))
+        try:
+            c.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TEXT NOT NULL
+                )
+            """)
+            c.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+            current = c.fetchone()[0]
+            conn.commit()
+
+            pending = [m for m in MIGRATIONS if m[0] > current]
+            if not pending:
+                print(f"schema is up to date (version {current})")
+
+            # one transaction per version: a failure leaves every earlier version applied
+            for version, description, statements in pending:
+                start = time.monotonic()
+                if database.dialect == "sqlite":
+                    c.execute("BEGIN")      # otherwise the sqlite3 module autocommits each DDL statement
+                for sql in statements[database.dialect]:
+                    c.execute(sql)
+                c.execute(
+                    "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                    (version, description, datetime.now(timezone.utc).isoformat())
+                )
+                conn.commit()
+                print(f"applied {version}: {description} ({time.monotonic() - start:.2f}s)")
+        finally:
+            conn.rollback()
+            if database.dialect == "postgres":
+                c.execute("SELECT pg_advisory_unlock(?)", (MIGRATION_LOCK_ID,))
+                conn.commit()
+
+
+@app.on_event("startup")
+def check_schema_version():
+    # the only schema work the app does at boot: one query
+    with db_conn() as conn:
+        c = conn.cursor()
+        try:
+            c.execute("SELECT MAX(version) FROM schema_version")
+            version = c.fetchone()[0] or 0
+        except (psycopg2.errors.UndefinedTable, sqlite3.OperationalError):
+            version = 0
+
+    if version < SCHEMA_VERSION:
+        raise RuntimeError(
+            f"database schema is at version {version}, this build needs {SCHEMA_VERSION} – run `python main.py migrate`"
+        )
+
+# ---------- PLAN CATALOG ----------
+# A handful of rows that only change with a deploy: read once per process, then plain dict lookups.
+
+PLAN_COLUMNS = "id,code,label,price,priority,depth_text,year_limit"
+Plan = namedtuple("Plan", PLAN_COLUMNS)
+
+_plans = None
+_plans_lock = threading.Lock()
+
+
+def plan_catalog():
+    global _plans
+    if _plans is None:
+        with _plans_lock:
+            if _plans is None:
+                with db_conn() as conn:
+                    c = conn.cursor()
+                    c.execute(f"SELECT {PLAN_COLUMNS} FROM plans ORDER BY price")
+                    _plans = {row[0]: Plan(*row) for row in c.fetchall()}
+    return _plans
+
+
+def plan_for_label(label):
+    # website / form submissions still send the display label; match it once, at insert time
+    plans = plan_catalog()
+    for plan in plans.values():
+        if plan.label == label:
+            return plan
+    for plan in sorted(plans.values(), key=lambda p: p.price, reverse=True):
+        if str(plan.price) in (label or ""):
+            return plan
+    return min(plans.values(), key=lambda p: p.price)
+
+
+def plan_filter_id(value):
+    # ?plan= takes the plan id; links from before the catalog carry the label (?plan=₹51 – बेसिक प्लान)
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    for plan in plan_catalog().values():
+        if value in (plan.label, plan.code):
+            return plan.id
+    raise HTTPException(400, f"unknown plan: {value}")
+
+
+@app.on_event("startup")
+def load_plan_catalog():
+    plan_catalog()
+
+# ---------- CLIENT REPOSITORY ----------
+# Every query on the clients table goes through here, so the endpoints don't care which engine is behind db_conn().
+
+# timestamps come back already formatted in IST (ist_text / ist_display, migration 5), same text on both engines
+CLIENT_COLUMNS = (
+    "id,client_code,name,phone,dob,tob,place,plan,questions,images,source,status,"
+    "payment_status,ist_text(payment_date),payment_ref,ai_draft,ist_text(created_at),priority,ai_generated"
+)
+DASHBOARD_COLUMNS = "id,client_code,name,phone,plan,source,status,ist_display(created_at),payment_status,priority"
+
+
+UNPAID_PRIORITY = 99
+PLAN_PRIORITY_SQL = "(SELECT priority FROM plans WHERE plans.id = clients.plan_id)"     # primary-key lookup
+
+
+# shared by the sync repository and its event-loop twin (AsyncClientRepository)
+INSERT_CLIENT_SQL = """
+    INSERT INTO clients
+    (client_code,name,phone,dob,tob,place,plan,plan_id,questions,images,
+     source,status,payment_status,payment_date,payment_ref,
+     ai_draft,created_at,priority,ai_generated)
+    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+    RETURNING id
+"""
+# store_blob() has normally written the row already (blobs backfill hasn't); the no-op update locks it,
+# so a concurrent GC skips it instead of tripping over the client_images foreign key
+INSERT_BLOB_REF_SQL = """
+    INSERT INTO blobs (sha256, path, size) VALUES (?, ?, ?)
+    ON CONFLICT (sha256) DO UPDATE SET size = blobs.size
+"""
+# created_at doubles as "last stored": touching it restarts the GC grace period for a blob not yet referenced
+TOUCH_BLOB_SQL = "UPDATE blobs SET size=?, created_at=? WHERE sha256=?"
+INSERT_BLOB_SQL = "INSERT INTO blobs (sha256, path, size, created_at) VALUES (?, ?, ?, ?) ON CONFLICT (sha256) DO NOTHING"
+INSERT_CLIENT_IMAGE_SQL = """
+    INSERT INTO client_images (client_id, position, sha256, filename, width, height)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+INSERT_IDEMPOTENCY_KEY_SQL = """
+    INSERT INTO idempotency_keys (key, client_id, client_code) VALUES (?, ?, ?)
+    ON CONFLICT (key) DO NOTHING
+    RETURNING key
+"""
+CLIENT_IMAGES_SQL = """
+    SELECT b.path, i.filename, i.width, i.height
+    FROM client_images i
+    JOIN blobs b ON b.sha256 = i.sha256
+    WHERE i.client_id=?
+    ORDER BY i.position
+"""
+IDEMPOTENT_CODE_SQL = "SELECT client_code FROM idempotency_keys WHERE key=? AND created_at >= ?"
+# same mobile number + date of birth + plan from the website within the window = the same person retrying;
+# a different plan is a second purchase and gets its own client
+RECENT_DUPLICATE_SQL = """
+    SELECT client_code FROM clients
+    WHERE phone_norm=? AND dob=? AND plan=? AND source='Website' AND created_at >= ?
+    ORDER BY id DESC
+    LIMIT 1
+"""
+
+
+REVIEW_QUEUE_COLUMNS = "id,client_code,name,plan,priority,ist_text(payment_date)"
+REVIEW_CLAIM_SECONDS = int(os.environ.get("REVIEW_CLAIM_SECONDS", "1800"))
+
+ROLLUP_STATS_SQL = "SELECT dimension, value, total FROM client_stats WHERE total <> 0"
+ROLLUP_REVENUE_SQL = "SELECT day, payments, revenue FROM daily_revenue WHERE day >= ? ORDER BY day DESC"
+
+
+def new_client_row(client_code, name, phone, dob, tob, place, plan, questions, source):
+    return (
+        client_code,
+        name,
+        phone,
+        dob,
+        tob,
+        place,
+        plan,
+        plan_for_label(plan).id,
+        questions,
+        None,               # images: rows in client_images instead
+        source,
+        "Pending",          # status
+        "Pending",          # payment_status
+        None,               # payment_date
+        None,               # payment_ref
+        "AI draft pending", # ai_draft
+        datetime.now(timezone.utc),
+        99,                 # priority
+        0                   # ai_generated
+    )
+
+
+def image_ref_rows(client_id, uploads, first_position=0):
+    # one reference per client image; the blob row is created by whichever upload stored the bytes first
+    for position, upload in enumerate(uploads, first_position):
+        yield INSERT_BLOB_REF_SQL, (upload["sha256"], upload["path"], upload["size"])
+        yield INSERT_CLIENT_IMAGE_SQL, (
+            client_id, position, upload["sha256"], upload["name"], upload["width"], upload["height"]
+        )
+
+
+def mark_paid_sql(client_ids, payment_ref, dialect):
+    # one statement for the whole batch: priority comes from the plan in SQL, no SELECT-then-UPDATE
+    params = [payment_ref] if payment_ref else []
+    update = f"""
+        UPDATE clients
+        SET payment_status='Paid',
+            payment_date=now(),
+            {"payment_ref=?," if payment_ref else ""}
+            priority={PLAN_PRIORITY_SQL}
+        WHERE id IN ({",".join("?" * len(client_ids))})
+        RETURNING id
+    """
+    params.extend(client_ids)
+
+    if dialect != "postgres":
+        return update, params
+
+    # 🔥🔥🔥 TRIGGER AI AFTER PAYMENT (picked up by the job workers), in the same statement
+    return f"""
+        WITH paid AS ({update}),
+        queued AS (
+            INSERT INTO jobs (kind, client_id, max_attempts)
+            SELECT 'ai_draft', id, ? FROM paid
+            ON CONFLICT (kind, client_id) WHERE state IN ('queued', 'running') DO NOTHING
+        )
+        SELECT id FROM paid
+    """, params + [JOB_MAX_ATTEMPTS]
+
+
+def split_page(rows, page_size, before_key):
+    # one extra row tells us whether another page exists
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if before_key:
+        rows.reverse()
+    return rows, has_more
+
+
+def ist_day_start(day):
+    try:
+        return datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=IST)
+    except ValueError:
+        raise HTTPException(400, f"invalid date: {day}")
+
+
+class ClientRepository:
+
+    def get(self, client_id):
+        # explicit column list: row indexes stay stable however the table was created / altered
+        with db_conn() as conn:
+            c = conn.cursor()
+            c.execute(f"SELECT {CLIENT_COLUMNS} FROM clients WHERE id=?", (client_id,))
+            return c.fetchone()
+
+    def create(self, client_code, name, phone, dob, tob, place, plan, questions, images, source,
+               idempotency_key=None):
+        with db_conn() as conn:
+            c = conn.cursor()
+            c.execute(INSERT_CLIENT_SQL, new_client_row(
+                client_code, name, phone, dob, tob, place, plan, questions, source
+            ))
+            client_id = c.fetchone()[0]
+            self.attach_images(c, client_id, images)
+
+            # recorded in the same transaction: if a concurrent retry won the key, this row never existed
+            if idempotency_key:
+                c.execute(INSERT_IDEMPOTENCY_KEY_SQL, (idempotency_key, client_id, client_code))
+                if c.fetchone() is None:
+                    conn.rollback()
+                    return None
+
+            conn.commit()
+        return client_id
+
+    def attach_images(self, c, client_id, uploads, first_position=0):
+        for sql, params in image_ref_rows(client_id, uploads, first_position):
+            c.execute(sql, params)
+
+    def images(self, client_id):
+        with db_conn() as conn:
+            c = conn.cursor()
+            c.execute(CLIENT_IMAGES_SQL, (client_id,))
+            return c.fetchall()
+
+    def idempotent_code(self, idempotency_key):
+        with db_conn() as conn:
+            c = conn.cursor()
+            c.execute(IDEMPOTENT_CODE_SQL,
+                      (idempotency_key, datetime.now(timezone.utc) - timedelta(seconds=IDEMPOTENCY_TTL)))
+            row = c.fetchone()
+        return row[0] if row else None
+
+    def recent_duplicate(self, phone, dob, plan, window):
+        with db_conn() as conn:
+            c = conn.cursor()
+            c.execute(RECENT_DUPLICATE_SQL,
+                      (normalize_phone(phone)[-10:], dob, plan, datetime.now(timezone.utc) - timedelta(seconds=window)))
+            row = c.fetchone()
+        return row[0] if row else None
+
+    def purge_idempotency_keys(self):
+        with db_conn() as conn:
+            c = conn.cursor()
+            c.execute("DELETE FROM idempotency_keys WHERE created_at < ?",
+                      (datetime.now(timezone.utc) - timedelta(seconds=IDEMPOTENCY_TTL),))
+            conn.commit()
+
+    def draft_inputs(self, client_id):
+        with db_conn() as conn:
+            c = conn.cursor()
+            c.execute("SELECT name, dob, tob, place, plan_id, questions FROM clients WHERE id=?", (client_id,))
+            return c.fetchone()
+
+    def save_draft(self, client_id, draft):
+        with db_conn() as conn:
+            c = conn.cursor()
+            c.execute("""
+                UPDATE clients
+                SET ai_draft=?, ai_generated=1
+                WHERE id=?
+            """, (draft, client_id))
+            conn.commit()
+
+    def report_row(self, client_id):
+        with db_conn() as conn:
+            c = conn.cursor()
+            c.execute("SELECT client_code,name,phone,plan,ai_draft,ist_text(created_at) FROM clients WHERE id=?",
+                      (client_id,))
+            return c.fetchone()
+
+    def iter_reviewed(self):
+        # streamed through a server-side cursor; the caller must exhaust the generator
+        with db_conn() as conn:
+            c = conn.cursor(name="reviewed_reports")
+            c.itersize = 500
+            c.execute("""
+                SELECT id,client_code,name,phone,plan,ai_draft,ist_text(created_at)
+                FROM clients
+                WHERE status='Reviewed'
+                ORDER BY priority ASC, id ASC
+            """)
+            yield from c
+            c.close()
+
+    def status(self, client_id):
+        with db_conn() as conn:
+            c = conn.cursor()
+            c.execute("SELECT status FROM clients WHERE id=?", (client_id,))
+            row = c.fetchone()
+        return row[0] if row else None
+
+    def client_code(self, client_id):
+        with db_conn() as conn:
+            c = conn.cursor()
+            c.execute("SELECT client_code FROM clients WHERE id=?", (client_id,))
+            row = c.fetchone()
+        return row[0] if row else None
+
+    def update_review(self, client_id, ai_draft, status):
+        # saving the draft keeps the reviewer's claim; moving the client out of Pending releases it
+        with db_conn() as conn:
+            c = conn.cursor()
+            c.execute("""
+                UPDATE clients
+                SET ai_draft=?, status=?,
+                    claimed_by=CASE WHEN ?='Pending' THEN claimed_by END,
+                    claim_expires_at=CASE WHEN ?='Pending' THEN claim_expires_at END
+                WHERE id=?
+            """, (ai_draft, status, status, status, client_id))
+            conn.commit()
+
+    def claim_next(self, reviewer):
+        expires = datetime.now(timezone.utc) + timedelta(seconds=REVIEW_CLAIM_SECONDS)
+        with db_conn() as conn:
+            c = conn.cursor()
+            # asking again renews the reviewer's current claim instead of taking a second client
+            c.execute(f"""
+                UPDATE clients SET claim_expires_at=?
+                WHERE id = (
+                    SELECT id FROM clients
+                    WHERE claimed_by=? AND claim_expires_at > now() AND {REVIEW_QUEUE_WHERE}
+                    LIMIT 1
+                )
+                RETURNING {REVIEW_QUEUE_COLUMNS}
+            """, (expires, reviewer))
+            row = c.fetchone()
+
+            if row is None:
+                # rows another reviewer is claiming right now are skipped, not waited on
+                c.execute(f"""
+                    UPDATE clients SET claimed_by=?, claim_expires_at=?
+                    WHERE id = (
+                        SELECT id FROM clients
+                        WHERE {REVIEW_QUEUE_WHERE} AND (claim_expires_at IS NULL OR claim_expires_at <= now())
+                        ORDER BY priority ASC, id DESC
+                        FOR UPDATE SKIP LOCKED
+                        LIMIT 1
+                    )
+                    RETURNING {REVIEW_QUEUE_COLUMNS}
+                """, (reviewer, expires))
+                row = c.fetchone()
+            conn.commit()
+
+        return row, expires
+
+    def release_claim(self, client_id, reviewer):
+        with db_conn() as conn:
+            c = conn.cursor()
+            c.execute("""
+                UPDATE clients SET claimed_by=NULL, claim_expires_at=NULL
+                WHERE id=? AND claimed_by=?
+            """, (client_id, reviewer))
+            released = c.rowcount
+            conn.commit()
+        return released > 0
+
+    def set_payment(self, client_id, payment_status, payment_ref):
+        if payment_status == "Paid":
+            self.mark_paid([client_id], payment_ref=payment_ref)
+            return
+
+        with db_conn() as conn:
+            c = conn.cursor()
+            c.execute("""
+                UPDATE clients
+                SET payment_status=?, payment_date=NULL, payment_ref=?, priority=?
+                WHERE id=?
+            """, (payment_status, payment_ref, UNPAID_PRIORITY, client_id))
+            conn.commit()
+
+    def mark_paid(self, client_ids, payment_ref=None):
+        client_ids = list(client_ids)
+        if not client_ids:
+            return []
+
+        dialect = get_database().dialect
+        with db_conn() as conn:
+            c = conn.cursor()
+            c.execute(*mark_paid_sql(client_ids, payment_ref, dialect))
+            paid = [r[0] for r in c.fetchall()]
+            if dialect != "postgres":
+                # SQLite has no writable CTEs; it is in-process, so the extra statement costs no round trip
+                enqueue_jobs(c, "ai_draft", paid)
+            conn.commit()
+
+        return paid
+
+    def complete_for_whatsapp(self, client_id):
+        with db_conn() as conn:
+            c = conn.cursor()
+            c.execute("SELECT name, phone, client_code FROM clients WHERE id=?", (client_id,))
+            data = c.fetchone()
+
+            if data:
+                # Update status to Completed
+                c.execute("UPDATE clients SET status='Completed' WHERE id=?", (client_id,))
+                conn.commit()
+
+        return data
+
+    def filter_clause(self, q=None, plan=None, source=None, status=None, payment=None,
+                      start_date=None, end_date=None):
+        where = "1=1"
+        params = []
+        rank = None
+        rank_params = []
+
+        if q:
+            search_where, search_params, rank, rank_params = client_search_clause(q, get_database().dialect)
+            where += " AND " + search_where
+            params.extend(search_params)
+
+        if plan:
+            where += " AND plan_id=?"
+            params.append(plan)
+
+        if source:
+            where += " AND source=?"
+            params.append(source)
+
+        if status:
+            where += " AND status=?"
+            params.append(status)
+
+        if payment:
+            where += " AND payment_status=?"
+            params.append(payment)
+
+        # whole IST days as a half-open range on the indexed timestamp
+        if start_date:
+            where += " AND created_at >= ?"
+            params.append(ist_day_start(start_date))
+
+        if end_date:
+            where += " AND created_at < ?"
+            params.append(ist_day_start(end_date) + timedelta(days=1))
+
+        return where, params, rank, rank_params
+
+    def dashboard_query(self, filters, page_size, after_key=None, before_key=None, columns=DASHBOARD_COLUMNS):
+        where, params, search_rank, search_rank_params = self.filter_clause(**filters)
+        sql = f"SELECT {columns} FROM clients WHERE {where}"
+
+        # -------- KEYSET PAGINATION ON (priority ASC, id DESC) --------
+        if search_rank and page_size:
+            # ranked pages keyset on (score DESC, priority ASC, id DESC); the score is an integer so a cursor
+            # compares exactly, and rides along as the last column
+            score = f"CAST(round({search_rank} * 1000) AS INTEGER)"
+            sql = f"SELECT * FROM (SELECT {columns}, {score} AS search_score FROM clients WHERE {where}) ranked"
+            params = search_rank_params + params
+            if after_key:
+                sql += " WHERE search_score <= ? AND (search_score < ? OR priority > ? OR (priority = ? AND id < ?))"
+                params.extend([after_key[0], after_key[0], after_key[1], after_key[1], after_key[2]])
+                sql += " ORDER BY search_score DESC, priority ASC, id DESC"
+            elif before_key:
+                sql += " WHERE search_score >= ? AND (search_score > ? OR priority < ? OR (priority = ? AND id > ?))"
+                params.extend([before_key[0], before_key[0], before_key[1], before_key[1], before_key[2]])
+                sql += " ORDER BY search_score ASC, priority DESC, id ASC"
+            else:
+                sql += " ORDER BY search_score DESC, priority ASC, id DESC"
+        elif search_rank:
+            sql += f" ORDER BY {search_rank} DESC, priority ASC, id DESC"
+            params.extend(search_rank_params)
+        elif after_key:
+            sql += " AND priority >= ? AND (priority > ? OR id < ?)"
+            params.extend([after_key[0], after_key[0], after_key[1]])
+            sql += " ORDER BY priority ASC, id DESC"
+        elif before_key:
+            # walk backwards from the cursor, flipped back into display order below
+            sql += " AND priority <= ? AND (priority < ? OR id > ?)"
+            params.extend([before_key[0], before_key[0], before_key[1]])
+            sql += " ORDER BY priority DESC, id ASC"
+        else:
+            sql += " ORDER BY priority ASC, id DESC"
+
+        # one extra row tells us whether another page exists; no page size = every matching row
+        if page_size:
+            sql += " LIMIT ?"
+            params.append(page_size + 1)
+        return sql, params
+
+    def dashboard_page(self, filters, page_size, after_key=None, before_key=None):
+        sql, params = self.dashboard_query(filters, page_size, after_key, before_key)
+
+        with db_conn() as conn:
+            # named cursor = server-side cursor, rows arrive in batches instead of one big fetchall()
+            c = conn.cursor(name="dashboard_page")
+            c.itersize = min(page_size + 1, 200)
+            c.execute(sql, params)
+            rows = [r for r in c]
+            c.close()
+
+        return split_page(rows, page_size, before_key)
+
+    def count_query(self, filters):
+        where, params, _, _ = self.filter_clause(**filters)
+        return f"SELECT COUNT(*) FROM clients WHERE {where}", params
+
+    def count(self, filters):
+        with db_conn() as conn:
+            c = conn.cursor()
+            c.execute(*self.count_query(filters))
+            return c.fetchone()[0]
+
+    def rollups(self, since_day):
+        # a handful of counter rows plus one row per day: cost does not grow with the clients table
+        with db_conn() as conn:
+            c = conn.cursor()
+            c.execute(ROLLUP_STATS_SQL)
+            stats = c.fetchall()
+            c.execute(ROLLUP_REVENUE_SQL, (since_day,))
+            return stats, c.fetchall()
+
+    def stream_rows(self, sql, params, chunk_size):
+        # server-side cursor, one list of rows per chunk; the caller must exhaust or close the generator,
+        # on the thread that started it
+        with get_database().stream_connection() as conn:
+            c = conn.cursor(name="stream_rows")
+            c.itersize = chunk_size
+            c.execute(sql, params)
+            while True:
+                rows = c.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+            c.close()
+
+
+clients = ClientRepository()
+
+
+class AsyncClientRepository:
+    # event-loop twin of the ClientRepository methods behind the hot endpoints (psycopg 3, Postgres only)
+
+    async def get(self, client_id):
+        async with adb_conn() as conn:
+            c = conn.cursor()
+            await c.execute(f"SELECT {CLIENT_COLUMNS} FROM clients WHERE id=?", (client_id,))
+            return await c.fetchone()
+
+    async def images(self, client_id):
+        async with adb_conn() as conn:
+            c = conn.cursor()
+            await c.execute(CLIENT_IMAGES_SQL, (client_id,))
+            return await c.fetchall()
+
+    async def create(self, client_code, name, phone, dob, tob, place, plan, questions, images, source,
+                     idempotency_key=None):
+        async with adb_conn() as conn:
+            c = conn.cursor()
+            await c.execute(INSERT_CLIENT_SQL, new_client_row(
+                client_code, name, phone, dob, tob, place, plan, questions, source
+            ))
+            client_id = (await c.fetchone())[0]
+            for sql, params in image_ref_rows(client_id, images):
+                await c.execute(sql, params)
+
+            if idempotency_key:
+                await c.execute(INSERT_IDEMPOTENCY_KEY_SQL, (idempotency_key, client_id, client_code))
+                if await c.fetchone() is None:
+                    await conn.rollback()
+                    return None
+
+            await conn.commit()
+        return client_id
+
+    async def idempotent_code(self, idempotency_key):
+        async with adb_conn() as conn:
+            c = conn.cursor()
+            await c.execute(IDEMPOTENT_CODE_SQL,
+                            (idempotency_key, datetime.now(timezone.utc) - timedelta(seconds=IDEMPOTENCY_TTL)))
+            row = await c.fetchone()
+        return row[0] if row else None
+
+    async def recent_duplicate(self, phone, dob, plan, window):
+        async with adb_conn() as conn:
+            c = conn.cursor()
+            await c.execute(RECENT_DUPLICATE_SQL,
+                            (normalize_phone(phone)[-10:], dob, plan, datetime.now(timezone.utc) - timedelta(seconds=window)))
+            row = await c.fetchone()
+        return row[0] if row else None
+
+    async def mark_paid(self, client_ids, payment_ref=None):
+        client_ids = list(client_ids)
+        if not client_ids:
+            return []
+
+        async with adb_conn() as conn:
+            c = conn.cursor()
+            await c.execute(*mark_paid_sql(client_ids, payment_ref, "postgres"))
+            paid = [r[0] for r in await c.fetchall()]
+            await conn.commit()
+        return paid
+
+    async def dashboard_page(self, filters, page_size, after_key=None, before_key=None):
+        sql, params = clients.dashboard_query(filters, page_size, after_key, before_key)
+
+        async with adb_conn() as conn:
+            c = conn.cursor()
+            await c.execute(sql, params)
+            rows = await c.fetchall()       # at most page_size + 1 rows
+
+        return split_page(rows, page_size, before_key)
+
+    async def count(self, filters):
+        async with adb_conn() as conn:
+            c = conn.cursor()
+            await c.execute(*clients.count_query(filters))
+            return (await c.fetchone())[0]
+
+    async def rollups(self, since_day):
+        async with adb_conn() as conn:
+            c = conn.cursor()
+            await c.execute(ROLLUP_STATS_SQL)
+            stats = await c.fetchall()
+            await c.execute(ROLLUP_REVENUE_SQL, (since_day,))
+            return stats, await c.fetchall()
+
+    async def stream_rows(self, sql, params, chunk_size):
+        async with adb_conn() as conn:
+            # named = server-side cursor; those don't go through AsyncQmarkCursor
+            c = conn.cursor(name="stream_rows")
+            await c.execute(qmark_to_pyformat(sql), params)
+            while True:
+                rows = await c.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+            await c.close()
+
+
+class ThreadpoolClientRepository:
+    # same awaitable interface over the sync repository (SQLite, ASYNC_DB=0, no psycopg 3)
+
+    def __getattr__(self, name):
+        method = getattr(clients, name)
+
+        async def call(*args, **kwargs):
+            return await run_in_threadpool(method, *args, **kwargs)
+
+        return call
+
+    async def stream_rows(self, sql, params, chunk_size):
+        async for rows in iterate_in_thread(partial(clients.stream_rows, sql, params, chunk_size)):
+            yield rows
+
+
+STREAM_DONE = object()
+
+
+async def iterate_in_thread(make_iterator):
+    # The whole sync generator runs on one thread of its own, so its connection never changes threads.
+    # However the async side ends (exhausted, error, client disconnect), that thread stops and closes
+    # the generator itself; the finally below needs no await, so it also runs under cancellation.
+    handoff = queue.Queue(maxsize=1)
+    stop = threading.Event()
+
+    def produce():
+        iterator = make_iterator()
         try:
-            c.execute(f"ALTER TABLE clients ADD COLUMN {col}")
-        except:
-            pass
+            for item in iterator:
+                while not stop.is_set():
+                    try:
+                        handoff.put((item, None), timeout=0.5)
+                        break
+                    except queue.Full:
+                        pass
+                if stop.is_set():
+                    break
+        except Exception as exc:
+            item = (STREAM_DONE, exc)
+        else:
+            item = (STREAM_DONE, None)
+        finally:
+            iterator.close()
+        try:
+            handoff.put(item, timeout=0.5)
+        except queue.Full:
+            pass            # nobody is reading any more
 
-    conn.commit()
-    conn.close()
+    threading.Thread(target=produce, name="stream-rows", daemon=True).start()
+    try:
+        while True:
+            item, error = await run_in_threadpool(handoff.get)
+            if error is not None:
+                raise error
+            if item is STREAM_DONE:
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+aclients = AsyncClientRepository() if async_db_enabled() else ThreadpoolClientRepository()
+
+# ---------- CLIENT CODES ----------
+class ClientCodeAllocator:
+
+    def __init__(self, block=CLIENT_CODE_BLOCK):
+        self.block = block
+        self._lock = threading.Lock()
+        self._pid = None
+        self._next = self._end = 0
+
+    def _reserve(self):
+        # the only database round trip, once per block
+        with db_conn() as conn:
+            c = conn.cursor()
+            if get_database().dialect == "postgres":
+                c.execute("SELECT nextval('client_code_seq')")
+                start = c.fetchone()[0]
+            else:
+                c.execute(
+                    "UPDATE client_code_counter SET next_value = next_value + ? WHERE id = 1 RETURNING next_value",
+                    (self.block,)
+                )
+                start = c.fetchone()[0] - self.block
+            conn.commit()
+        return start
+
+    def next(self):
+        with self._lock:
+            # a forked worker must not hand out the rest of its parent's block
+            if self._pid != os.getpid() or self._next >= self._end:
+                self._next = self._reserve()
+                self._end = self._next + self.block
+                self._pid = os.getpid()
+            value = self._next
+            self._next += 1
+        return value
+
+    async def _areserve(self):
+        if not async_db_enabled():
+            return await run_in_threadpool(self._reserve)
+        async with adb_conn() as conn:
+            c = conn.cursor()
+            await c.execute("SELECT nextval('client_code_seq')")
+            start = (await c.fetchone())[0]
+            await conn.commit()
+        return start
+
+    async def anext(self):
+        # the lock is never held across the await; two coroutines reserving at once just skip one block
+        while True:
+            with self._lock:
+                if self._pid == os.getpid() and self._next < self._end:
+                    value = self._next
+                    self._next += 1
+                    return value
+
+            start = await self._areserve()
+            with self._lock:
+                if self._pid != os.getpid() or self._next >= self._end:
+                    self._next = start
+                    self._end = start + self.block
+                    self._pid = os.getpid()
+
+
+client_codes = ClientCodeAllocator()
 
-ensure_payment_columns()
 
 def generate_client_code():
-    year = datetime.now(ZoneInfo("Asia/Kolkata")).year
-    short_unique = int(time.time()) % 100000   # last 5 digits
-    return f"AVV-{year}-{short_unique}"
+    # unique across processes and years; unused numbers of a block are simply skipped on restart
+    year = datetime.now(IST).year
+    return f"AVV-{year}-{client_codes.next()}"
+
+
+async def agenerate_client_code():
+    year = datetime.now(IST).year
+    return f"AVV-{year}-{await client_codes.anext()}"
+
+
+def _stress_codes_process(threads, per_thread):
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        batches = pool.map(lambda _: [generate_client_code() for _ in range(per_thread)], range(threads))
+        return [code for batch in batches for code in batch]
+
+
+def stress_client_codes(processes, threads, count):
+    per_thread = max(1, count // (processes * threads))
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        results = list(pool.map(_stress_codes_process, [threads] * processes, [per_thread] * processes))
+    elapsed = time.perf_counter() - t0
+
+    codes = [code for result in results for code in result]
+    duplicates = len(codes) - len(set(codes))
+    print(f"{len(codes)} codes from {processes} processes x {threads} threads in {elapsed:.2f}s "
+          f"({len(codes) / elapsed:,.0f}/s), {duplicates} duplicates")
+    if duplicates:
+        raise SystemExit(1)
 
 # ---------- AI GENERATION ENGINE ----------
 def generate_ai_draft(client_id):
 
-    conn = get_db()
-    c = conn.cursor()
-
-    c.execute("SELECT name, dob, tob, place, plan, questions FROM clients WHERE id=?", (client_id,))
-    data = c.fetchone()
+    data = clients.draft_inputs(client_id)
 
     if not data:
-        conn.close()
         return
 
-    name, dob, tob, place, plan, questions = data
+    name, dob, tob, place, plan_id, questions = data
 
     # ---------- PLAN DEPTH CONTROL ----------
-    if "501" in plan:
-        depth_text = "अत्यंत गहन कर्मिक एवं आध्यात्मिक विश्लेषण"
-        year_limit = 7
-    elif "251" in plan:
-        depth_text = "गहन जीवन दिशा एवं भाग्य विश्लेषण"
-        year_limit = 4
-    elif "151" in plan:
-        depth_text = "विस्तृत व्यावहारिक विश्लेषण"
-        year_limit = 2
-    else:
-        depth_text = "संक्षिप्त एवं स्पष्ट मार्गदर्शन"
-        year_limit = 1
+    plan = plan_catalog()[plan_id]
+    depth_text = plan.depth_text
+    year_limit = plan.year_limit
 
     # ---------- YEARLY PREDICTION BLOCK ----------
     yearly_prediction = ""
@@ -174,79 +2339,288 @@ Section 1 – हस्त संरचना विश्लेषण
 हथेली की संरचना व्यक्ति के स्वभाव, मानसिक स्थिरता और निर्णय क्षमता को दर्शाती है। संरचना संतुलित होने पर व्यक्ति व्यवहारिक एवं व्यावहारिक दृष्टिकोण अपनाता है।
 इस योजना के अंतर्गत {depth_text} प्रस्तुत किया जा रहा है।
 
-Section 2 – पर्वत विश्लेषण
-शुक्र पर्वत ऊर्जा और आकर्षण का प्रतीक है।
-बृहस्पति पर्वत नेतृत्व क्षमता का संकेत देता है।
-शनि पर्वत धैर्य और जिम्मेदारी को दर्शाता है।
-सूर्य पर्वत सम्मान और प्रतिष्ठा से जुड़ा होता है।
+Section 2 – पर्वत विश्लेषण
+शुक्र पर्वत ऊर्जा और आकर्षण का प्रतीक है।
+बृहस्पति पर्वत नेतृत्व क्षमता का संकेत देता है।
+शनि पर्वत धैर्य और जिम्मेदारी को दर्शाता है।
+सूर्य पर्वत सम्मान और प्रतिष्ठा से जुड़ा होता है।
+
+Section 3 – मुख्य रेखाओं का विश्लेषण
+जीवन रेखा जीवन शक्ति और स्थायित्व का संकेत देती है।
+मस्तिष्क रेखा सोच और निर्णय शैली दर्शाती है।
+हृदय रेखा भावनात्मक संतुलन का संकेत है।
+भाग्य रेखा कर्म एवं पेशेवर दिशा से संबंधित होती है।
+
+Section 4 – विशेष चिह्न एवं संकेत
+हथेली में यदि तिल, क्रॉस, त्रिकोण, तारा या द्वीप जैसे चिह्न उपस्थित हों तो उनका विशेष महत्व होता है।
+त्रिकोण सामान्यतः बुद्धिमत्ता का संकेत है।
+क्रॉस जीवन में संघर्ष के पश्चात उपलब्धि दर्शाता है।
+तिल का स्थान उसके प्रभाव को निर्धारित करता है।
+
+Section 5 – कर्म, भाग्य एवं जीवन दिशा
+जीवन में उन्नति कर्म और सतत प्रयास से जुड़ी होती है।
+भाग्य रेखा का संतुलन दर्शाता है कि जीवन में अवसर प्रयास के साथ प्रकट होते हैं।
+
+Section 6 – प्रश्नों के उत्तर
+आपके द्वारा पूछे गए प्रश्न:
+{questions}
+इन विषयों में धैर्य, योजना और संतुलित निर्णय से प्रगति संभव है।
+
+Section 7 – उपाय एवं आध्यात्मिक मार्गदर्शन
+नियमित प्रार्थना, मंत्र जप और सकारात्मक सोच जीवन को संतुलित बनाते हैं।
+प्रत्येक दिन आत्मचिंतन और अनुशासन लाभकारी रहेगा।
+
+Section 8 – आगामी वर्षों का पूर्वानुमान
+{yearly_prediction}
+
+अंतिम संदेश:
+श्रद्धा, सद्कर्म और सकारात्मक दृष्टिकोण से जीवन की दिशा सुदृढ़ होती है।
+ईश्वर में विश्वास रखें और निरंतर प्रयास करते रहें।
+– आचार्य विशाल वैष्णव
+"""
+
+    clients.save_draft(client_id, draft.strip())
+
+# ---------- REPORT TEMPLATE ----------
+REPORT_BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+# static stylesheet – parsed once per worker into a WeasyPrint CSS object (see get_report_resources)
+REPORT_STYLESHEET = """
+    @page {
+        size: A4;
+        margin: 40px;
+        border: 2px solid #c6a74d;
+
+        @bottom-center {
+            content: "Page " counter(page) " of " counter(pages);
+            font-size: 11px;
+            color: #777;
+        }
+    }
+
+    @font-face {
+    font-family: 'NotoDev';
+    src: url('NotoSansDevanagari-Regular.ttf') format('truetype');
+    }
+
+    body {
+        font-family: 'NotoDev';
+        margin: 0;
+        background: #faf6ef;
+    }
+
+    .watermark {
+        position: fixed;
+        top: 50%;
+        left: 50%;
+        transform: translate(-50%, -50%);
+        font-size: 160px;
+        color: rgba(139,0,0,0.04);
+        z-index: -1;
+    }
+
+    .cover {
+        padding: 40px;
+    }
+
+    .header {
+        text-align: center;
+        background: linear-gradient(to right, #7b0000, #b22222);
+        color: white;
+        padding: 35px;
+        border-radius: 12px;
+        margin-bottom: 35px;
+    }
+
+    .title {
+        font-size: 36px;
+        font-weight: bold;
+        margin-top: 15px;
+    }
+
+    .subtitle {
+        font-size: 17px;
+        margin-top: 6px;
+    }
+
+    .client-box {
+        background: linear-gradient(to right, #fff8e7, #ffe9c2);
+        padding: 22px 26px;
+        margin: 0 15px 35px 15px;   /* LEFT-RIGHT GAP */
+        border-left: 6px solid #d4af37;
+        border-radius: 12px;
+        box-shadow: 0 4px 12px rgba(0,0,0,0.07);
+    }
+
+    .section-title {
+        font-size: 26px;
+        font-weight: bold;
+        color: #8b0000;
+        letter-spacing: 1px;
+        margin-top: 20px;
+        margin-bottom: 25px;
+        border-bottom: 3px solid #d4af37;
+        padding-bottom: 10px;
+    }
+
+    .section-block {
+        background: linear-gradient(to bottom, #fffdf9, #ffecc7);
+        padding: 22px 26px;
+        margin: 0 15px 30px 15px;   /* LEFT-RIGHT GAP ADDED */
+        border-left: 6px solid #b8860b;
+        border-radius: 10px;
+        page-break-inside: avoid;
+        box-shadow: 0 6px 16px rgba(0,0,0,0.08);
+    }
+
+    .page-content {
+        padding: 0 10px 120px 10px;   /* side breathing space */
+    }
+
+    .final-footer {
+        margin: 60px 20px 30px 20px;   /* LEFT RIGHT GAP ADDED */
+        text-align: center;
+        font-size: 12px;
+        color: #777;
+    }
+
+    .final-footer hr {
+        border: none;
+        border-top: 1px solid #ddd;
+        margin: 0 40px 15px 40px;  /* IMPORTANT */
+    }
+
+    .antim-section {
+        background: linear-gradient(to bottom, #fff8e7, #fbe7c6);
+        margin: 60px 40px;
+        padding: 40px;
+        border-radius: 18px;
+        text-align: center;
+        border: 2px solid #d4af37;
+        box-shadow: 0 8px 25px rgba(0,0,0,0.12);
+    }
+
+    .antim-title {
+        font-size: 28px;
+        font-weight: bold;
+        color: #8b0000;
+        margin-bottom: 20px;
+    }
+
+    .antim-content {
+        font-size: 18px;
+        line-height: 1.8;
+    }
+
+    .antim-sign {
+        margin-top: 30px;
+        font-size: 16px;
+        font-weight: bold;
+        color: #7b0000;
+    }
+"""
+
+REPORT_PAGE = string.Template("""
+<html>
+<head>
+    <meta charset="utf-8">
+</head>
+
+<body>
+
+<div class="watermark">ॐ</div>
+
+<!-- COVER PAGE -->
+<div class="cover">
+
+    <div class="header">
+        <img src="ganesha.png" style="width:100%; border-radius:8px;">
+        <div class="title">आचार्य विशाल वैष्णव</div>
+        <div class="subtitle">हस्तरेखा विशेषज्ञ एवं वैदिक ज्योतिषज्ञ</div>
+    </div>
+
+    <div class="client-box">
+        <b>Client Code:</b> $client_code<br>
+        <b>Name:</b> $name<br>
+        <b>Mobile:</b> $phone<br>
+        <b>Plan:</b> $plan<br>
+        <b>Date:</b> $created_at
+    </div>
+
+</div>
+
+<div style="page-break-after: always;"></div>
 
-Section 3 – मुख्य रेखाओं का विश्लेषण
-जीवन रेखा जीवन शक्ति और स्थायित्व का संकेत देती है।
-मस्तिष्क रेखा सोच और निर्णय शैली दर्शाती है।
-हृदय रेखा भावनात्मक संतुलन का संकेत है।
-भाग्य रेखा कर्म एवं पेशेवर दिशा से संबंधित होती है।
+<!-- REPORT -->
+<div class="report">
 
-Section 4 – विशेष चिह्न एवं संकेत
-हथेली में यदि तिल, क्रॉस, त्रिकोण, तारा या द्वीप जैसे चिह्न उपस्थित हों तो उनका विशेष महत्व होता है।
-त्रिकोण सामान्यतः बुद्धिमत्ता का संकेत है।
-क्रॉस जीवन में संघर्ष के पश्चात उपलब्धि दर्शाता है।
-तिल का स्थान उसके प्रभाव को निर्धारित करता है।
+    <div class="section-title">Palm Reading Detailed Report</div>
 
-Section 5 – कर्म, भाग्य एवं जीवन दिशा
-जीवन में उन्नति कर्म और सतत प्रयास से जुड़ी होती है।
-भाग्य रेखा का संतुलन दर्शाता है कि जीवन में अवसर प्रयास के साथ प्रकट होते हैं।
+    $formatted_blocks
 
-Section 6 – प्रश्नों के उत्तर
-आपके द्वारा पूछे गए प्रश्न:
-{questions}
-इन विषयों में धैर्य, योजना और संतुलित निर्णय से प्रगति संभव है।
+</div>
 
-Section 7 – उपाय एवं आध्यात्मिक मार्गदर्शन
-नियमित प्रार्थना, मंत्र जप और सकारात्मक सोच जीवन को संतुलित बनाते हैं।
-प्रत्येक दिन आत्मचिंतन और अनुशासन लाभकारी रहेगा।
+</body>
+</html>
+""")
 
-Section 8 – आगामी वर्षों का पूर्वानुमान
-{yearly_prediction}
+REPORT_SECTION = string.Template("""
+<div class="section-block">
+    <div style="font-weight:bold; font-size:18px; margin-bottom:8px; color:#7b0000;">
+        $title
+    </div>
+    $content
+</div>
+""")
+
+REPORT_ANTIM = string.Template("""
+<div style="page-break-before: always;"></div>
+<div class="antim-section">
+    <div class="antim-title">अंतिम संदेश</div>
+    <div class="antim-content">
+        $content
+    </div>
+    <div class="antim-sign">
+        – आचार्य विशाल वैष्णव
+    </div>
+</div>
+""")
 
-अंतिम संदेश:
-श्रद्धा, सद्कर्म और सकारात्मक दृष्टिकोण से जीवन की दिशा सुदृढ़ होती है।
-ईश्वर में विश्वास रखें और निरंतर प्रयास करते रहें।
-– आचार्य विशाल वैष्णव
+REPORT_FOOTER = """
+<div class="final-footer">
+    <hr>
+    © 2026 आचार्य विशाल वैष्णव | All Rights Reserved<br>
+    WhatsApp: +91-6000376976
+</div>
 """
 
-    c.execute("""
-        UPDATE clients
-        SET ai_draft=?, ai_generated=1
-        WHERE id=?
-    """, (draft.strip(), client_id))
+REPORT_SECTION_RE = re.compile(r'(Section\s+\d+\s*–.*?)\n')
 
-    conn.commit()
-    conn.close()
+_report_resources = None
+_report_resources_pid = None
 
-def generate_pdf_report(client_id):
 
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT client_code,name,phone,plan,ai_draft,created_at FROM clients WHERE id=?", (client_id,))
-    data = c.fetchone()
-    conn.close()
+def build_report_resources():
+    font_config = FontConfiguration()
+    stylesheet = CSS(string=REPORT_STYLESHEET, base_url=REPORT_BASE_PATH, font_config=font_config)
+    # WeasyPrint keeps decoded images (ganesha.png) here between documents
+    image_cache = {}
+    return font_config, stylesheet, image_cache
 
-    if not data:
-        return None
 
-    client_code, name, phone, plan, ai_draft, created_at = data
+def get_report_resources():
+    global _report_resources, _report_resources_pid
 
-    file_name = f"{client_code}.pdf"
-    file_path = os.path.join(REPORT_DIR, file_name)
+    # font configuration, parsed stylesheet and decoded images live once per (worker) process
+    if _report_resources is None or _report_resources_pid != os.getpid():
+        _report_resources = build_report_resources()
+        _report_resources_pid = os.getpid()
 
-    font_config = FontConfiguration()
+    return _report_resources
 
-    # -------- ABSOLUTE FONT PATH --------
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    font_path = os.path.join(base_path, "NotoSansDevanagari-Regular.ttf")
 
-    # -------- FORMAT REPORT CONTENT --------
-    import re
+def build_report_html(data):
+    client_code, name, phone, plan, ai_draft, created_at = data
 
     # -------- SPLIT ANTIM SANDESH (Hindi + English Support) --------
     antim_message = ""
@@ -263,23 +2637,16 @@ def generate_pdf_report(client_id):
 
     else:
         main_content = ai_draft
-        
-    sections = re.split(r'(Section\s+\d+\s*–.*?)\n', main_content)
 
-    formatted_blocks = ""
+    sections = REPORT_SECTION_RE.split(main_content)
+
+    blocks = []
 
     for i in range(1, len(sections), 2):
-        title = sections[i].strip()
-        content = sections[i+1].strip()
-
-        formatted_blocks += f"""
-        <div class="section-block">
-            <div style="font-weight:bold; font-size:18px; margin-bottom:8px; color:#7b0000;">
-                {title}
-            </div>
-            {content.replace("\n", "<br>")}
-        </div>
-        """
+        blocks.append(REPORT_SECTION.substitute(
+            title=sections[i].strip(),
+            content=sections[i+1].strip().replace("\n", "<br>")
+        ))
 
     # -------- ADD SEPARATE ANTIM SECTION --------
     if antim_message:
@@ -289,237 +2656,767 @@ def generate_pdf_report(client_id):
         clean_antim = clean_antim.replace("– आचायर्य विशाल वैष्णव", "")
         clean_antim = clean_antim.strip()
 
-        formatted_blocks += f"""
-        <div style="page-break-before: always;"></div>
-        <div class="antim-section">
-            <div class="antim-title">अंतिम संदेश</div>
-            <div class="antim-content">
-                {clean_antim.replace("\n", "<br>")}
-            </div>
-            <div class="antim-sign">
-                – आचार्य विशाल वैष्णव
-            </div>
-        </div>
-        """
-    
+        blocks.append(REPORT_ANTIM.substitute(content=clean_antim.replace("\n", "<br>")))
+
     # Footer only at end
-    formatted_blocks += """
-    <div class="final-footer">
-        <hr>
-        © 2026 आचार्य विशाल वैष्णव | All Rights Reserved<br>
-        WhatsApp: +91-6000376976
-    </div>
-    """
+    blocks.append(REPORT_FOOTER)
+
+    return REPORT_PAGE.substitute(
+        client_code=client_code,
+        name=name,
+        phone=phone,
+        plan=plan,
+        created_at=created_at,
+        formatted_blocks="".join(blocks)
+    )
 
-    # -------- HTML TEMPLATE --------
-    html_content = f"""
-    <html>
-    <head>
-        <meta charset="utf-8">
-        <style>
-
-        @page {{
-            size: A4;
-            margin: 40px;
-            border: 2px solid #c6a74d;
-
-            @bottom-center {{
-                content: "Page " counter(page) " of " counter(pages);
-                font-size: 11px;
-                color: #777;
-            }}
-        }}
-
-        @font-face {{
-        font-family: 'NotoDev';
-        src: url('file://{font_path}') format('truetype');
-        }}
-
-        body {{
-            font-family: 'NotoDev';
-            margin: 0;
-            background: #faf6ef;
-        }}
-
-        .watermark {{
-            position: fixed;
-            top: 50%;
-            left: 50%;
-            transform: translate(-50%, -50%);
-            font-size: 160px;
-            color: rgba(139,0,0,0.04);
-            z-index: -1;
-        }}
-
-        .cover {{
-            padding: 40px;
-        }}
-
-        .header {{
-            text-align: center;
-            background: linear-gradient(to right, #7b0000, #b22222);
-            color: white;
-            padding: 35px;
-            border-radius: 12px;
-            margin-bottom: 35px;
-        }}
-
-        .title {{
-            font-size: 36px;
-            font-weight: bold;
-            margin-top: 15px;
-        }}
-
-        .subtitle {{
-            font-size: 17px;
-            margin-top: 6px;
-        }}
-
-        .client-box {{
-            background: linear-gradient(to right, #fff8e7, #ffe9c2);
-            padding: 22px 26px;
-            margin: 0 15px 35px 15px;   /* LEFT-RIGHT GAP */
-            border-left: 6px solid #d4af37;
-            border-radius: 12px;
-            box-shadow: 0 4px 12px rgba(0,0,0,0.07);
-        }}
-
-        .section-title {{
-            font-size: 26px;
-            font-weight: bold;
-            color: #8b0000;
-            letter-spacing: 1px;
-            margin-top: 20px;
-            margin-bottom: 25px;
-            border-bottom: 3px solid #d4af37;
-            padding-bottom: 10px;
-        }}
-
-        .section-block {{
-            background: linear-gradient(to bottom, #fffdf9, #ffecc7);
-            padding: 22px 26px;
-            margin: 0 15px 30px 15px;   /* LEFT-RIGHT GAP ADDED */
-            border-left: 6px solid #b8860b;
-            border-radius: 10px;
-            page-break-inside: avoid;
-            box-shadow: 0 6px 16px rgba(0,0,0,0.08);
-        }}
-
-        .page-content {{
-            padding: 0 10px 120px 10px;   /* side breathing space */
-        }}
-
-        .final-footer {{
-            margin: 60px 20px 30px 20px;   /* LEFT RIGHT GAP ADDED */
-            text-align: center;
-            font-size: 12px;
-            color: #777;
-        }}
-
-        .final-footer hr {{
-            border: none;
-            border-top: 1px solid #ddd;
-            margin: 0 40px 15px 40px;  /* IMPORTANT */
-        }}
-
-        .antim-section {{
-            background: linear-gradient(to bottom, #fff8e7, #fbe7c6);
-            margin: 60px 40px;
-            padding: 40px;
-            border-radius: 18px;
-            text-align: center;
-            border: 2px solid #d4af37;
-            box-shadow: 0 8px 25px rgba(0,0,0,0.12);
-        }}
-
-        .antim-title {{
-            font-size: 28px;
-            font-weight: bold;
-            color: #8b0000;
-            margin-bottom: 20px;
-        }}
-
-        .antim-content {{
-            font-size: 18px;
-            line-height: 1.8;
-        }}
-
-        .antim-sign {{
-            margin-top: 30px;
-            font-size: 16px;
-            font-weight: bold;
-            color: #7b0000;
-        }}
-        
-        </style>
-    </head>
-
-    <body>
-
-    <div class="watermark">ॐ</div>
-
-    <!-- COVER PAGE -->
-    <div class="cover">
-
-        <div class="header">
-            <img src="ganesha.png" style="width:100%; border-radius:8px;">
-            <div class="title">आचार्य विशाल वैष्णव</div>
-            <div class="subtitle">हस्तरेखा विशेषज्ञ एवं वैदिक ज्योतिषज्ञ</div>
-        </div>
 
-        <div class="client-box">
-            <b>Client Code:</b> {client_code}<br>
-            <b>Name:</b> {name}<br>
-            <b>Mobile:</b> {phone}<br>
-            <b>Plan:</b> {plan}<br>
-            <b>Date:</b> {created_at}
-        </div>
+def render_report(data, file_path, resources=None, optimize=True):
+    font_config, stylesheet, image_cache = resources or get_report_resources()
 
-    </div>
+    # render beside the old file and swap, so /reports never serves a half-written PDF
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    if optimize:
+        html = HTML(string=build_report_html(data), base_url=REPORT_BASE_PATH, url_fetcher=report_url_fetcher)
+        html.write_pdf(tmp_path, stylesheets=[stylesheet], font_config=font_config, cache=image_cache,
+                       **REPORT_PDF_OPTIONS)
+    else:
+        HTML(string=build_report_html(data), base_url=REPORT_BASE_PATH).write_pdf(
+            tmp_path,
+            stylesheets=[stylesheet],
+            font_config=font_config,
+            cache=image_cache
+        )
+
+    rendered_bytes = os.path.getsize(tmp_path)
+    if optimize:
+        postprocess_pdf(tmp_path)
+    final_bytes = os.path.getsize(tmp_path)
+
+    os.replace(tmp_path, file_path)
+    return rendered_bytes, final_bytes
+
+
+def bench_render(reports):
+    sample = (
+        "AVV-2026-000001", "राम शर्मा", "9876543210", "₹501 – अल्टीमेट प्लान",
+        "\n".join(f"Section {i} – परीक्षण\n" + "हथेली की संरचना संतुलित है। " * 40 for i in range(1, 9))
+        + "\nअंतिम संदेश:\nश्रद्धा और प्रयास।\n– आचार्य विशाल वैष्णव",
+        "2026-10-18 10:00:00",
+    )
+    out = os.path.join(REPORT_DIR, "bench.pdf")
+
+    def run(label, fresh):
+        timings = []
+        for _ in range(reports):
+            t0 = time.perf_counter()
+            render_report(sample, out, build_report_resources() if fresh else None)
+            timings.append((time.perf_counter() - t0) * 1000)
+        print(f"{label:<34}{statistics.median(timings):>10.1f}{min(timings):>10.1f}{max(timings):>10.1f}")
+
+    get_report_resources()
+    print(f"{'per report (' + str(reports) + ' runs)':<34}{'p50 ms':>10}{'min ms':>10}{'max ms':>10}")
+    run("fresh fonts + CSS every render", fresh=True)
+    run("shared per-process resources", fresh=False)
+    os.remove(out)
+
+# ---------- PDF SIZE OPTIMIZATION ----------
+# Reports are opened from WhatsApp on mobile data: keep them small and linearized so page 1 shows before the rest
+# has downloaded. WeasyPrint caps image resolution and recompresses (fonts are subset by default); pikepdf then
+# drops unused and duplicate objects, packs small objects into compressed object streams and linearizes.
+
+REPORT_IMAGE_DPI = int(os.environ.get("REPORT_IMAGE_DPI", "150"))
+REPORT_JPEG_QUALITY = int(os.environ.get("REPORT_JPEG_QUALITY", "80"))
+REPORT_COVER = "ganesha.png"
+REPORT_COVER_MAX_PX = int(os.environ.get("REPORT_COVER_MAX_PX", "1000"))   # the cover spans ~6.5in of the page
+
+REPORT_PDF_OPTIONS = {
+    "optimize_images": True,
+    "jpeg_quality": REPORT_JPEG_QUALITY,
+    "dpi": REPORT_IMAGE_DPI,
+}
 
-    <div style="page-break-after: always;"></div>
+# part of the render cache key: changing any of these re-renders existing reports
+REPORT_PDF_SETTINGS = repr((sorted(REPORT_PDF_OPTIONS.items()), REPORT_COVER_MAX_PX, pikepdf is not None))
 
-    <!-- REPORT -->
-    <div class="report">
+pdf_size_stats = {"reports": 0, "rendered_bytes": 0, "bytes": 0}
 
-        <div class="section-title">Palm Reading Detailed Report</div>
 
-        {formatted_blocks}
+@lru_cache(maxsize=1)
+def report_cover():
+    # downsampled + recompressed once per process; the original stays untouched on disk
+    path = os.path.join(REPORT_BASE_PATH, REPORT_COVER)
+    with open(path, "rb") as f:
+        original = f.read()
 
-    </div>
+    with Image.open(path) as im:
+        has_alpha = im.mode in ("RGBA", "LA") or "transparency" in im.info
+        im = im.convert("RGBA" if has_alpha else "RGB")
+        im.thumbnail((REPORT_COVER_MAX_PX, REPORT_COVER_MAX_PX), Image.LANCZOS)
+
+        out = io.BytesIO()
+        if has_alpha:
+            # the cover sits on the header gradient, so transparency has to survive: palette PNG
+            im.quantize(colors=256, method=Image.Quantize.FASTOCTREE).save(out, "PNG", optimize=True)
+            mime_type = "image/png"
+        else:
+            im.save(out, "JPEG", quality=REPORT_JPEG_QUALITY, optimize=True)
+            mime_type = "image/jpeg"
+
+    if out.tell() >= len(original):
+        return "image/png", original
+    return mime_type, out.getvalue()
+
+
+def report_url_fetcher(url):
+    if url.endswith("/" + REPORT_COVER):
+        mime_type, data = report_cover()
+        return {"string": data, "mime_type": mime_type}
+    return default_url_fetcher(url)
+
+
+def _dedupe_images(pdf):
+    # identical image streams referenced from several pages are kept once
+    seen = {}
+    for page in pdf.pages:
+        xobjects = page.obj.get("/Resources", {}).get("/XObject", {})
+        for name in list(xobjects.keys()):
+            xobject = xobjects[name]
+            if xobject.get("/Subtype") != "/Image":
+                continue
+            digest = hashlib.sha256(xobject.read_raw_bytes())
+            for key in sorted(k for k in xobject.keys() if k != "/Length"):
+                digest.update(f"{key}={xobject[key]}".encode())
+            first = seen.setdefault(digest.hexdigest(), xobject)
+            if first.objgen != xobject.objgen:
+                xobjects[name] = first
+
+
+def postprocess_pdf(path):
+    if pikepdf is None:
+        return
+
+    tmp_path = f"{path}.linearized"
+    with pikepdf.open(path) as pdf:
+        _dedupe_images(pdf)
+        pdf.remove_unreferenced_resources()
+        pdf.save(
+            tmp_path,
+            linearize=True,
+            object_stream_mode=pikepdf.ObjectStreamMode.generate,
+            compress_streams=True,
+        )
+    os.replace(tmp_path, path)
+
+
+def record_pdf_size(client_code, rendered_bytes, final_bytes):
+    # only what the pikepdf pass saves; the image settings already shrank rendered_bytes (see bench-pdf-size)
+    saved = rendered_bytes - final_bytes
+    log.info("report %s: %d bytes from WeasyPrint, %d after pikepdf post-processing (%d saved, %.0f%%)",
+             client_code, rendered_bytes, final_bytes, saved, 100 * saved / rendered_bytes if rendered_bytes else 0)
+
+
+def _record_render_result(future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    result = future.result()
+    if result and "bytes" in result:
+        pdf_size_stats["reports"] += 1
+        pdf_size_stats["rendered_bytes"] += result["rendered_bytes"]
+        pdf_size_stats["bytes"] += result["bytes"]
+
+
+def bench_pdf_size(reports):
+    # average report size as WeasyPrint writes it vs. after optimization, over drafts of varying length.
+    # WeasyPrint caches images by URL with the settings of their first load, so each mode gets its own resources.
+    out = os.path.join(REPORT_DIR, "bench-size.pdf")
+    plain_resources, optimized_resources = build_report_resources(), build_report_resources()
+    plain, optimized, timings = [], [], []
+
+    for i in range(reports):
+        sample = (
+            f"AVV-2026-{i:06d}", "राम शर्मा", "9876543210", "₹501 – अल्टीमेट प्लान",
+            "\n".join(f"Section {s} – परीक्षण\n" + "हथेली की संरचना संतुलित है। " * (10 + 7 * i) for s in range(1, 9))
+            + "\nअंतिम संदेश:\nश्रद्धा और प्रयास।\n– आचार्य विशाल वैष्णव",
+            "2026-10-18 10:00:00",
+        )
+        plain.append(render_report(sample, out, plain_resources, optimize=False)[1])
+        t0 = time.perf_counter()
+        optimized.append(render_report(sample, out, optimized_resources)[1])
+        timings.append((time.perf_counter() - t0) * 1000)
+
+    os.remove(out)
+    before, after = statistics.mean(plain), statistics.mean(optimized)
+    print(f"{reports} reports, linearized: {'yes' if pikepdf is not None else 'no (pip install pikepdf)'}")
+    print(f"average size before: {before / 1024:8.1f} KB")
+    print(f"average size after:  {after / 1024:8.1f} KB  ({100 * (before - after) / before:.0f}% smaller)")
+    print(f"optimized render p50: {statistics.median(timings):.0f} ms")
+
+# ---------- PDF RENDER CACHE ----------
+REPORT_ASSETS = ["NotoSansDevanagari-Regular.ttf", "ganesha.png"]
+
+# any edit to the templates changes this, so stale cached PDFs are re-rendered automatically
+REPORT_TEMPLATE_HASH = hashlib.sha256(
+    "".join([REPORT_STYLESHEET, REPORT_PAGE.template, REPORT_SECTION.template, REPORT_ANTIM.template, REPORT_FOOTER,
+             REPORT_PDF_SETTINGS]).encode()
+).hexdigest()
+
+render_cache_stats = {"hits": 0, "misses": 0}
+
+
+@lru_cache(maxsize=1)
+def report_assets_hash():
+    digest = hashlib.sha256()
+    for asset in REPORT_ASSETS:
+        with open(os.path.join(REPORT_BASE_PATH, asset), "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def report_cache_key(data):
+    # everything that ends up in the PDF: the client fields, the template and the font / cover files
+    digest = hashlib.sha256()
+    digest.update(REPORT_TEMPLATE_HASH.encode())
+    digest.update(report_assets_hash().encode())
+    for value in data:
+        digest.update(b"\0")
+        digest.update(str(value).encode())
+    return digest.hexdigest()
+
+
+def report_is_current(data):
+    client_code = data[0]
+    storage = get_storage()
+    if not storage.exists(report_key(client_code)):
+        return False
+    try:
+        return storage.read_text(report_key(client_code) + ".key").strip() == report_cache_key(data)
+    except FileNotFoundError:
+        return False
 
-    </body>
-    </html>
-    """
 
-    HTML(string=html_content, base_url=base_path).write_pdf(
-        file_path,
-        font_config=font_config
+def generate_pdf_report(client_id):
+
+    data = clients.report_row(client_id)
+
+    if not data:
+        return None
+
+    client_code = data[0]
+    file_name = f"{client_code}.pdf"
+    storage = get_storage()
+    key = report_key(client_code)
+
+    # rendered locally (the report folder, or the S3 cache), then published
+    file_path = storage.local_path(key)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    rendered_bytes, final_bytes = render_report(data, file_path)
+    record_pdf_size(client_code, rendered_bytes, final_bytes)
+    storage.put_file(key, file_path)
+    storage.put_text(key + ".key", report_cache_key(data))
+
+    return {"file": file_name, "rendered_bytes": rendered_bytes, "bytes": final_bytes}
+
+# ---------- PDF RENDER SERVICE ----------
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", str(os.cpu_count() or 2)))
+RENDER_MAX_PENDING = int(os.environ.get("RENDER_MAX_PENDING", "100"))   # queued + rendering jobs
+RENDER_JOB_TTL = int(os.environ.get("RENDER_JOB_TTL", "3600"))          # a job queued / rendering this long was lost
+
+render_executor = None
+render_lock = threading.Lock()
+
+# job state lives in render_jobs, so any web worker can show it and the pending cap holds across all of them;
+# the update only replaces a finished row (or one lost with its worker): one live render per client
+CLAIM_RENDER_SQL = """
+    INSERT INTO render_jobs (client_id, state, error, submitted_at, finished_at, batch_id)
+    VALUES (?, ?, NULL, ?, ?, ?)
+    ON CONFLICT (client_id) DO UPDATE
+    SET state=EXCLUDED.state, error=NULL, submitted_at=EXCLUDED.submitted_at, finished_at=EXCLUDED.finished_at,
+        batch_id=EXCLUDED.batch_id
+    WHERE render_jobs.state NOT IN ('queued', 'rendering') OR render_jobs.submitted_at < ?
+    RETURNING client_id
+"""
+PENDING_RENDERS_SQL = "SELECT COUNT(*) FROM render_jobs WHERE state IN ('queued', 'rendering') AND submitted_at >= ?"
+
+
+class RenderQueueFull(Exception):
+    pass
+
+
+def _render_worker_init():
+    # pay the WeasyPrint / Pango / fontconfig start-up and the stylesheet parse once per worker
+    font_config, stylesheet, image_cache = get_report_resources()
+    HTML(string="<p>ॐ</p>", base_url=REPORT_BASE_PATH).write_pdf(
+        stylesheets=[stylesheet],
+        font_config=font_config,
+        cache=image_cache
     )
 
-    return file_name
 
-# ---------- HELPERS ----------
-def get_db():
-    database_url = os.environ.get("DATABASE_URL")
-    result = urlparse(database_url)
+def _render_worker_ping():
+    return os.getpid()
+
+
+def get_render_executor():
+    global render_executor
+
+    with render_lock:
+        if render_executor is None:
+            render_executor = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS,
+                initializer=_render_worker_init
+            )
+        return render_executor
+
+
+def set_render_state(client_id, state, error=None):
+    finished_at = datetime.now(timezone.utc) if state in ("done", "failed") else None
+    with db_conn() as conn:
+        c = conn.cursor()
+        c.execute("UPDATE render_jobs SET state=?, error=?, finished_at=? WHERE client_id=?",
+                  (state, error, finished_at, client_id))
+        conn.commit()
+
+
+def render_job(client_id):
+    # runs in a render worker process
+    set_render_state(client_id, "rendering")
+    return generate_pdf_report(client_id)
+
+
+def _finish_render_job(client_id, future):
+    if future.cancelled():
+        state, error = "failed", "cancelled"
+    elif future.exception() is not None:
+        state, error = "failed", str(future.exception())
+    elif future.result() is None:
+        state, error = "failed", "client not found"
+    else:
+        state, error = "done", None
+    set_render_state(client_id, state, error)
+
+
+def submit_render(client_id, data=None, batch_id=None):
+    # batch_id: the caller already checked the PDF is stale and bounds its own jobs in flight.
+    # Returns the future of a render this process started, None if the PDF is current or already on its way.
+    executor = get_render_executor()
+    if data is None:
+        data = clients.report_row(client_id)
+
+    # unchanged draft / client / template → the existing PDF is already the answer.
+    # Checked outside the transaction: with S3 storage this is two round trips.
+    current = batch_id is None and data is not None and report_is_current(data)
+
+    now = datetime.now(timezone.utc)
+    lost = now - timedelta(seconds=RENDER_JOB_TTL)
+
+    with db_conn() as conn:
+        c = conn.cursor()
+        c.execute(CLAIM_RENDER_SQL,
+                  (client_id, "done" if current else "queued", now, now if current else None, batch_id, lost))
+        claimed = c.fetchone() is not None
+
+        if not claimed and batch_id is not None:
+            # already on its way: the batch counts it all the same
+            c.execute("UPDATE render_jobs SET batch_id=? WHERE client_id=?", (batch_id, client_id))
+        if claimed and not current and batch_id is None:
+            c.execute(PENDING_RENDERS_SQL, (lost,))
+            pending = c.fetchone()[0] - 1
+            if pending >= RENDER_MAX_PENDING:
+                conn.rollback()
+                raise RenderQueueFull(f"{pending} reports already waiting")
+        conn.commit()
+
+    if not claimed:
+        return None
+    if current:
+        render_cache_stats["hits"] += 1
+        return None
+
+    render_cache_stats["misses"] += 1
+    future = executor.submit(render_job, client_id)
+    future.add_done_callback(partial(_finish_render_job, client_id))
+    future.add_done_callback(_record_render_result)
+    return future
+
+
+def render_job_state(client_id):
+    with db_conn() as conn:
+        c = conn.cursor()
+        c.execute("SELECT state, error, submitted_at < ? FROM render_jobs WHERE client_id=?",
+                  (datetime.now(timezone.utc) - timedelta(seconds=RENDER_JOB_TTL), client_id))
+        row = c.fetchone()
+
+    if row is None:
+        return None, None
+
+    state, error, expired = row
+    if expired and state in ("queued", "rendering"):
+        return "failed", "render worker stopped"
+    return state, error
+
+
+@app.get("/admin/metrics/render")
+def render_metrics():
+    # jobs submitted within RENDER_JOB_TTL, by any web worker
+    with db_conn() as conn:
+        c = conn.cursor()
+        c.execute("SELECT state, COUNT(*) FROM render_jobs WHERE submitted_at >= ? GROUP BY state",
+                  (datetime.now(timezone.utc) - timedelta(seconds=RENDER_JOB_TTL),))
+        states = dict(c.fetchall())
+
+    return {
+        "workers": RENDER_WORKERS,
+        "jobs": states,
+        "cache_hits": render_cache_stats["hits"],
+        "cache_misses": render_cache_stats["misses"],
+        "pdf_reports": pdf_size_stats["reports"],
+        "pdf_avg_rendered_bytes": pdf_size_stats["rendered_bytes"] // max(pdf_size_stats["reports"], 1),
+        "pdf_avg_bytes": pdf_size_stats["bytes"] // max(pdf_size_stats["reports"], 1),
+    }
+
+
+@app.on_event("startup")
+def start_render_service():
+    executor = get_render_executor()
+    # one ping per worker forces the pool to fork and warm every process up front
+    for _ in range(RENDER_WORKERS):
+        executor.submit(_render_worker_ping)
+
+
+@app.on_event("shutdown")
+def stop_render_service():
+    if render_executor is not None:
+        render_executor.shutdown(wait=False, cancel_futures=True)
+
+# ---------- BATCH RENDERING ----------
+# batch jobs in flight at once: keeps every worker busy while a report opened by hand queues behind only a few
+RENDER_BATCH_CONCURRENCY = int(os.environ.get("RENDER_BATCH_CONCURRENCY", str(RENDER_WORKERS * 2)))
+
+def reviewed_reports(force=False):
+    # (client_id, report row) for every Reviewed client whose PDF is missing or out of date
+    return [(r[0], r[1:]) for r in clients.iter_reviewed() if force or not report_is_current(r[1:])]
+
+
+def render_batch_cli(concurrency, force=False):
+    todo = reviewed_reports(force)
+    total = len(todo)
+
+    if not total:
+        print("all Reviewed reports are up to date")
+        return
+
+    print(f"rendering {total} reports on {concurrency} processes")
+    start = time.monotonic()
+    failed = 0
+
+    with ProcessPoolExecutor(max_workers=concurrency, initializer=_render_worker_init) as executor:
+        futures = {executor.submit(generate_pdf_report, client_id): data[0] for client_id, data in todo}
+
+        for done, future in enumerate(as_completed(futures), 1):
+            client_code = futures[future]
+            error = future.exception()
+            if error is not None:
+                failed += 1
+
+            rate = done / (time.monotonic() - start)
+            if error is not None:
+                status = f"FAILED: {error}"
+            else:
+                result = future.result()
+                status = f"ok {result['rendered_bytes'] // 1024} -> {result['bytes'] // 1024} KB"
+            print(f"[{done}/{total}] {client_code} {status}  ({rate:.2f} reports/sec)", flush=True)
+
+    elapsed = time.monotonic() - start
+    print(f"{total - failed} rendered, {failed} failed in {elapsed:.1f}s ({total / elapsed:.2f} reports/sec)")
+
+
+def claim_render_batch():
+    # the batch row is the lock: one batch at a time across every web worker; one whose worker died lapses
+    now = datetime.now(timezone.utc)
+    with db_conn() as conn:
+        c = conn.cursor()
+        c.execute("""
+            UPDATE render_batch
+            SET batch_id=batch_id+1, total=NULL, running=?, started_at=?, heartbeat_at=?
+            WHERE id=1 AND (running=? OR heartbeat_at < ?)
+            RETURNING batch_id
+        """, (True, now, now, False, now - timedelta(seconds=RENDER_JOB_TTL)))
+        row = c.fetchone()
+        conn.commit()
+    return row[0] if row else None
+
+
+def update_render_batch(batch_id, **fields):
+    fields["heartbeat_at"] = datetime.now(timezone.utc)
+    with db_conn() as conn:
+        c = conn.cursor()
+        c.execute(f"UPDATE render_batch SET {', '.join(f'{name}=?' for name in fields)} WHERE id=1 AND batch_id=?",
+                  (*fields.values(), batch_id))
+        conn.commit()
+
+
+def run_render_batch(batch_id):
+    # runs after the response: every stale report goes to the shared render workers, RENDER_BATCH_CONCURRENCY at a time
+    slots = threading.BoundedSemaphore(RENDER_BATCH_CONCURRENCY)
+    try:
+        todo = reviewed_reports()       # the one currency check per client
+        update_render_batch(batch_id, total=len(todo))
+        for client_id, data in todo:
+            slots.acquire()
+            future = submit_render(client_id, data, batch_id)
+            update_render_batch(batch_id)
+            if future is None:          # already queued by someone else
+                slots.release()
+            else:
+                future.add_done_callback(lambda _: slots.release())
+    except Exception:
+        log.exception("render batch stopped")
+    finally:
+        update_render_batch(batch_id, running=False)
+
+
+def render_batch_progress():
+    lost = datetime.now(timezone.utc) - timedelta(seconds=RENDER_JOB_TTL)
+    with db_conn() as conn:
+        c = conn.cursor()
+        c.execute("SELECT batch_id, total, running, started_at, heartbeat_at < ? FROM render_batch WHERE id=1", (lost,))
+        batch_id, total, running, started_at, stalled = c.fetchone()
+        c.execute("""
+            SELECT CASE WHEN state IN ('queued', 'rendering') AND submitted_at < ? THEN 'failed' ELSE state END,
+                   COUNT(*)
+            FROM render_jobs WHERE batch_id=?
+            GROUP BY 1
+        """, (lost, batch_id))
+        found = dict(c.fetchall())
+
+    counts = {"queued": 0, "rendering": 0, "done": 0, "failed": 0}
+    for state, n in found.items():
+        counts[state] += n
+    running = bool(running) and not stalled
+    # found but not handed to the workers yet
+    if running:
+        counts["queued"] += (total or 0) - sum(found.values())
+
+    if isinstance(started_at, str):
+        started_at = datetime.fromisoformat(started_at)
+    finished = counts["done"] + counts["failed"]
+    elapsed = (datetime.now(timezone.utc) - started_at).total_seconds() if started_at else 0
+
+    return {
+        "total": total or 0,
+        "scanning": running and total is None,
+        **counts,
+        "elapsed_sec": round(elapsed, 1),
+        "reports_per_sec": round(finished / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+@app.post("/admin/render-batch")
+def start_render_batch():
+    # a second click (on any worker) while a batch is still being handed out just shows its progress
+    batch_id = claim_render_batch()
 
-    conn = psycopg2.connect(
-        database=result.path[1:],
-        user=result.username,
-        password=result.password,
-        host=result.hostname,
-        port=result.port,
-        sslmode="require"
+    return RedirectResponse(
+        "/admin/render-batch", status_code=302,
+        background=BackgroundTask(run_render_batch, batch_id) if batch_id is not None else None
     )
 
-    return conn
+
+@app.get("/admin/render-batch", response_class=HTMLResponse)
+def render_batch_status():
+    p = render_batch_progress()
+    running = p["scanning"] or p["queued"] + p["rendering"] > 0
+
+    return f"""
+<html>
+<head>
+<title>Batch PDF Rendering</title>
+{'<meta http-equiv="refresh" content="3">' if running else ''}
+</head>
+<body style="font-family:Arial;background:#f6efe9;">
+<div style="width:480px;margin:80px auto;background:white;padding:25px;border-radius:10px;box-shadow:0 0 12px rgba(0,0,0,0.15);">
+  <h2 style="color:#8b0000;text-align:center;">🖨 Batch PDF Rendering</h2>
+  <p><b>Reports in batch:</b> {"finding stale reports…" if p["scanning"] else p["total"]}</p>
+  <p>⏳ Queued: {p["queued"]} &nbsp; ⚙️ Rendering: {p["rendering"]} &nbsp; ✅ Done: {p["done"]} &nbsp; ❌ Failed: {p["failed"]}</p>
+  <p><b>Throughput:</b> {p["reports_per_sec"]} reports/sec ({p["elapsed_sec"]}s)</p>
+  <p style="text-align:center;"><a href="/admin/dashboard">⬅ डैशबोर्ड पर जाएँ</a></p>
+</div>
+</body>
+</html>
+"""
+
+# ---------- BACKGROUND JOB QUEUE ----------
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "1"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+JOB_BACKOFF_BASE = float(os.environ.get("JOB_BACKOFF_BASE", "10"))     # seconds, doubled per attempt
+JOB_BACKOFF_MAX = float(os.environ.get("JOB_BACKOFF_MAX", "3600"))
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", "600"))    # running jobs older than this are requeued
+JOB_RETENTION_DAYS = int(os.environ.get("JOB_RETENTION_DAYS", "7"))
+
+JOB_HANDLERS = {
+    "ai_draft": generate_ai_draft,
+}
+
+
+def enqueue_jobs(c, kind, client_ids):
+    # runs on the caller's cursor so the jobs commit atomically with the state change that caused them
+    if not client_ids:
+        return
+    c.execute(f"""
+        INSERT INTO jobs (kind, client_id, max_attempts)
+        VALUES {",".join(["(?, ?, ?)"] * len(client_ids))}
+        ON CONFLICT (kind, client_id) WHERE state IN ('queued', 'running') DO NOTHING
+    """, [v for client_id in client_ids for v in (kind, client_id, JOB_MAX_ATTEMPTS)])
+
+
+def claim_job(worker_id):
+    with db_conn() as conn:
+        c = conn.cursor()
+        c.execute("""
+            UPDATE jobs
+            SET state='running', attempts=attempts+1, locked_at=now(), locked_by=?
+            WHERE id = (
+                SELECT id FROM jobs
+                WHERE state='queued' AND run_at <= now()
+                ORDER BY run_at, id
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING id, kind, client_id, attempts, max_attempts
+        """, (worker_id,))
+        job = c.fetchone()
+        conn.commit()
+    return job
+
+
+def complete_job(job_id):
+    with db_conn() as conn:
+        c = conn.cursor()
+        c.execute("""
+            UPDATE jobs
+            SET state='done', finished_at=now(), locked_at=NULL, locked_by=NULL, last_error=NULL
+            WHERE id=?
+        """, (job_id,))
+        conn.commit()
+
+
+def fail_job(job_id, attempts, max_attempts, error):
+    delay = min(JOB_BACKOFF_BASE * 2 ** (attempts - 1), JOB_BACKOFF_MAX)
+    state = "dead" if attempts >= max_attempts else "queued"
+    run_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+
+    with db_conn() as conn:
+        c = conn.cursor()
+        c.execute("""
+            UPDATE jobs
+            SET state=?, run_at=?,
+                locked_at=NULL, locked_by=NULL, last_error=?,
+                finished_at=CASE WHEN ?='dead' THEN now() END
+            WHERE id=?
+        """, (state, run_at, error[:2000], state, job_id))
+        conn.commit()
+
+
+def requeue_stale_jobs():
+    # a worker that died mid-job leaves it 'running'; hand it back once the lease runs out
+    now = datetime.now(timezone.utc)
+
+    with db_conn() as conn:
+        c = conn.cursor()
+        c.execute("""
+            UPDATE jobs
+            SET state=CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'queued' END,
+                locked_at=NULL, locked_by=NULL, last_error='lease expired'
+            WHERE state='running' AND locked_at < ?
+        """, (now - timedelta(seconds=JOB_LEASE_SECONDS),))
+        requeued = c.rowcount
+        c.execute("""
+            DELETE FROM jobs
+            WHERE state='done' AND finished_at < ?
+        """, (now - timedelta(days=JOB_RETENTION_DAYS),))
+        conn.commit()
+    return requeued
+
+
+def run_job_worker(worker_id, stop):
+    log.info("job worker %s started", worker_id)
+    next_maintenance = 0
+    next_reconcile = time.monotonic() + ROLLUP_RECONCILE_INTERVAL
+
+    while not stop.is_set():
+        if time.monotonic() >= next_maintenance:
+            requeued = requeue_stale_jobs()
+            if requeued:
+                log.warning("requeued %d stale jobs", requeued)
+            clients.purge_idempotency_keys()
+            next_maintenance = time.monotonic() + JOB_LEASE_SECONDS / 2
+
+        if ROLLUP_RECONCILE_INTERVAL and time.monotonic() >= next_reconcile:
+            drift = reconcile_rollups()
+            if drift:
+                log.warning("rollup reconcile fixed %d drifted entries", drift)
+            next_reconcile = time.monotonic() + ROLLUP_RECONCILE_INTERVAL
+
+        job = claim_job(worker_id)
+        if job is None:
+            stop.wait(JOB_POLL_INTERVAL)
+            continue
+
+        job_id, kind, client_id, attempts, max_attempts = job
+        start = time.monotonic()
+
+        try:
+            JOB_HANDLERS[kind](client_id)
+        except Exception as e:
+            log.exception("job %s (%s, client %s) failed on attempt %d", job_id, kind, client_id, attempts)
+            fail_job(job_id, attempts, max_attempts, f"{type(e).__name__}: {e}")
+        else:
+            complete_job(job_id)
+            log.info("job %s (%s, client %s) done in %.2fs", job_id, kind, client_id, time.monotonic() - start)
+
+    log.info("job worker %s stopped", worker_id)
+
+
+def _job_worker_process(index):
+    stop = threading.Event()
+    # finish the current job on SIGTERM/SIGINT instead of dying half-way through it
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    run_job_worker(f"{socket.gethostname()}:{os.getpid()}:{index}", stop)
+
+
+def run_job_workers(processes):
+    workers = [
+        multiprocessing.Process(target=_job_worker_process, args=(i,), name=f"job-worker-{i}")
+        for i in range(processes)
+    ]
+    for p in workers:
+        p.start()
+
+    try:
+        for p in workers:
+            p.join()
+    except KeyboardInterrupt:
+        for p in workers:
+            p.terminate()
+        for p in workers:
+            p.join()
+
 
 # ---------- ROOT ----------
 @app.get("/")
 def root():
     return {"status": "Backend with Database running"}
 
+@app.get("/admin/metrics/db")
+def db_metrics():
+    stats = get_database().stats()
+    if async_db_enabled():
+        stats["async_pool"] = get_async_database().stats()
+    return stats
+
 # ---------- ADMIN LOGIN ----------
 @app.get("/admin", response_class=HTMLResponse)
 def admin_login():
@@ -583,206 +3480,359 @@ def admin_login_post(username: str = Form(...), password: str = Form(...)):
         return RedirectResponse("/admin/dashboard", status_code=302)
     return HTMLResponse("<h3>Invalid Login</h3>")
 
-# ---------- DASHBOARD ----------
-@app.get("/admin/dashboard", response_class=HTMLResponse)
-def dashboard(
-    q: str = Query(None),
-    plan: str = Query(None),
-    source: str = Query(None),
-    status: str = Query(None),
-    payment: str = Query(None),   # 🔥 ADD THIS
-    start_date: str = Query(None),
-    end_date: str = Query(None)
-):
-    
-    conn = get_db()
-    c = conn.cursor()
-
-    sql = "SELECT id,client_code,name,phone,plan,source,status,created_at,payment_status,priority FROM clients WHERE 1=1"
-    params = []
+# ---------- CLIENT SEARCH ----------
+PHONE_QUERY_RE = re.compile(r"^[+\d\s\-()]+$")
+PHONE_COUNTRY_CODE_RE = re.compile(r"^\s*(?:(?:\+|00)\s*91|91(?=[\s\-(]))")
+
+
+def normalize_search_text(value):
+    # NFC so a name typed with decomposed matras matches the stored (composed) form
+    return unicodedata.normalize("NFC", value).strip().lower()
+
+
+def normalize_phone(value):
+    # a typed +91 / 0091 / "91 " is the country code however few digits follow it ("+91 98765");
+    # glued to the number, 91 is only taken as one when there are too many digits for a mobile
+    digits = re.sub(r"\D", "", PHONE_COUNTRY_CODE_RE.sub("", value))
+    if len(digits) > 10 and digits.startswith("91"):
+        digits = digits[2:]
+    return digits.lstrip("0")       # trunk prefix; no mobile number starts with 0
+
+
+def client_search_clause(q, dialect="postgres"):
+    text = normalize_search_text(q)
+    digits = normalize_phone(q) if PHONE_QUERY_RE.match(q) else ""
+    trigram = dialect == "postgres"
+
+    # on Postgres every branch is served by an index: trigram GIN for name/code, btree prefix for phone.
+    # SQLite has no pg_trgm, so name/code fall back to LIKE scans (fine at laptop sizes) and fuzzy matching is off.
+    where = ["lower(name) LIKE ?", "upper(client_code) LIKE ?"]
+    where_params = [f"%{text}%", f"%{text.upper()}%"]
+    if trigram:
+        where.append("lower(name) % ?")
+        where_params.append(text)
+
+    phone_rank = "0"
+    phone_params = []
+    if len(digits) >= 3:
+        where.append("phone_norm LIKE ?")
+        where_params.append(f"{digits}%")
+        phone_rank = "CASE WHEN phone_norm LIKE ? THEN 0.9 ELSE 0 END"
+        phone_params = [f"{digits}%"]
+
+    rank = f"""{"GREATEST" if trigram else "MAX"}(
+        CASE WHEN upper(client_code) = ? THEN 1.0 WHEN upper(client_code) LIKE ? THEN 0.8 ELSE 0 END,
+        CASE WHEN lower(name) LIKE ? THEN 0.7 ELSE 0 END,
+        {"similarity(lower(name), ?)" if trigram else "0"},
+        {phone_rank}
+    )"""
+    rank_params = [text.upper(), f"%{text.upper()}%", f"{text}%"] + ([text] if trigram else []) + phone_params
+
+    return "(" + " OR ".join(where) + ")", where_params, rank, rank_params
+
+
+def bench_search(rows, queries):
+    if get_database().dialect != "postgres":
+        raise SystemExit("bench-search measures the pg_trgm indexes and needs a Postgres DATABASE_URL")
+
+    names = ["राम", "सीता", "मोहन", "गीता", "अर्जुन", "Rahul", "Priya", "Amit", "Sneha", "Vikas"]
+    surnames = ["शर्मा", "वर्मा", "गुप्ता", "वैष्णव", "Sharma", "Verma", "Patel", "Singh", "Joshi", "Mehta"]
+
+    with db_conn() as conn:
+        c = conn.cursor()
+
+        # a temp table shadows public.clients for this session only, so the real query runs against it
+        c.execute("CREATE TEMP TABLE clients (LIKE public.clients INCLUDING DEFAULTS INCLUDING GENERATED)")
+        start = time.perf_counter()
+        c.execute("""
+            INSERT INTO clients (id, client_code, name, phone, plan, source, status, payment_status, priority)
+            SELECT g,
+                   'AVV-2026-' || lpad(g::text, 7, '0'),
+                   (?::text[])[1 + g % 10] || ' ' || (?::text[])[1 + (g / 10) % 10] || ' ' || g,
+                   CASE WHEN g % 2 = 0 THEN '+91 ' ELSE '' END || (9000000000 + g)::text,
+                   '₹51 – बेसिक प्लान', 'Website', 'Pending', 'Pending', 1 + g % 4
+            FROM generate_series(1, ?) g
+        """, (names, surnames, rows))
+        for sql in SEARCH_INDEX_SQL:
+            c.execute(sql)
+        c.execute("ANALYZE clients")
+        print(f"seeded {rows} rows + indexes in {time.perf_counter() - start:.1f}s")
+
+        samples = [
+            "राम", "वैष्णव", "सीता शर्मा", "Rahul", "patel", "shrma",
+            "AVV-2026-0001", "09000042", "+91 90000", "9000012", "90000-45",
+        ]
+        timings = {}
+        for i in range(queries):
+            q = samples[i % len(samples)]
+            where, where_params, rank, rank_params = client_search_clause(q)
+            t0 = time.perf_counter()
+            c.execute(
+                f"SELECT id FROM clients WHERE {where} ORDER BY {rank} DESC, priority ASC, id DESC LIMIT 50",
+                where_params + rank_params
+            )
+            c.fetchall()
+            timings.setdefault(q, []).append((time.perf_counter() - t0) * 1000)
+
+        conn.rollback()
+
+    print(f"{'query':<16}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for q, ms in timings.items():
+        ms.sort()
+        p95 = ms[max(0, int(len(ms) * 0.95) - 1)]
+        print(f"{q:<16}{statistics.median(ms):>10.2f}{p95:>10.2f}{ms[-1]:>10.2f}")
+
+# ---------- SUMMARY STATS ----------
+STATS_REVENUE_DAYS = int(os.environ.get("STATS_REVENUE_DAYS", "7"))                  # shown on the dashboard
+ROLLUP_RECONCILE_INTERVAL = int(os.environ.get("ROLLUP_RECONCILE_INTERVAL", "3600"))  # seconds, per job worker
+
+
+def revenue_since(days):
+    return (datetime.now(IST).date() - timedelta(days=days - 1)).isoformat()
+
+
+def summary_stats(stat_rows, revenue_rows, days):
+    stats = {dimension: {} for dimension, _ in ROLLUP_DIMENSIONS}
+    catalog = plan_catalog()
+    for dimension, value, total in stat_rows:
+        if dimension == "plan" and value.isdigit() and int(value) in catalog:
+            value = catalog[int(value)].code
+        stats[dimension][value or "none"] = total
+
+    today = datetime.now(IST).date().isoformat()
+    daily = [{"day": str(day), "payments": payments, "revenue": revenue} for day, payments, revenue in revenue_rows]
+    return {
+        "clients": sum(stats["status"].values()),
+        **stats,
+        "revenue": {
+            "days": days,
+            "total": sum(d["revenue"] for d in daily),
+            "payments": sum(d["payments"] for d in daily),
+            "today": next((d["revenue"] for d in daily if d["day"] == today), 0),
+            "daily": daily,
+        },
+    }
 
-    if q:
-        sql += " AND (name LIKE ? OR client_code LIKE ? OR phone LIKE ?)"
-        params.extend([f"%{q}%", f"%{q}%", f"%{q}%"])
 
-    if plan:
-        sql += " AND plan=?"
-        params.append(plan)
+def reconcile_rollups():
+    # recount both rollups from clients; returns how many entries had drifted (0 = triggers kept up)
+    database = get_database()
+    stats_sql, revenue_sql = rollup_recount_sql(database.dialect)
 
-    if source:
-        sql += " AND source=?"
-        params.append(source)
+    with db_conn() as conn:
+        c = conn.cursor()
+        if database.dialect == "postgres":
+            # writers' triggers queue behind this lock, so no delta lands between the recount and the rewrite
+            c.execute("LOCK TABLE client_stats, daily_revenue IN EXCLUSIVE MODE")
+        else:
+            c.execute("BEGIN IMMEDIATE")
+
+        c.execute(ROLLUP_STATS_SQL)
+        stored = {(d, v): n for d, v, n in c.fetchall()}
+        c.execute(stats_sql)
+        counted = {(d, v): n for d, v, n in c.fetchall()}
+
+        c.execute("SELECT day, payments, revenue FROM daily_revenue WHERE payments <> 0 OR revenue <> 0")
+        stored_revenue = {str(day): (payments, revenue) for day, payments, revenue in c.fetchall()}
+        c.execute(revenue_sql)
+        counted_revenue = {str(day): (payments, revenue) for day, payments, revenue in c.fetchall()}
+
+        drift = sum(stored.get(k, 0) != counted.get(k, 0) for k in stored.keys() | counted.keys())
+        drift += sum(
+            stored_revenue.get(k, (0, 0)) != counted_revenue.get(k, (0, 0))
+            for k in stored_revenue.keys() | counted_revenue.keys()
+        )
+
+        if drift:
+            c.execute("DELETE FROM client_stats")
+            c.executemany("INSERT INTO client_stats (dimension, value, total) VALUES (?, ?, ?)",
+                          [(d, v, n) for (d, v), n in counted.items()])
+            c.execute("DELETE FROM daily_revenue")
+            c.executemany("INSERT INTO daily_revenue (day, payments, revenue) VALUES (?, ?, ?)",
+                          [(day, p, r) for day, (p, r) in counted_revenue.items()])
+        conn.commit()
 
-    if status:
-        sql += " AND status=?"
-        params.append(status)
+    return drift
 
-    if payment:
-        sql += " AND payment_status=?"
-        params.append(payment)
 
-    if start_date:
-        sql += " AND created_at >= ?"
-        params.append(start_date + " 00:00:00")
+@app.get("/admin/stats")
+async def admin_stats(days: int = Query(30)):
+    days = max(1, min(days, 366))
+    stat_rows, revenue_rows = await aclients.rollups(revenue_since(days))
+    return summary_stats(stat_rows, revenue_rows, days)
 
-    if end_date:
-        sql += " AND created_at <= ?"
-        params.append(end_date + " 23:59:59")
 
-    sql += " ORDER BY priority ASC, id DESC"
+def dashboard_stats_html(stats):
+    def counts(dimension, labels=None):
+        return " · ".join(f"{(labels or {}).get(k, k)} <b>{v}</b>" for k, v in sorted(stats[dimension].items()))
 
-    c.execute(sql, params)
-    rows_db = c.fetchall()
-    conn.close()
+    plan_labels = {p.code: p.label for p in plan_catalog().values()}
+    revenue = stats["revenue"]
+    return f"""
+  <div class="stats">
+    <span>Clients <b>{stats["clients"]}</b></span>
+    <span>{counts("status")}</span>
+    <span>{counts("payment_status")}</span>
+    <span>{counts("source")}</span>
+    <span>{counts("plan", plan_labels)}</span>
+    <span>Today <b>₹{revenue["today"]}</b> · {revenue["days"]} days <b>₹{revenue["total"]}</b> ({revenue["payments"]} payments)</span>
+  </div>
+"""
 
-    rows = ""
-    for r in rows_db:
+# ---------- DASHBOARD ----------
+DASHBOARD_PAGE_SIZE = int(os.environ.get("DASHBOARD_PAGE_SIZE", "50"))
+DASHBOARD_MAX_PAGE_SIZE = int(os.environ.get("DASHBOARD_MAX_PAGE_SIZE", "500"))
+DASHBOARD_STREAM_CHUNK = int(os.environ.get("DASHBOARD_STREAM_CHUNK", "500"))     # rows per streamed chunk
 
-        # r index mapping:
-        # 0=id
-        # 1=client_code
-        # 2=name
-        # 3=phone
-        # 4=plan
-        # 5=source
-        # 6=status
-        # 7=created_at
-        # 8=payment_status
-        # 9=priority
 
-        payment_status = r[8]
+def parse_page_cursor(value, size=2):
+    # cursor = "<priority>.<id>" of the row at the page edge; "<score>.<priority>.<id>" on search pages
+    try:
+        key = tuple(int(part) for part in value.split("."))
+    except (AttributeError, ValueError):
+        return None
+    return key if len(key) == size else None
 
-        if payment_status == "Paid":
-            payment_badge = "🟢 Paid"
-        else:
-            payment_badge = f"""
-            🔴 Pending
-            <form method="post" action="/admin/mark-paid/{r[0]}" style="display:inline;">
-                <button style="background:#28a745;color:white;border:none;padding:4px 8px;border-radius:4px;cursor:pointer;">
-                    Mark Paid
-                </button>
-            </form>
-            """
 
-        dt = datetime.strptime(r[7], "%Y-%m-%d %H:%M:%S")
-        formatted_date = dt.strftime("%d-%m-%Y %I:%M %p")
+def page_cursor(row):
+    # DASHBOARD_COLUMNS, plus the search score on search pages
+    key = (row[9], row[0]) if len(row) == 10 else (row[10], row[9], row[0])
+    return ".".join(map(str, key))
 
-        rows += f"""
-        <tr>
-            <td>{r[1]}</td>
-            <td>{r[2]}</td>
-            <td>{r[4]}</td>
-            <td>{r[5]}</td>
-            <td>{r[6]}</td>
-            <td>{r[3]}</td>
-            <td>{payment_badge}</td>
-            <td>{formatted_date}</td>
-            <td><a href="/admin/client/{r[0]}">View</a></td>
-        </tr>
-        """
 
-    return f"""
-<html>
-<head>
-<title>Admin Dashboard</title>
-<style>
-body {{
+DASHBOARD_STYLESHEET = """
+body {
   font-family: Arial, sans-serif;
   background: #f6efe9;
   margin: 0;
   padding: 0;
-}}
+}
 
-.header {{
+.header {
   background: #8b0000;
   color: white;
   padding: 15px 25px;
   font-size: 20px;
-}}
+}
 
-.header-inner{{
+.header-inner{
   text-align: center;
-}}
+}
 
-.header .title{{
+.header .title{
   font-size: 22px;
   font-weight: bold;
-}}
+}
 
-.header .subtitle{{
+.header .subtitle{
   font-size: 14px;
   margin-top: 4px;
   opacity: 0.9;
-}}
+}
 
-.header span {{
+.header span {
   font-size: 14px;
   display: block;
   opacity: 0.9;
-}}
+}
 
-.container {{
+.container {
   padding: 25px;
-}}
+}
 
-.top-actions {{
+.top-actions {
   margin-bottom: 15px;
-}}
+}
 
-.top-actions a {{
+.top-actions a {
   background: #8b0000;
   color: white;
   padding: 8px 14px;
   text-decoration: none;
   border-radius: 5px;
   font-size: 14px;
-}}
+}
 
-table {{
+table {
   width: 100%;
   border-collapse: collapse;
   background: white;
   box-shadow: 0 0 10px rgba(0,0,0,0.1);
-}}
+}
 
-th {{
+th {
   background: #f1e2d3;
   color: #333;
   padding: 10px;
   text-align: left;
-}}
+}
 
-td {{
+td {
   padding: 10px;
   border-top: 1px solid #ddd;
-}}
+}
 
-tr:hover {{
+tr:hover {
   background: #faf3ec;
-}}
+}
 
-.status-pending {{
+.status-pending {
   color: #d35400;
   font-weight: bold;
-}}
+}
 
-.status-completed {{
+.status-completed {
   color: green;
   font-weight: bold;
-}}
+}
 
-.status-reviewed {{
+.status-reviewed {
   color: #2980b9;
   font-weight: bold;
-}}
+}
 
-.action-link {{
+.action-link {
   color: #8b0000;
   text-decoration: none;
   font-weight: bold;
-}}
+}
 
-</style>
+.stats {
+  display: flex;
+  flex-wrap: wrap;
+  gap: 8px 20px;
+  background: white;
+  padding: 10px 15px;
+  margin-bottom: 15px;
+  border-radius: 5px;
+  font-size: 14px;
+  box-shadow: 0 0 10px rgba(0,0,0,0.05);
+}
+
+.pager {
+  margin-top: 15px;
+  display: flex;
+  justify-content: space-between;
+}
+
+.pager a {
+  background: #8b0000;
+  color: white;
+  padding: 6px 12px;
+  text-decoration: none;
+  border-radius: 5px;
+  font-size: 14px;
+}
+
+"""
+
+# compiled once at import; the page goes out as head -> row chunks -> tail
+DASHBOARD_HEAD = string.Template("""
+<html>
+<head>
+<title>Admin Dashboard</title>
+<style>
+$stylesheet</style>
 </head>
 
 <body>
@@ -798,43 +3848,48 @@ tr:hover {{
 
 
 <div class="container">
-
+$stats
   <div class="top-actions">
     <a href="/admin/add-client">➕ Add New Client (Manual)</a>
+    <a href="/admin/export.csv?$export_query">⬇ Export CSV</a>
+    <a href="/admin/export.xlsx?$export_query" title="For larger lists use CSV">⬇ Excel (up to $xlsx_max_rows rows)</a>
+    <form method="post" action="/admin/render-batch" style="display:inline;">
+      <button style="background:#6f42c1;color:white;border:none;padding:8px 14px;border-radius:5px;font-size:14px;cursor:pointer;">
+        🖨 Render All Reviewed PDFs
+      </button>
+    </form>
+    <form id="bulk-paid" method="post" action="/admin/mark-paid" style="display:inline;">
+      <button style="background:#28a745;color:white;border:none;padding:8px 14px;border-radius:5px;font-size:14px;cursor:pointer;">
+        ✅ Mark Selected Paid
+      </button>
+    </form>
   </div>
 
 <form method="get" style="margin-bottom:15px;">
-  <input type="text" name="q" placeholder="Client Code / Name" value="{q or ''}">
+  <input type="text" name="q" placeholder="Client Code / Name / Mobile" value="$q">
 
   <select name="plan">
-  <option value="" {"selected" if not plan else ""}>All Plans</option>
-  <option value="₹51 – बेसिक प्लान" {"selected" if plan=="₹51 – बेसिक प्लान" else ""}>₹51 – बेसिक प्लान</option>
-  <option value="₹151 – एडवांस प्लान" {"selected" if plan=="₹151 – एडवांस प्लान" else ""}>₹151 – एडवांस प्लान</option>
-  <option value="₹251 – प्रो प्लान" {"selected" if plan=="₹251 – प्रो प्लान" else ""}>₹251 – प्रो प्लान</option>
-  <option value="₹501 – अल्टीमेट प्लान" {"selected" if plan=="₹501 – अल्टीमेट प्लान" else ""}>₹501 – अल्टीमेट प्लान</option>
+  $plan_options
 </select>
 
   <select name="source">
-  <option value="" {"selected" if not source else ""}>All Sources</option>
-  <option value="Website" {"selected" if source=="Website" else ""}>Website</option>
-  <option value="Manual" {"selected" if source=="Manual" else ""}>Manual</option>
+  $source_options
 </select>
 
   <select name="status">
-  <option value="" {"selected" if not status else ""}>All Status</option>
-  <option value="Pending" {"selected" if status=="Pending" else ""}>Pending</option>
-  <option value="Reviewed" {"selected" if status=="Reviewed" else ""}>Reviewed</option>
-  <option value="Completed" {"selected" if status=="Completed" else ""}>Completed</option>
+  $status_options
 </select>
 
   <select name="payment">
-  <option value="" {"selected" if not payment else ""}>All Payment</option>
-  <option value="Pending" {"selected" if payment=="Pending" else ""}>Pending</option>
-  <option value="Paid" {"selected" if payment=="Paid" else ""}>Paid</option>
+  $payment_options
 </select>
 
-  <input type="date" name="start_date" value="{start_date or ''}">
-  <input type="date" name="end_date" value="{end_date or ''}">
+  <input type="date" name="start_date" value="$start_date">
+  <input type="date" name="end_date" value="$end_date">
+
+  <select name="page_size">
+  $page_size_options
+</select>
   
   <button type="submit">Filter</button>
 </form>
@@ -851,14 +3906,749 @@ tr:hover {{
       <th>Date</th>
       <th>Action</th>
     </tr>
-    {rows}
+""")
+
+DASHBOARD_ROW = string.Template("""
+        <tr>
+            <td>$client_code</td>
+            <td>$name</td>
+            <td>$plan</td>
+            <td>$source</td>
+            <td>$status</td>
+            <td>$phone</td>
+            <td>$payment_badge</td>
+            <td>$created_at</td>
+            <td><a href="/admin/client/$id">View</a></td>
+        </tr>
+""")
+
+DASHBOARD_PENDING_BADGE = string.Template("""
+            <input type="checkbox" name="client_ids" value="$id" form="bulk-paid">
+            🔴 Pending
+            <form method="post" action="/admin/mark-paid/$id" style="display:inline;">
+                <button style="background:#28a745;color:white;border:none;padding:4px 8px;border-radius:4px;cursor:pointer;">
+                    Mark Paid
+                </button>
+            </form>
+""")
+
+DASHBOARD_TAIL = string.Template("""
   </table>
 
+  <div class="pager">
+    <span>$prev_link</span>
+    <span>$next_link</span>
+  </div>
+
 </div>
 
 </body>
 </html>
-"""
+""")
+
+
+def select_options(choices, selected):
+    return "".join(
+        f'<option value="{value}" {"selected" if value == selected else ""}>{label}</option>'
+        for value, label in choices
+    )
+
+
+def dashboard_row(r):
+    # r: DASHBOARD_COLUMNS = id, client_code, name, phone, plan, source, status, created_at, payment_status, priority
+    return DASHBOARD_ROW.substitute(
+        id=r[0],
+        client_code=r[1],
+        name=r[2],
+        phone=r[3],
+        plan=r[4],
+        source=r[5],
+        status=r[6],
+        created_at=r[7] or "-",
+        payment_badge="🟢 Paid" if r[8] == "Paid" else DASHBOARD_PENDING_BADGE.substitute(id=r[0]),
+    )
+
+
+@app.get("/admin/dashboard", response_class=HTMLResponse)
+async def dashboard(
+    q: str = Query(None),
+    plan: str = Query(None),
+    source: str = Query(None),
+    status: str = Query(None),
+    payment: str = Query(None),   # 🔥 ADD THIS
+    start_date: str = Query(None),
+    end_date: str = Query(None),
+    after: str = Query(None),
+    before: str = Query(None),
+    page_size: int = Query(DASHBOARD_PAGE_SIZE),
+    stream: int = Query(1)
+):
+
+    # page_size=0 lists every matching row, streamed off a server-side cursor without a pager
+    show_all = page_size == 0
+    page_size = 0 if show_all else max(1, min(page_size, DASHBOARD_MAX_PAGE_SIZE))
+    q = (q or "").strip()
+    plan = plan_filter_id(plan)
+    # search pages carry their score in the cursor
+    key_size = 3 if q else 2
+    after_key = None if show_all else parse_page_cursor(after, key_size)
+    before_key = None if (show_all or after_key) else parse_page_cursor(before, key_size)
+
+    filters = {
+        "q": q, "plan": plan, "source": source, "status": status, "payment": payment,
+        "start_date": start_date, "end_date": end_date,
+    }
+
+    stats_since = revenue_since(STATS_REVENUE_DAYS)
+    if show_all:
+        # built before the response starts, so a bad filter is still a clean 400
+        sql, params = clients.dashboard_query(filters, None)
+        stats = await aclients.rollups(stats_since)
+        chunks = aclients.stream_rows(sql, params, DASHBOARD_STREAM_CHUNK)
+        pager = {"prev_link": "", "next_link": ""}
+    else:
+        (rows_db, has_more), stats = await asyncio.gather(
+            aclients.dashboard_page(filters, page_size, after_key, before_key),
+            aclients.rollups(stats_since),
+        )
+        chunks = None
+        pager = dashboard_pager(rows_db, has_more, filters, page_size, after_key, before_key)
+
+    head = DASHBOARD_HEAD.substitute(
+        stylesheet=DASHBOARD_STYLESHEET,
+        stats=dashboard_stats_html(summary_stats(*stats, STATS_REVENUE_DAYS)),
+        export_query=urlencode({k: v for k, v in filters.items() if v}),
+        xlsx_max_rows=EXPORT_XLSX_MAX_ROWS,
+        q=q,
+        plan_options=select_options(
+            [("", "All Plans")] + [(p.id, p.label) for p in plan_catalog().values()], plan or ""
+        ),
+        source_options=select_options(
+            [("", "All Sources"), ("Website", "Website"), ("Manual", "Manual")], source or ""
+        ),
+        status_options=select_options(
+            [("", "All Status"), ("Pending", "Pending"), ("Reviewed", "Reviewed"), ("Completed", "Completed")],
+            status or ""
+        ),
+        payment_options=select_options(
+            [("", "All Payment"), ("Pending", "Pending"), ("Paid", "Paid")], payment or ""
+        ),
+        start_date=start_date or "",
+        end_date=end_date or "",
+        page_size_options=select_options(
+            [(n, f"{n} / page") for n in (25, 50, 100, 200)] + [(0, "All")], page_size
+        ),
+    )
+
+    async def render():
+        yield head
+        if chunks is None:
+            for i in range(0, len(rows_db), DASHBOARD_STREAM_CHUNK):
+                yield "".join(map(dashboard_row, rows_db[i:i + DASHBOARD_STREAM_CHUNK]))
+        else:
+            try:
+                async for rows in chunks:
+                    yield "".join(map(dashboard_row, rows))
+            finally:
+                await chunks.aclose()       # also when the browser goes away mid-list
+        yield DASHBOARD_TAIL.substitute(pager)
+
+    if not stream:
+        return HTMLResponse("".join([part async for part in render()]))
+    return StreamingResponse(render(), media_type="text/html; charset=utf-8")
+
+
+def dashboard_pager(rows_db, has_more, filters, page_size, after_key, before_key):
+    filter_args = {k: v for k, v in {**filters, "page_size": page_size}.items() if v}
+
+    prev_link = ""
+    next_link = ""
+    if rows_db:
+        first, last = rows_db[0], rows_db[-1]
+        if after_key or (before_key and has_more):
+            prev_link = f'<a href="/admin/dashboard?{urlencode({**filter_args, "before": page_cursor(first)})}">⬅ Prev</a>'
+        if before_key or has_more:
+            next_link = f'<a href="/admin/dashboard?{urlencode({**filter_args, "after": page_cursor(last)})}">Next ➡</a>'
+
+    return {"prev_link": prev_link, "next_link": next_link}
+
+
+async def _timed_get(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    start = time.perf_counter()
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode())
+    first = await reader.read(1)
+    ttfb = time.perf_counter() - start
+    size = len(first) + len(await reader.read())
+    writer.close()
+    return ttfb, time.perf_counter() - start, size
+
+
+def bench_dashboard(levels, port):
+    # a scratch SQLite database per run; each mode gets a fresh server so peak RSS is its own
+    workdir = tempfile.mkdtemp(prefix="bench-dashboard-")
+    env = {"DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}"}
+    subprocess.run([sys.executable, os.path.abspath(__file__), "migrate"], env={**os.environ, **env},
+                   check=True, stdout=subprocess.DEVNULL)
+    database = SQLiteDatabase(os.path.join(workdir, "bench.db"))
+
+    print(f"{'rows':>8} {'mode':<9} {'TTFB ms':>9} {'total ms':>9} {'MB sent':>8} {'peak RSS MB':>12}")
+    seeded = 0
+    for rows in levels:
+        with database.connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                WITH RECURSIVE g(n) AS (SELECT ? UNION ALL SELECT n + 1 FROM g WHERE n < ?)
+                INSERT INTO clients (client_code, name, phone, dob, plan, plan_id, questions, source, status,
+                                     payment_status, created_at, priority)
+                SELECT 'AVV-2026-' || n, 'राम शर्मा ' || n, '9' || (900000000 + n), '1990-01-01',
+                       '₹151 – एडवांस प्लान', 2, '', 'Website', 'Pending',
+                       CASE WHEN n % 3 THEN 'Pending' ELSE 'Paid' END, now(), n % 5
+                FROM g
+            """, (seeded + 1, rows))
+            conn.commit()
+        seeded = rows
+
+        for label, stream in (("buffered", 0), ("streamed", 1)):
+            server = _start_load_server(port, True, env)
+            try:
+                ttfb, total, size = asyncio.run(_timed_get(port, f"/admin/dashboard?page_size=0&stream={stream}"))
+                peak_kb = _process_status(server.pid, "VmHWM")
+            finally:
+                server.terminate()
+                server.wait()
+            peak = f"{peak_kb / 1024:.0f}" if peak_kb else "-"
+            print(f"{rows:>8} {label:<9} {ttfb * 1000:>9.0f} {total * 1000:>9.0f} {size / 2**20:>8.1f} {peak:>12}")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+# ---------- CLIENT EXPORT ----------
+# The dashboard's filters as a file for accounting. Rows come off a server-side cursor chunk by chunk:
+# CSV is streamed as it is written, XLSX (a zip) is written to a temp file in constant-memory mode first.
+
+EXPORT_CHUNK = int(os.environ.get("EXPORT_CHUNK", "2000"))      # rows per cursor fetch / response chunk
+# an .xlsx is a zip that XlsxWriter can only assemble once every row is written, so nothing is sent
+# until then; past this size the export is refused and the CSV (streamed from the first row) is the way
+EXPORT_XLSX_MAX_ROWS = int(os.environ.get("EXPORT_XLSX_MAX_ROWS", "100000"))
+EXPORT_COLUMNS = (
+    "client_code,name,phone,dob,plan,source,status,payment_status,ist_text(payment_date),payment_ref,"
+    "ist_text(created_at)"
+)
+EXPORT_HEADER = [
+    "Client Code", "Name", "Phone", "DOB", "Plan", "Source", "Status", "Payment", "Payment Date", "Payment Ref",
+    "Created (IST)",
+]
+EXPORT_PHONE_RE = re.compile(r"[+\d][\d\s-]*")
+
+
+def spreadsheet_safe(value):
+    # a cell starting with = + - @ is run as a formula by Excel; phone numbers like +91 98… are left alone
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@", "\t", "\r") \
+            and not EXPORT_PHONE_RE.fullmatch(value):
+        return "'" + value
+    return value
+
+
+async def csv_chunks(chunks):
+    yield "\ufeff"         # BOM, so Excel reads the Devanagari names as UTF-8
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_HEADER)
+    try:
+        async for rows in chunks:
+            writer.writerows([spreadsheet_safe(v) for v in row] for row in rows)
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    finally:
+        await chunks.aclose()
+    if buf.tell():
+        yield buf.getvalue()        # header only: nothing matched
+
+
+async def write_xlsx(chunks):
+    fd, path = tempfile.mkstemp(prefix="export-", suffix=".xlsx")
+    os.close(fd)
+
+    # constant_memory flushes each row to disk as soon as the next one starts
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "strings_to_formulas": False})
+    sheet = workbook.add_worksheet("Clients")
+    sheet.write_row(0, 0, EXPORT_HEADER)
+
+    def write(first_row, rows):
+        for i, row in enumerate(rows, first_row):
+            sheet.write_row(i, 0, [v if v is not None else "" for v in row])
+
+    try:
+        next_row = 1
+        async for rows in chunks:
+            await run_in_threadpool(write, next_row, rows)
+            next_row += len(rows)
+        await run_in_threadpool(workbook.close)
+    except BaseException:
+        _remove_file(path)
+        raise
+    return path
+
+
+@app.get("/admin/export.{fmt}")
+async def export_clients(
+    fmt: str,
+    q: str = Query(None),
+    plan: str = Query(None),
+    source: str = Query(None),
+    status: str = Query(None),
+    payment: str = Query(None),
+    start_date: str = Query(None),
+    end_date: str = Query(None)
+):
+    if fmt not in ("csv", "xlsx"):
+        raise HTTPException(404, "export format must be csv or xlsx")
+    if fmt == "xlsx" and xlsxwriter is None:
+        raise HTTPException(501, "XLSX export needs `pip install XlsxWriter`")
+
+    filters = {
+        "q": (q or "").strip(), "plan": plan_filter_id(plan), "source": source, "status": status, "payment": payment,
+        "start_date": start_date, "end_date": end_date,
+    }
+    # same WHERE / ORDER BY as the dashboard, without a page limit
+    sql, params = clients.dashboard_query(filters, None, columns=EXPORT_COLUMNS)
+    if fmt == "xlsx":
+        matched = await aclients.count(filters)
+        if matched > EXPORT_XLSX_MAX_ROWS:
+            raise HTTPException(
+                413, f"{matched} clients match; Excel export is limited to {EXPORT_XLSX_MAX_ROWS} rows, use CSV"
+            )
+
+    chunks = aclients.stream_rows(sql, params, EXPORT_CHUNK)
+    file_name = f"clients-{datetime.now(IST):%Y%m%d-%H%M}.{fmt}"
+
+    if fmt == "csv":
+        return StreamingResponse(
+            csv_chunks(chunks),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": f'attachment; filename="{file_name}"'}
+        )
+
+    path = await write_xlsx(chunks)
+    return FileResponse(
+        path,
+        filename=file_name,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        background=BackgroundTask(_remove_file, path)
+    )
+
+# ---------- STREAMING UPLOADS ----------
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_MAX_FILE_BYTES = int(os.environ.get("UPLOAD_MAX_FILE_BYTES", str(15 * 1024 * 1024)))
+UPLOAD_MAX_REQUEST_BYTES = int(os.environ.get("UPLOAD_MAX_REQUEST_BYTES", str(60 * 1024 * 1024)))
+UPLOAD_PATHS = {"/api/website-submit", "/admin/add-client"}
+
+
+class UploadSizeLimit:
+    # refuses an upload over UPLOAD_MAX_REQUEST_BYTES before it is buffered: up front when the client announces
+    # its size, otherwise (chunked bodies) as the bytes arrive, so Starlette never spools the rest
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in UPLOAD_PATHS:
+            return await self.app(scope, receive, send)
+
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > UPLOAD_MAX_REQUEST_BYTES:
+            response = JSONResponse(
+                {"success": False, "detail": f"upload larger than {UPLOAD_MAX_REQUEST_BYTES} bytes"},
+                status_code=413
+            )
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def counted_receive():
+            nonlocal received
+            message = await receive()
+            received += len(message.get("body", b""))
+            if received > UPLOAD_MAX_REQUEST_BYTES:
+                # raised inside the body read, which FastAPI passes on as this 413
+                raise HTTPException(413, f"upload larger than {UPLOAD_MAX_REQUEST_BYTES} bytes")
+            return message
+
+        await self.app(scope, counted_receive, send)
+
+
+app.add_middleware(UploadSizeLimit)
+
+
+# Originals are stored once per content under uploads/blobs/<sha[:2]>/<sha[2:4]>/<sha><ext>; see blobs / client_images.
+BLOB_DIR = "blobs"                  # relative to UPLOAD_DIR, so blobs are served under /uploads
+BLOB_GC_GRACE = int(os.environ.get("BLOB_GC_GRACE", "3600"))    # seconds before an unreferenced blob may be removed
+BLOB_SIGNATURES = [
+    (0, b"\xff\xd8\xff", ".jpg"),
+    (0, b"\x89PNG\r\n\x1a\n", ".png"),
+    (0, b"GIF8", ".gif"),
+    (8, b"WEBP", ".webp"),
+    (4, b"ftypheic", ".heic"),
+    (4, b"ftypmif1", ".heic"),
+]
+
+
+def blob_extension(head):
+    # derived from the bytes, not the client's filename, so equal content always maps to one path
+    for offset, magic, ext in BLOB_SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return ext
+    return ""
+
+
+def blob_path(sha256, ext):
+    return f"{BLOB_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+
+
+def image_size(source):
+    # path or file object; only the header is read
+    try:
+        with Image.open(source) as im:
+            width, height = im.size
+            # EXIF orientations 5-8 are rotated by 90°, which is how the photo is displayed
+            if im.getexif().get(0x0112) in (5, 6, 7, 8):
+                width, height = height, width
+            return width, height
+    except (OSError, Image.DecompressionBombError):
+        return None, None
+
+
+def store_blob(relative_path, sha256, size, fileobj):
+    # the blobs row is locked before storage is looked at, and collect_blob_garbage() deletes files under
+    # that same lock: the bytes are either found in place here or stored again
+    key = upload_key(relative_path)
+    storage = get_storage()
+    now = datetime.now(timezone.utc)
+
+    with db_conn() as conn:
+        c = conn.cursor()
+        c.execute(TOUCH_BLOB_SQL, (size, now, sha256))
+        if c.rowcount == 0:
+            c.execute(INSERT_BLOB_SQL, (sha256, relative_path, size, now))
+
+        is_new = not storage.exists(key)
+        if is_new:
+            # second pass streams the spooled upload into storage (multipart for S3)
+            storage.put_stream(key, fileobj)
+        conn.commit()
+
+    return is_new
+
+
+async def save_upload(img, budget):
+    announced = getattr(img, "size", None)
+    if announced and announced > UPLOAD_MAX_FILE_BYTES:
+        raise HTTPException(413, f"{img.filename} is larger than {UPLOAD_MAX_FILE_BYTES} bytes")
+
+    safe_name = os.path.basename(img.filename or "upload")
+    digest = hashlib.sha256()
+    head = b""
+    size = 0
+
+    # first pass only hashes: bytes that are already in the blob store are never written again
+    while True:
+        chunk = await img.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+
+        size += len(chunk)
+        if size > UPLOAD_MAX_FILE_BYTES:
+            raise HTTPException(413, f"{img.filename} is larger than {UPLOAD_MAX_FILE_BYTES} bytes")
+        if size > budget:
+            raise HTTPException(413, f"upload larger than {UPLOAD_MAX_REQUEST_BYTES} bytes")
+
+        if not head:
+            head = chunk[:16]
+        await run_in_threadpool(digest.update, chunk)
+
+    sha256 = digest.hexdigest()
+    relative_path = blob_path(sha256, blob_extension(head))
+
+    await img.seek(0)
+    width, height = await run_in_threadpool(image_size, img.file)
+
+    await img.seek(0)
+    is_new = await run_in_threadpool(store_blob, relative_path, sha256, size, img.file)
+
+    return {
+        "name": safe_name, "path": relative_path, "sha256": sha256, "size": size,
+        "width": width, "height": height, "new": is_new,
+    }
+
+
+async def save_uploads(images):
+    # a failure half-way leaves already-stored blobs unreferenced; collect_blob_garbage() removes them
+    saved = []
+    budget = UPLOAD_MAX_REQUEST_BYTES
+
+    for img in images:
+        upload = await save_upload(img, budget)
+        budget -= upload["size"]
+        saved.append(upload)
+
+    return saved
+
+
+def collect_blob_garbage():
+    # blobs no client references any more, plus files whose request died before its row was written
+    cutoff = time.time() - BLOB_GC_GRACE
+    storage = get_storage()
+
+    with db_conn() as conn:
+        c = conn.cursor()
+        c.execute("SELECT path FROM blobs")
+        known = {row[0] for row in c.fetchall()}
+
+        # rowless files get a row dated by their mtime, so the delete below handles them under the same lock
+        for key, modified in storage.list(upload_key(BLOB_DIR) + "/"):
+            relative_path = key[len(UPLOAD_DIR) + 1:]
+            if any(f".{kind}." in relative_path for kind in IMAGE_DERIVATIVES) or relative_path in known:
+                continue
+            if modified < cutoff:
+                sha256 = os.path.splitext(os.path.basename(relative_path))[0]
+                c.execute(INSERT_BLOB_SQL, (sha256, relative_path, 0, datetime.fromtimestamp(modified, timezone.utc)))
+        conn.commit()
+
+        c.execute("""
+            DELETE FROM blobs WHERE sha256 IN (
+                SELECT sha256 FROM blobs
+                WHERE created_at < ?
+                  AND NOT EXISTS (SELECT 1 FROM client_images WHERE client_images.sha256 = blobs.sha256)
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING path
+        """, (datetime.fromtimestamp(cutoff, timezone.utc),))
+        stale = [row[0] for row in c.fetchall()]
+
+        # files go before the rows are released: a store_blob() of the same bytes waits, then stores them again
+        for relative_path in stale:
+            for path in [relative_path] + [derivative_name(relative_path, kind) for kind in IMAGE_DERIVATIVES]:
+                storage.delete(upload_key(path))
+        conn.commit()
+
+    print(f"{len(stale)} unreferenced blobs removed")
+
+
+def _legacy_upload(name):
+    # hash an old uuid_filename upload and move it (and its derivatives) into the blob store
+    src = os.path.join(UPLOAD_DIR, name)
+    digest = hashlib.sha256()
+    with open(src, "rb") as f:
+        head = f.read(16)
+        digest.update(head)
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    sha256 = digest.hexdigest()
+    relative_path = blob_path(sha256, blob_extension(head))
+    size = os.path.getsize(src)
+    width, height = image_size(src)
+    storage = get_storage()
+
+    for old, new in [(name, relative_path)] + [(derivative_name(name, k), derivative_name(relative_path, k))
+                                                for k in IMAGE_DERIVATIVES]:
+        old = os.path.join(UPLOAD_DIR, old)
+        if not os.path.exists(old):
+            continue
+        if not storage.exists(upload_key(new)):      # otherwise the same bytes are already stored
+            storage.put_file(upload_key(new), old)
+        _remove_file(old)
+
+    return {
+        "name": name.split("_", 1)[-1], "path": relative_path, "sha256": sha256, "size": size,
+        "width": width, "height": height, "new": False,
+    }
+
+
+def backfill_blobs():
+    # clients created before the blob store keep their file names in the comma-joined images column
+    moved = 0
+    with db_conn() as conn:
+        c = conn.cursor()
+        c.execute("SELECT id, images FROM clients WHERE images IS NOT NULL AND images <> '' ORDER BY id")
+        legacy = c.fetchall()
+
+        for client_id, images in legacy:
+            uploads = [
+                _legacy_upload(name)
+                for name in (n.strip() for n in images.split(","))
+                if name and os.path.exists(os.path.join(UPLOAD_DIR, name))
+            ]
+            c.execute("SELECT COUNT(*) FROM client_images WHERE client_id=?", (client_id,))
+            clients.attach_images(c, client_id, uploads, first_position=c.fetchone()[0])
+            c.execute("UPDATE clients SET images=NULL WHERE id=?", (client_id,))
+            conn.commit()
+            moved += len(uploads)
+
+    print(f"{moved} images from {len(legacy)} clients moved into the blob store")
+
+# ---------- SUBMISSION DE-DUPLICATION ----------
+# Mobile visitors retry the website form. A retry carrying the same Idempotency-Key header is answered from
+# memory before its body is read; the same phone + dob + plan inside the window gets the original client_code back
+# (a different plan is a second purchase).
+
+IDEMPOTENCY_TTL = int(os.environ.get("IDEMPOTENCY_TTL", "86400"))                  # seconds a key is honoured
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", "10000"))    # keys kept in memory per process
+DUPLICATE_SUBMIT_WINDOW = int(os.environ.get("DUPLICATE_SUBMIT_WINDOW", "900"))    # seconds; 0 turns the check off
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+idempotency_cache = OrderedDict()      # key -> (client_code, expires at)
+idempotency_lock = threading.Lock()
+
+
+def remember_submission(key, client_code):
+    with idempotency_lock:
+        idempotency_cache[key] = (client_code, time.monotonic() + IDEMPOTENCY_TTL)
+        idempotency_cache.move_to_end(key)
+        while len(idempotency_cache) > IDEMPOTENCY_CACHE_SIZE:
+            idempotency_cache.popitem(last=False)
+
+
+def cached_submission(key):
+    with idempotency_lock:
+        entry = idempotency_cache.get(key)
+    if entry and entry[1] > time.monotonic():
+        return entry[0]
+    return None
+
+
+def replayed_submission(client_code):
+    return JSONResponse({"success": True, "client_code": client_code}, headers={"Idempotent-Replayed": "true"})
+
+
+@app.middleware("http")
+async def replay_idempotent_submissions(request: Request, call_next):
+    key = request.headers.get("idempotency-key")
+    if request.method == "POST" and request.url.path == "/api/website-submit" and key:
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return JSONResponse(
+                {"success": False, "detail": f"Idempotency-Key longer than {IDEMPOTENCY_KEY_MAX_LENGTH} characters"},
+                status_code=400
+            )
+        # memory first; the table only answers for keys first seen by another process (or before a restart)
+        client_code = cached_submission(key)
+        if client_code is None:
+            client_code = await aclients.idempotent_code(key)
+            if client_code:
+                remember_submission(key, client_code)
+        if client_code:
+            return replayed_submission(client_code)
+    return await call_next(request)
+
+# ---------- IMAGE DERIVATIVES ----------
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", "2"))
+IMAGE_DERIVATIVE_FORMAT = os.environ.get("IMAGE_DERIVATIVE_FORMAT", "webp").lower()   # webp / jpeg
+IMAGE_DERIVATIVE_QUALITY = int(os.environ.get("IMAGE_DERIVATIVE_QUALITY", "80"))
+IMAGE_DERIVATIVES = {
+    "thumb": 320,      # longest edge in px
+    "medium": 1280,
+}
+
+image_executor = None
+image_lock = threading.Lock()
+
+
+def derivative_name(name, kind):
+    ext = "jpg" if IMAGE_DERIVATIVE_FORMAT == "jpeg" else IMAGE_DERIVATIVE_FORMAT
+    return f"{os.path.splitext(name)[0]}.{kind}.{ext}"
+
+
+def generate_image_derivatives(name):
+    storage = get_storage()
+    src = storage.get_file(upload_key(name))
+
+    with Image.open(src) as im:
+        # let the JPEG decoder downscale by 1/2..1/8 instead of decoding all 12+ megapixels
+        largest = max(IMAGE_DERIVATIVES.values())
+        im.draft("RGB", (largest, largest))
+
+        # bake the EXIF orientation into the pixels – the derivatives carry no metadata
+        im = ImageOps.exif_transpose(im)
+        if im.mode != "RGB":
+            im = im.convert("RGB")
+
+        for kind, edge in sorted(IMAGE_DERIVATIVES.items(), key=lambda kv: -kv[1]):
+            im.thumbnail((edge, edge), Image.LANCZOS)
+
+            key = upload_key(derivative_name(name, kind))
+            out_path = storage.local_path(key)
+            # a private temp name: two uploads of the same new bytes render the same derivatives at once
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(out_path), suffix=".tmp")
+            try:
+                os.fchmod(fd, 0o644)
+                with os.fdopen(fd, "wb") as f:
+                    im.save(f, format=IMAGE_DERIVATIVE_FORMAT.upper(), quality=IMAGE_DERIVATIVE_QUALITY, optimize=True)
+                os.replace(tmp_path, out_path)
+            except BaseException:
+                _remove_file(tmp_path)
+                raise
+            storage.put_file(key, out_path)
+
+    return name
+
+
+def get_image_executor():
+    global image_executor
+
+    with image_lock:
+        if image_executor is None:
+            # Image.init loads every format plugin once per worker instead of on its first photo
+            image_executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, initializer=Image.init)
+        return image_executor
+
+
+def _log_derivative_result(future):
+    error = future.exception()
+    if error is not None:
+        log.warning("image derivatives failed: %s", error)
+
+
+def submit_image_derivatives(names):
+    executor = get_image_executor()
+    for name in names:
+        executor.submit(generate_image_derivatives, name).add_done_callback(_log_derivative_result)
+
+
+def backfill_image_derivatives():
+    # one listing instead of an existence check per file (a HEAD request each on S3)
+    names = {key[len(UPLOAD_DIR) + 1:] for key, _ in get_storage().list(UPLOAD_DIR + "/")}
+    missing = [
+        name for name in sorted(names)
+        if not any(f".{kind}." in name for kind in IMAGE_DERIVATIVES)
+        and not all(derivative_name(name, k) in names for k in IMAGE_DERIVATIVES)
+    ]
+
+    done = failed = 0
+    with ProcessPoolExecutor(max_workers=IMAGE_WORKERS) as executor:
+        for future in [executor.submit(generate_image_derivatives, name) for name in missing]:
+            try:
+                future.result()
+                done += 1
+            except Exception as e:
+                failed += 1
+                log.warning("derivatives failed: %s", e)
+
+    print(f"{done} images processed, {failed} failed")
+
+
+@app.on_event("startup")
+def start_image_workers():
+    executor = get_image_executor()
+    # fork the pool at start-up, not from a busy multi-threaded server on the first upload
+    for _ in range(IMAGE_WORKERS):
+        executor.submit(os.getpid)
+
+
+@app.on_event("shutdown")
+def stop_image_workers():
+    if image_executor is not None:
+        image_executor.shutdown(wait=False)
 
 # ---------- MANUAL CLIENT ENTRY ----------
 @app.get("/admin/add-client", response_class=HTMLResponse)
@@ -938,11 +4728,7 @@ body{
 
 <label>प्लान चुनें</label>
 <select name="plan">
-  <option value="₹51 – बेसिक प्लान">₹51 – बेसिक प्लान</option>
-  <option value="₹151 – एडवांस प्लान">₹151 – एडवांस प्लान</option>
-  <option value="₹251 – प्रो प्लान">₹251 – प्रो प्लान</option>
-  <option value="₹501 – अल्टीमेट प्लान">₹501 – अल्टीमेट प्लान</option>
-</select>
+""" + "".join(f'  <option value="{p.label}">{p.label}</option>\n' for p in plan_catalog().values()) + """</select>
 
 <label>हथेली की फोटो</label>
 <input type="file" name="images" multiple>
@@ -972,62 +4758,21 @@ async def add_client(
     images: List[UploadFile] = File(...)
 ):
     
-    saved_files = []
-
-    for img in images:
-        unique_name = f"{uuid.uuid4().hex}_{img.filename}"
-        file_path = os.path.join(UPLOAD_DIR, unique_name)
-        with open(file_path, "wb") as f:
-             f.write(await img.read())
-        saved_files.append(unique_name)
-
-    image_names = ",".join(saved_files)
+    uploads = await save_uploads(images)
+    submit_image_derivatives([u["path"] for u in uploads if u["new"]])
 
-    conn = get_db()
-    c = conn.cursor()
+    client_code = await agenerate_client_code()
 
-    client_code = generate_client_code()
-
-    c.execute("""
-    INSERT INTO clients
-    (client_code,name,phone,dob,tob,place,plan,questions,images,
-     source,status,payment_status,payment_date,payment_ref,
-     ai_draft,created_at,priority,ai_generated)
-    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-    """, (
-        client_code,
-        name,
-        phone,
-        dob,
-        tob,
-        place,
-        plan,
-        questions,
-        image_names,
-        "Manual",
-        "Pending",          # status
-        "Pending",           # payment_status
-        None,               # payment_date
-        None,               # payment_ref
-        "AI draft pending", # ai_draft
-        datetime.now(ZoneInfo("Asia/Kolkata")).strftime("%Y-%m-%d %H:%M:%S"),
-        99,                 # priority
-        0                   # ai_generated
-    ))
-
-    conn.commit()
-    conn.close()
+    await aclients.create(
+        client_code, name, phone, dob, tob, place, plan, questions, uploads, "Manual"
+    )
 
     return RedirectResponse("/admin/dashboard", status_code=302)
 
 # ---------- CLIENT DETAIL ----------
 @app.get("/admin/client/{client_id}", response_class=HTMLResponse)
-def client_detail(client_id: int):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT * FROM clients WHERE id=?", (client_id,))
-    cdata = c.fetchone()
-    conn.close()
+async def client_detail(client_id: int):
+    cdata, images = await asyncio.gather(aclients.get(client_id), aclients.images(client_id))
 
     # -------- WHATSAPP LINK GENERATION --------
     import urllib.parse
@@ -1038,11 +4783,9 @@ def client_detail(client_id: int):
 
     base_url = "https://jyotish-backend-gbr9.onrender.com"
 
-    pdf_path = os.path.join(REPORT_DIR, f"{client_code}.pdf")
-
     whatsapp_button = ""
 
-    if os.path.exists(pdf_path):
+    if await run_in_threadpool(get_storage().exists, report_key(client_code)):
 
         public_pdf_url = f"{base_url}/reports/{client_code}.pdf"
 
@@ -1101,13 +4844,55 @@ def client_detail(client_id: int):
         </div>
         """
 
+    # -------- PDF RENDER JOB STATE --------
+    render_state, render_error = render_job_state(client_id)
+    render_status_html = ""
+    auto_refresh = ""
+
+    if render_state:
+        state_labels = {
+            "queued": ("#d35400", "⏳ PDF queued"),
+            "rendering": ("#2980b9", "⚙️ PDF rendering…"),
+            "done": ("green", "✅ PDF ready"),
+            "failed": ("red", "❌ PDF failed"),
+        }
+        color, label = state_labels[render_state]
+        render_status_html = f"""
+        <div style="margin-top:10px;font-weight:bold;color:{color};">
+            {label}{f" – {render_error}" if render_error else ""}
+        </div>
+        """
+        if render_state in ("queued", "rendering"):
+            auto_refresh = '<meta http-equiv="refresh" content="3">'
+
     # ✅ ---- ADD THIS BLOCK HERE ----
     images_html = ""
-    if cdata[9]:
-        for img in cdata[9].split(","):
-            img = img.strip()
-            if img:
-                images_html += f'<img src="/uploads/{img}" width="150" style="margin:5px;border:1px solid #ccc;">'
+    if not images and cdata[9]:
+        # not yet moved by `python main.py blobs backfill`
+        images = [(name.strip(), name.strip(), None, None) for name in cdata[9].split(",") if name.strip()]
+
+    if images:
+        # one threadpool hop for all existence checks (HEAD requests on S3)
+        stored = await run_in_threadpool(stored_keys, [
+            upload_key(derivative_name(img, kind)) for img, *_ in images for kind in ("thumb", "medium")
+        ])
+        for img, filename, width, height in images:
+            # thumbnail in the page, medium preview on click, original one link away
+            thumb = derivative_name(img, "thumb")
+            medium = derivative_name(img, "medium")
+            thumb_src = thumb if upload_key(thumb) in stored else img
+            preview = medium if upload_key(medium) in stored else img
+
+            images_html += f"""
+            <span style="display:inline-block;text-align:center;margin:5px;">
+                <a href="/uploads/{preview}" target="_blank">
+                    <img src="/uploads/{thumb_src}" width="150" loading="lazy" style="border:1px solid #ccc;">
+                </a><br>
+                <a href="/uploads/{img}" target="_blank" style="font-size:12px;" title="{filename}">
+                    Original{f" ({width}×{height})" if width else ""}
+                </a>
+            </span>
+            """
     # ✅ ---- END BLOCK ----
 
     return f"""
@@ -1115,6 +4900,7 @@ def client_detail(client_id: int):
 
 <head>
 <title>Client Detail</title>
+{auto_refresh}
 <style>
 body {{
   font-family: Arial, sans-serif;
@@ -1252,6 +5038,8 @@ button {{
 
     {pdf_button}
 
+    {render_status_html}
+
     {whatsapp_button}
 
     <br><br>
@@ -1274,12 +5062,7 @@ button {{
 
 @app.post("/admin/client/{client_id}/update")
 def update_client(client_id: int, ai_draft: str = Form(...), status: str = Form(...)):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("UPDATE clients SET ai_draft=?, status=? WHERE id=?",
-              (ai_draft,status,client_id))
-    conn.commit()
-    conn.close()
+    clients.update_review(client_id, ai_draft, status)
     return RedirectResponse(f"/admin/client/{client_id}", status_code=302)
 
 @app.post("/admin/client/{client_id}/payment")
@@ -1289,93 +5072,33 @@ def update_payment(
     payment_ref: str = Form(None)
 ):
 
-    conn = get_db()
-    c = conn.cursor()
-
-    payment_date = None
-    priority = 99
-
-    if payment_status == "Paid":
-        payment_date = datetime.now(ZoneInfo("Asia/Kolkata")).strftime("%Y-%m-%d %H:%M:%S")
-
-        # get plan
-        c.execute("SELECT plan FROM clients WHERE id=?", (client_id,))
-        plan = c.fetchone()[0]
-
-        if "501" in plan:
-            priority = 1
-        elif "251" in plan:
-            priority = 2
-        elif "151" in plan:
-            priority = 3
-        else:
-            priority = 4
-
-        # 🔥 ADD THIS LINE
-        generate_ai_draft(client_id)
-
-    c.execute("""
-        UPDATE clients
-        SET payment_status=?, payment_date=?, payment_ref=?, priority=?
-        WHERE id=?
-    """, (payment_status, payment_date, payment_ref, priority, client_id))
-
-    conn.commit()
-    conn.close()
+    clients.set_payment(client_id, payment_status, payment_ref)
 
     return RedirectResponse(f"/admin/client/{client_id}", status_code=302)
 
 @app.post("/admin/mark-paid/{client_id}")
-def mark_paid(client_id: int):
-
-    conn = get_db()
-    c = conn.cursor()
+async def mark_paid(client_id: int):
 
-    # get plan for priority
-    c.execute("SELECT plan FROM clients WHERE id=?", (client_id,))
-    plan = c.fetchone()[0]
+    await aclients.mark_paid([client_id])
 
-    priority = 4
-    if "501" in plan:
-        priority = 1
-    elif "251" in plan:
-        priority = 2
-    elif "151" in plan:
-        priority = 3
-
-    payment_date = datetime.now(ZoneInfo("Asia/Kolkata")).strftime("%Y-%m-%d %H:%M:%S")
-
-    # update payment
-    c.execute("""
-        UPDATE clients
-        SET payment_status='Paid',
-            payment_date=?,
-            priority=?
-        WHERE id=?
-    """, (payment_date, priority, client_id))
+    return RedirectResponse("/admin/dashboard", status_code=302)
 
-    conn.commit()
-    conn.close()
+@app.post("/admin/mark-paid")
+async def mark_paid_bulk(client_ids: List[int] = Form(...)):
 
-    # 🔥🔥🔥 TRIGGER AI AFTER PAYMENT
-    generate_ai_draft(client_id)
+    # e.g. a reconciled bank statement: every ID is updated in a single statement
+    await aclients.mark_paid(client_ids)
 
     return RedirectResponse("/admin/dashboard", status_code=302)
 
 @app.post("/admin/client/{client_id}/generate-pdf")
 def create_pdf(client_id: int):
 
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT status FROM clients WHERE id=?", (client_id,))
-    data = c.fetchone()
-    conn.close()
+    current_status = clients.status(client_id)
 
-    if not data:
+    if current_status is None:
         return HTMLResponse("<h3>Client not found</h3>")
 
-    current_status = data[0]
-
     # 🚫 BLOCK PDF IF NOT REVIEWED
     if current_status != "Reviewed":
         return HTMLResponse("""
@@ -1391,8 +5114,22 @@ def create_pdf(client_id: int):
         </div>
         """)
 
-    # ✅ IF REVIEWED → GENERATE PDF
-    file_name = generate_pdf_report(client_id)
+    # ✅ IF REVIEWED → QUEUE PDF ON THE RENDER WORKERS
+    try:
+        submit_render(client_id)
+    except RenderQueueFull:
+        return HTMLResponse("""
+        <div style="text-align:center;margin-top:80px;font-family:Arial;">
+            <h2 style="color:#d35400;">⏳ Render Queue Full</h2>
+            <p>Bahut saari reports abhi render ho rahi hain. Thodi der baad dobara try kare.</p>
+            <br>
+            <a href="javascript:history.back()">
+                <button style="padding:10px 20px;background:#8b0000;color:white;border:none;border-radius:5px;">
+                    ⬅ Back
+                </button>
+            </a>
+        </div>
+        """, status_code=503)
 
     return RedirectResponse(f"/admin/client/{client_id}", status_code=302)
 
@@ -1407,22 +5144,13 @@ def send_whatsapp(client_id: int):
     import urllib.parse
     import os
 
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT name, phone, client_code FROM clients WHERE id=?", (client_id,))
-    data = c.fetchone()
+    data = clients.complete_for_whatsapp(client_id)
 
     if not data:
-        conn.close()
         return HTMLResponse("Client not found")
 
     name, phone_number, client_code = data
 
-    # Update status to Completed
-    c.execute("UPDATE clients SET status='Completed' WHERE id=?", (client_id,))
-    conn.commit()
-    conn.close()
-
     base_url = "https://jyotish-backend-gbr9.onrender.com"
     public_pdf_url = f"{base_url}/reports/{client_code}.pdf"
 
@@ -1446,23 +5174,47 @@ def send_whatsapp(client_id: int):
 @app.get("/admin/client/{client_id}/pdf")
 def download_pdf(client_id: int):
 
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT client_code FROM clients WHERE id=?", (client_id,))
-    data = c.fetchone()
-    conn.close()
+    client_code = clients.client_code(client_id)
 
-    if not data:
+    if not client_code:
         return HTMLResponse("Report not found")
 
-    file_name = f"{data[0]}.pdf"
-    file_path = os.path.join(REPORT_DIR, file_name)
+    file_name = f"{client_code}.pdf"
+    storage = get_storage()
 
-    if not os.path.exists(file_path):
+    if not storage.exists(report_key(client_code)):
         return HTMLResponse("PDF not generated yet.")
 
-    return FileResponse(file_path, media_type='application/pdf', filename=file_name)
+    return storage.response(report_key(client_code), download_name=file_name)
      
+# ---------- REVIEW QUEUE ----------
+@app.post("/admin/queue/next")
+def claim_next_client(reviewer: str = Form(...)):
+    # highest-priority paid client with a ready draft, leased to this reviewer for REVIEW_CLAIM_SECONDS
+    reviewer = reviewer.strip()[:100]
+    if not reviewer:
+        raise HTTPException(400, "reviewer is required")
+
+    row, expires = clients.claim_next(reviewer)
+    if row is None:
+        return {"client": None}
+
+    client_id, client_code, name, plan, priority, payment_date = row
+    return {
+        "client": {
+            "id": client_id, "client_code": client_code, "name": name, "plan": plan,
+            "priority": priority, "payment_date": payment_date, "url": f"/admin/client/{client_id}",
+        },
+        "claimed_by": reviewer,
+        "claim_expires_at": expires.isoformat(),
+    }
+
+@app.post("/admin/queue/{client_id}/release")
+def release_client_claim(client_id: int, reviewer: str = Form(...)):
+    if not clients.release_claim(client_id, reviewer.strip()[:100]):
+        raise HTTPException(409, "not claimed by this reviewer")
+    return {"released": client_id}
+
 # ---------- WEBSITE FORM SUBMIT API ----------
 @app.post("/api/website-submit")
 async def website_submit(
@@ -1473,56 +5225,222 @@ async def website_submit(
     plan: str = Form(...),
     tob: Optional[str] = Form(None),
     place: Optional[str] = Form(None),
-    images: List[UploadFile] = File(...)
+    images: List[UploadFile] = File(...),
+    idempotency_key: Optional[str] = Header(None)
 ):
 
-    saved_files = []
+    if DUPLICATE_SUBMIT_WINDOW:
+        duplicate_code = await aclients.recent_duplicate(phone, dob, plan, DUPLICATE_SUBMIT_WINDOW)
+        if duplicate_code:
+            if idempotency_key:
+                remember_submission(idempotency_key, duplicate_code)
+            return replayed_submission(duplicate_code)
 
-    for img in images:
-        unique_name = f"{uuid.uuid4().hex}_{img.filename}"
-        file_path = os.path.join(UPLOAD_DIR, unique_name)
-        with open(file_path, "wb") as f:
-             f.write(await img.read())
-        saved_files.append(unique_name)
+    uploads = await save_uploads(images)
 
-    image_names = ",".join(saved_files)
+    client_code = await agenerate_client_code()
 
-    conn = get_db()
-    c = conn.cursor()
+    client_id = await aclients.create(
+        client_code, name, phone, dob, tob, place, plan, questions, uploads, "Website",
+        idempotency_key=idempotency_key
+    )
 
-    client_code = generate_client_code()
+    if client_id is None:
+        # a concurrent retry with the same key got there first; blobs stored only for this request are GC'd later
+        client_code = await aclients.idempotent_code(idempotency_key)
+        remember_submission(idempotency_key, client_code)
+        return replayed_submission(client_code)
 
-    c.execute("""
-    INSERT INTO clients
-    (client_code,name,phone,dob,tob,place,plan,questions,images,
-    source,status,payment_status,payment_date,payment_ref,
-    ai_draft,created_at,priority,ai_generated)
-    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-    """, (
-        client_code,
-        name,
-        phone,
-        dob,
-        tob,
-        place,
-        plan,
-        questions,
-        image_names,
-        "Website",
-        "Pending",
-        "Pending",
-        None,
-        None,
-        "AI draft pending",
-        datetime.now(ZoneInfo("Asia/Kolkata")).strftime("%Y-%m-%d %H:%M:%S"),
-        99,
-        0
-    ))
-
-    conn.commit()
-    conn.close()
+    submit_image_derivatives([u["path"] for u in uploads if u["new"]])
+    if idempotency_key:
+        remember_submission(idempotency_key, client_code)
 
     return {
     "success": True,
     "client_code": client_code
     }
+
+# ---------- LOAD TEST ----------
+# Concurrent request capacity of one uvicorn worker: the async endpoints on psycopg 3 vs. the same endpoints with
+# ASYNC_DB=0 (psycopg2 on the threadpool). One keep-alive connection per virtual user, plain asyncio sockets.
+
+async def _read_http_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = {k.strip().lower(): v.strip() for k, v in (line.split(":", 1) for line in lines[1:] if line)}
+
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", "0")))
+    return status
+
+
+async def _load_user(port, path, count, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    request = f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode()
+    errors = 0
+    try:
+        for _ in range(count):
+            start = time.perf_counter()
+            writer.write(request)
+            if await _read_http_response(reader) != 200:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+    return errors
+
+
+async def _load_run(port, path, concurrency, requests):
+    latencies = []
+    per_user = max(1, requests // concurrency)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(_load_user(port, path, per_user, latencies) for _ in range(concurrency)), return_exceptions=True
+    )
+    elapsed = time.perf_counter() - start
+
+    errors = sum(r if isinstance(r, int) else per_user for r in results)
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0,
+        "errors": errors,
+    }
+
+
+def _process_status(pid, field):
+    # Linux only; None elsewhere
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith(field + ":"))
+    except (OSError, StopIteration):
+        return None
+
+
+def _start_load_server(port, async_db, env=None):
+    module = os.path.splitext(os.path.basename(__file__))[0]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--port", str(port), "--workers", "1",
+         "--log-level", "warning", "--no-access-log"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, **(env or {}), "ASYNC_DB": "1" if async_db else "0"},
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline and server.poll() is None:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+
+    server.kill()
+    raise SystemExit(f"uvicorn did not start on port {port}")
+
+
+def load_test(path, levels, requests, port):
+    if not async_db_enabled():
+        print("note: async path is off (SQLite, ASYNC_DB=0 or psycopg 3 missing) - both runs use the threadpool")
+
+    print(f"GET {path}, {requests} requests per level, 1 worker, DB_POOL_MAX={DB_POOL_MAX}")
+    print(f"{'model':<11} {'users':>5} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>6} {'threads':>7}")
+
+    for label, async_db in (("threadpool", False), ("async", True)):
+        server = _start_load_server(port, async_db)
+        try:
+            asyncio.run(_load_run(port, path, 4, 40))       # warm the pool and the plan catalog
+            for concurrency in levels:
+                result = asyncio.run(_load_run(port, path, concurrency, requests))
+                threads = _process_status(server.pid, "Threads")
+                print(f"{label:<11} {concurrency:>5} {result['rps']:>9.0f} {result['p50_ms']:>9.1f} "
+                      f"{result['p99_ms']:>9.1f} {result['errors']:>6} {threads if threads else '-':>7}", flush=True)
+        finally:
+            server.terminate()
+            server.wait()
+
+# ---------- COMMAND LINE ----------
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+
+    parser = argparse.ArgumentParser(prog="python main.py")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("migrate", help="apply pending schema migrations")
+
+    worker_cmd = commands.add_parser("worker", help="run background job workers")
+    worker_cmd.add_argument("--processes", type=int, default=int(os.environ.get("JOB_WORKERS", "2")))
+
+    bench_search_cmd = commands.add_parser("bench-search", help="time client search on a seeded temp table")
+    bench_search_cmd.add_argument("--rows", type=int, default=1_000_000)
+    bench_search_cmd.add_argument("--queries", type=int, default=500)
+
+    commands.add_parser("reconcile-rollups", help="recount dashboard stats from clients and fix any drift")
+
+    commands.add_parser("thumbnails", help="create missing thumbnails / previews for existing uploads")
+
+    blobs_cmd = commands.add_parser("blobs", help="maintain the content-addressed upload store")
+    blobs_cmd.add_argument("action", choices=["backfill", "gc"],
+                           help="backfill: move pre-blob uploads into the store; gc: remove unreferenced blobs")
+
+    batch_cmd = commands.add_parser("render-batch", help="render every Reviewed client without an up-to-date PDF")
+    batch_cmd.add_argument("--concurrency", type=int, default=RENDER_WORKERS)
+    batch_cmd.add_argument("--force", action="store_true", help="re-render even if the PDF is current")
+
+    bench_render_cmd = commands.add_parser("bench-render", help="compare per-report render time, cold vs shared resources")
+    bench_render_cmd.add_argument("--reports", type=int, default=20)
+
+    bench_size_cmd = commands.add_parser("bench-pdf-size", help="average report size before / after PDF optimization")
+    bench_size_cmd.add_argument("--reports", type=int, default=10)
+
+    stress_codes_cmd = commands.add_parser("stress-codes", help="allocate client codes concurrently and check uniqueness")
+    stress_codes_cmd.add_argument("--processes", type=int, default=4)
+    stress_codes_cmd.add_argument("--threads", type=int, default=8)
+    stress_codes_cmd.add_argument("--count", type=int, default=100_000)
+
+    bench_dashboard_cmd = commands.add_parser("bench-dashboard", help="TTFB / peak RSS of the full dashboard list")
+    bench_dashboard_cmd.add_argument("--rows", default="10000,100000", help="comma-separated row counts")
+    bench_dashboard_cmd.add_argument("--port", type=int, default=8766)
+
+    load_test_cmd = commands.add_parser("load-test", help="one worker under concurrent load: async vs. threadpool")
+    load_test_cmd.add_argument("--path", default="/admin/dashboard")
+    load_test_cmd.add_argument("--concurrency", default="10,50,200,500", help="comma-separated virtual users")
+    load_test_cmd.add_argument("--requests", type=int, default=2000, help="requests per concurrency level")
+    load_test_cmd.add_argument("--port", type=int, default=8765)
+
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        run_migrations()
+    elif args.command == "worker":
+        run_job_workers(args.processes)
+    elif args.command == "bench-search":
+        bench_search(args.rows, args.queries)
+    elif args.command == "reconcile-rollups":
+        print(f"{reconcile_rollups()} drifted entries fixed")
+    elif args.command == "thumbnails":
+        backfill_image_derivatives()
+    elif args.command == "blobs" and args.action == "backfill":
+        backfill_blobs()
+    elif args.command == "blobs":
+        collect_blob_garbage()
+    elif args.command == "bench-render":
+        bench_render(args.reports)
+    elif args.command == "bench-pdf-size":
+        bench_pdf_size(args.reports)
+    elif args.command == "render-batch":
+        render_batch_cli(args.concurrency, args.force)
+    elif args.command == "stress-codes":
+        stress_client_codes(args.processes, args.threads, args.count)
+    elif args.command == "bench-dashboard":
+        bench_dashboard([int(n) for n in args.rows.split(",")], args.port)
+    elif args.command == "load-test":
+        load_test(args.path, [int(n) for n in args.concurrency.split(",")], args.requests, args.port)
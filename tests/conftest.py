@@ -0,0 +1,76 @@
+import io
+import os
+import sys
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# main.py reads its settings and creates uploads/ + reports/ at import time, so give it a scratch directory
+WORKDIR = tempfile.mkdtemp(prefix="jyotish-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'import.db')}"
+os.environ.setdefault("RENDER_WORKERS", "1")
+os.environ.setdefault("IMAGE_WORKERS", "1")
+os.chdir(WORKDIR)
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+
+main.run_migrations()       # the app's startup check runs against this one; each test then gets its own file
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # a fresh, fully migrated SQLite file per test
+    monkeypatch.setattr(main, "DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(main, "_database", None)
+    monkeypatch.setattr(main, "client_codes", main.ClientCodeAllocator())
+    main.idempotency_cache.clear()
+    main.run_migrations()
+    yield main.get_database()
+    main.get_database().close()
+
+
+@pytest.fixture(scope="session")
+def app_client():
+    # started once: the render / image process pools are not restartable within one process
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def client(db, app_client):
+    return app_client
+
+
+@pytest.fixture(scope="session")
+def palm_png():
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 160, 120)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def submit(client, palm_png):
+    def post(phone="9876543210", dob="1990-01-01", plan="₹51", key=None, name="Ramesh"):
+        return client.post(
+            "/api/website-submit",
+            headers={"Idempotency-Key": key} if key else {},
+            data={"name": name, "phone": phone, "dob": dob, "questions": "career?", "plan": plan},
+            files=[("images", ("palm.png", palm_png, "image/png"))],
+        )
+    return post
+
+
+def make_client(phone="9876543210", name="Ramesh", plan="₹51", source="Manual"):
+    code = main.generate_client_code()
+    return main.clients.create(code, name, phone, "1990-01-01", None, None, plan, "career?", [], source)
+
+
+def ready_for_review(client_id):
+    # what a paid client looks like once the ai_draft job has run
+    main.clients.mark_paid([client_id])
+    main.clients.save_draft(client_id, "draft")
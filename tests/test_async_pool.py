@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+import main
+
+psycopg_pool = pytest.importorskip("psycopg_pool")
+
+
+def test_pool_retries_after_a_failed_open(monkeypatch):
+    real_open = psycopg_pool.AsyncConnectionPool.open
+    attempts = []
+
+    async def flaky_open(self, *args, **kwargs):
+        attempts.append(self)
+        if len(attempts) == 1:
+            raise OSError("database not reachable yet")
+        await real_open(self, *args, **kwargs)
+
+    monkeypatch.setattr(psycopg_pool.AsyncConnectionPool, "open", flaky_open)
+    monkeypatch.setattr(main, "DB_POOL_MIN", 0)
+    database = main.AsyncPostgresDatabase("postgres://nobody@127.0.0.1:1/none")
+
+    async def run():
+        with pytest.raises(OSError):
+            await database.pool()
+        pool = await database.pool()
+        await database.close()
+        return pool
+
+    pool = asyncio.run(run())
+    assert len(attempts) == 2 and pool is attempts[1]
@@ -0,0 +1,75 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+import main
+
+
+def blob_paths():
+    with main.db_conn() as conn:
+        c = conn.cursor()
+        c.execute("SELECT path FROM blobs")
+        return {row[0] for row in c.fetchall()}
+
+
+def test_gc_keeps_referenced_blobs_and_removes_the_rest(client, submit, monkeypatch):
+    assert submit().status_code == 200
+    referenced = blob_paths()
+
+    orphan = f"{main.BLOB_DIR}/00/orphan.png"
+    main.get_storage().put_stream(main.upload_key(orphan), io.BytesIO(b"not referenced"))
+    with main.db_conn() as conn:
+        conn.cursor().execute("INSERT INTO blobs (sha256, path, size) VALUES (?, ?, ?)", ("0" * 64, orphan, 14))
+        conn.commit()
+
+    monkeypatch.setattr(main, "BLOB_GC_GRACE", -60)
+    main.collect_blob_garbage()
+
+    assert blob_paths() == referenced
+    assert not os.path.exists(main.get_storage().local_path(main.upload_key(orphan)))
+    for path in referenced:
+        assert os.path.exists(main.get_storage().local_path(main.upload_key(path)))
+
+
+def test_gc_removes_old_files_without_a_row(db, monkeypatch):
+    stray = main.upload_key(f"{main.BLOB_DIR}/22/stray.png")
+    main.get_storage().put_stream(stray, io.BytesIO(b"request died before its row"))
+
+    monkeypatch.setattr(main, "BLOB_GC_GRACE", -60)
+    main.collect_blob_garbage()
+
+    assert not main.get_storage().exists(stray)
+    assert blob_paths() == set()
+
+
+def test_bytes_removed_by_gc_are_stored_again(db, monkeypatch):
+    path = f"{main.BLOB_DIR}/33/again.png"
+    assert main.store_blob(path, "3" * 64, 5, io.BytesIO(b"bytes"))
+    assert not main.store_blob(path, "3" * 64, 5, io.BytesIO(b"bytes"))
+
+    monkeypatch.setattr(main, "BLOB_GC_GRACE", -60)
+    main.collect_blob_garbage()
+    assert not main.get_storage().exists(main.upload_key(path))
+
+    assert main.store_blob(path, "3" * 64, 5, io.BytesIO(b"bytes"))
+    assert main.get_storage().exists(main.upload_key(path))
+    assert blob_paths() == {path}
+
+
+def test_concurrent_derivatives_of_one_blob(db):
+    name = f"{main.BLOB_DIR}/11/same.png"
+    buf = io.BytesIO()
+    Image.new("RGB", (1600, 1200), (90, 120, 150)).save(buf, "PNG")
+    buf.seek(0)
+    main.get_storage().put_stream(main.upload_key(name), buf)
+
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(main.generate_image_derivatives, [name] * 8))
+
+    folder = os.path.dirname(main.get_storage().local_path(main.upload_key(name)))
+    assert not [f for f in os.listdir(folder) if f.endswith(".tmp")]
+    for kind in main.IMAGE_DERIVATIVES:
+        with Image.open(main.get_storage().local_path(main.upload_key(main.derivative_name(name, kind)))) as im:
+            im.load()
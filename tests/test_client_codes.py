@@ -0,0 +1,26 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import main
+
+
+def test_codes_are_unique_across_processes_and_threads(db, monkeypatch):
+    # a tiny block means hundreds of concurrent reservations instead of a handful
+    monkeypatch.setattr(main, "client_codes", main.ClientCodeAllocator(block=7))
+    processes, threads, per_thread = 4, 8, 100
+
+    # forked children inherit this test's database and allocator; each reserves its own blocks
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("fork")) as pool:
+        results = list(pool.map(main._stress_codes_process, [threads] * processes, [per_thread] * processes))
+    main.client_codes._pid = None       # the parent's own allocator too
+    results.append(main._stress_codes_process(threads, per_thread))
+
+    codes = [code for result in results for code in result]
+    assert len(codes) == (processes + 1) * threads * per_thread
+    assert len(set(codes)) == len(codes)
+
+
+def test_codes_survive_a_restart(db):
+    first = main.generate_client_code()
+    main.client_codes._pid = None       # as if the process had restarted: the rest of its block is skipped
+    assert main.generate_client_code() != first
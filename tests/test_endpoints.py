@@ -0,0 +1,145 @@
+import main
+from conftest import make_client, ready_for_review
+
+
+def test_website_submit_creates_client(client, submit):
+    r = submit()
+    assert r.status_code == 200
+    body = r.json()
+    assert body["success"] and body["client_code"].startswith("AVV-")
+    assert main.clients.count({"source": "Website"}) == 1
+
+
+def test_website_submit_replays_idempotency_key(client, submit):
+    first = submit(key="abc").json()["client_code"]
+    r = submit(key="abc")
+    assert r.json()["client_code"] == first
+    assert main.clients.count({}) == 1
+
+
+def test_dashboard_lists_clients(client):
+    ids = [make_client(name=f"Client {i}", phone=f"90000005{i:02d}") for i in range(3)]
+    r = client.get("/admin/dashboard")
+    assert r.status_code == 200
+    for client_id in ids:
+        assert main.clients.client_code(client_id) in r.text
+    assert 'class="stats"' in r.text
+
+
+def test_plan_filter_accepts_id_and_label(client):
+    basic = make_client(name="Basic", phone="9000000601", plan="₹51 – बेसिक प्लान")
+    pro = make_client(name="Pro", phone="9000000602", plan="₹251 – प्रो प्लान")
+    for value in ("3", "₹251 – प्रो प्लान", "pro"):
+        r = client.get("/admin/dashboard", params={"plan": value})
+        assert r.status_code == 200
+        assert main.clients.client_code(pro) in r.text
+        assert main.clients.client_code(basic) not in r.text
+    text = client.get("/admin/export.csv", params={"plan": "₹51 – बेसिक प्लान"}).content.decode("utf-8-sig")
+    assert main.clients.client_code(basic) in text
+    assert main.clients.client_code(pro) not in text
+    assert client.get("/admin/dashboard", params={"plan": "₹99"}).status_code == 400
+
+
+def test_dashboard_all_rows_stream(client):
+    for i in range(30):
+        make_client(phone=f"90000006{i:02d}")
+    r = client.get("/admin/dashboard?page_size=0")
+    assert r.status_code == 200
+    assert r.text.count("AVV-") >= 30
+
+
+def test_dashboard_rejects_bad_date(client):
+    assert client.get("/admin/dashboard?start_date=nope").status_code == 400
+
+
+def test_mark_paid_single_and_bulk(client):
+    ids = [make_client(phone=f"90000007{i:02d}") for i in range(3)]
+
+    r = client.post(f"/admin/mark-paid/{ids[0]}", follow_redirects=False)
+    assert r.status_code == 302
+    r = client.post("/admin/mark-paid", data={"client_ids": ids[1:]}, follow_redirects=False)
+    assert r.status_code == 302
+
+    assert all(main.clients.get(i)[12] == "Paid" for i in ids)
+    stats = client.get("/admin/stats").json()
+    assert stats["payment_status"]["Paid"] == 3
+    assert stats["revenue"]["payments"] == 3
+
+
+def test_export_csv(client):
+    make_client(name="=cmd()", phone="9000000801")
+    r = client.get("/admin/export.csv")
+    assert r.status_code == 200
+    text = r.content.decode("utf-8-sig")
+    assert text.splitlines()[0].startswith("Client Code,Name")
+    assert "'=cmd()" in text
+
+
+def test_review_queue(client):
+    ids = [make_client(phone=f"90000009{i:02d}") for i in range(2)]
+    for client_id in ids:
+        ready_for_review(client_id)
+
+    a = client.post("/admin/queue/next", data={"reviewer": "asha"}).json()
+    b = client.post("/admin/queue/next", data={"reviewer": "ravi"}).json()
+    assert {a["client"]["id"], b["client"]["id"]} == set(ids)
+    assert client.post("/admin/queue/next", data={"reviewer": "mohan"}).json() == {"client": None}
+
+    assert client.post(f"/admin/queue/{a['client']['id']}/release", data={"reviewer": "ravi"}).status_code == 409
+    assert client.post(f"/admin/queue/{a['client']['id']}/release", data={"reviewer": "asha"}).status_code == 200
+    assert client.post("/admin/queue/next", data={"reviewer": "mohan"}).json()["client"]["id"] == a["client"]["id"]
+
+    # saving the review hands the client out of the queue for good
+    client.post(f"/admin/client/{b['client']['id']}/update", data={"ai_draft": "ok", "status": "Reviewed"})
+    assert main.clients.claim_next("ravi")[0] is None
+
+
+def test_review_queue_needs_reviewer(client):
+    assert client.post("/admin/queue/next", data={"reviewer": " "}).status_code == 400
+
+
+def test_website_resubmit_within_window_gets_earlier_code(client, submit):
+    first = submit().json()["client_code"]
+    assert submit(phone="+91 98765 43210").json()["client_code"] == first
+    assert main.clients.count({}) == 1
+
+
+def test_website_submit_with_another_plan_is_a_new_client(client, submit):
+    first = submit(plan="₹51").json()["client_code"]
+    second = submit(plan="₹151").json()["client_code"]
+    assert second != first
+    assert main.clients.count({}) == 2
+
+
+def test_image_workers_are_started_with_the_app(client):
+    # forked at start-up, before the first upload
+    assert len(main.image_executor._processes) == main.IMAGE_WORKERS
+
+
+def multipart_chunks(photo_bytes):
+    boundary = "palm-boundary"
+    fields = {"name": "Ramesh", "phone": "9876543210", "dob": "1990-01-01", "questions": "career?", "plan": "₹51"}
+    head = "".join(f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n' for k, v in fields.items())
+    head += f'--{boundary}\r\nContent-Disposition: form-data; name="images"; filename="palm.jpg"\r\n' \
+            "Content-Type: image/jpeg\r\n\r\n"
+
+    def body():
+        for chunk in [head.encode()] + [b"\xff" * 1024] * (photo_bytes // 1024) + [f"\r\n--{boundary}--\r\n".encode()]:
+            yield chunk
+
+    return {"content-type": f"multipart/form-data; boundary={boundary}"}, body()
+
+
+def test_oversized_upload_is_refused(client, monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_MAX_REQUEST_BYTES", 8 * 1024)
+    r = client.post("/api/website-submit", content=b"x" * (9 * 1024),
+                    headers={"content-type": "multipart/form-data; boundary=x"})
+    assert r.status_code == 413
+
+
+def test_oversized_chunked_upload_is_refused(client, monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_MAX_REQUEST_BYTES", 8 * 1024)
+    headers, body = multipart_chunks(64 * 1024)
+    r = client.post("/api/website-submit", content=body, headers=headers)    # no Content-Length: chunked
+    assert r.status_code == 413
+    assert main.clients.count({}) == 0
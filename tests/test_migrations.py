@@ -0,0 +1,31 @@
+import sqlite3
+
+import main
+
+
+def test_migrations_reach_current_version(db):
+    with main.db_conn() as conn:
+        c = conn.cursor()
+        c.execute("SELECT MAX(version) FROM schema_version")
+        assert c.fetchone()[0] == main.SCHEMA_VERSION
+
+
+def test_migrate_again_is_a_no_op(db, capsys):
+    main.run_migrations()
+    assert f"schema is up to date (version {main.SCHEMA_VERSION})" in capsys.readouterr().out
+
+
+def test_database_file_is_usable_without_the_app(db):
+    # the sqlite3 CLI, backups and DB browsers have none of the app's SQL functions
+    raw = sqlite3.connect(db.path)
+    raw.execute("INSERT INTO clients (name, phone) VALUES ('cli', '+91 98765-43210')")
+    raw.execute("SELECT * FROM clients").fetchall()
+    assert raw.execute("SELECT phone_norm FROM clients WHERE name='cli'").fetchone() == ("9876543210",)
+
+    raw.execute("UPDATE clients SET phone='(0) 98765 00000' WHERE name='cli'")
+    assert raw.execute("SELECT phone_norm FROM clients WHERE name='cli'").fetchone() == ("9876500000",)
+
+    # any separator, not only the usual ones – the same digits Postgres keeps
+    raw.execute("UPDATE clients SET phone='98765_43210 ext:' WHERE name='cli'")
+    assert raw.execute("SELECT phone_norm FROM clients WHERE name='cli'").fetchone() == ("9876543210",)
+    raw.close()
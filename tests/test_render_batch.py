@@ -0,0 +1,65 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import main
+from conftest import make_client
+
+
+def test_batch_renders_every_stale_report(client, monkeypatch):
+    ids = [make_client(phone=f"90000010{i:02d}") for i in range(7)]
+    for client_id in ids:
+        main.clients.update_review(client_id, "draft", "Reviewed")
+
+    in_flight, peak, rendered = [0], [0], []
+    lock = threading.Lock()
+
+    def fake_render(client_id):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+            rendered.append(client_id)
+        return {"file": f"{client_id}.pdf", "rendered_bytes": 1, "bytes": 1}
+
+    executor = ThreadPoolExecutor(max_workers=4)
+    monkeypatch.setattr(main, "render_executor", executor)
+    monkeypatch.setattr(main, "generate_pdf_report", fake_render)
+    monkeypatch.setattr(main, "RENDER_MAX_PENDING", 2)          # the interactive cap no longer limits a batch
+    monkeypatch.setattr(main, "RENDER_BATCH_CONCURRENCY", 3)
+
+    assert client.post("/admin/render-batch", follow_redirects=False).status_code == 302
+
+    deadline = time.time() + 10
+    while main.render_batch_progress()["done"] < len(ids) and time.time() < deadline:
+        time.sleep(0.02)
+    executor.shutdown(wait=True)
+
+    progress = main.render_batch_progress()
+    assert progress["total"] == len(ids) and progress["done"] == len(ids)
+    assert sorted(rendered) == sorted(ids)
+    assert peak[0] <= 3
+    assert "Done: 7" in client.get("/admin/render-batch").text
+
+
+def test_one_batch_at_a_time_across_workers(client, monkeypatch):
+    started = []
+    monkeypatch.setattr(main, "run_render_batch", started.append)
+
+    assert main.claim_render_batch() == 1               # a batch another worker is handing out
+    assert client.post("/admin/render-batch", follow_redirects=False).status_code == 302
+    assert started == []
+    assert main.render_batch_progress()["scanning"]
+
+    main.update_render_batch(1, running=False)
+    assert client.post("/admin/render-batch", follow_redirects=False).status_code == 302
+    assert started == [2]
+
+
+def test_a_batch_whose_worker_died_lapses(db, monkeypatch):
+    assert main.claim_render_batch() == 1
+    assert main.claim_render_batch() is None
+    monkeypatch.setattr(main, "RENDER_JOB_TTL", -60)
+    assert main.claim_render_batch() == 2
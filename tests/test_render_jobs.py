@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import main
+from conftest import make_client
+
+
+@pytest.fixture
+def renders(db, monkeypatch):
+    rendered = []
+
+    def fake_render(client_id):
+        rendered.append(client_id)
+        return {"file": f"{client_id}.pdf", "rendered_bytes": 1, "bytes": 1}
+
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(main, "render_executor", executor)
+    monkeypatch.setattr(main, "generate_pdf_report", fake_render)
+    yield rendered
+    executor.shutdown(wait=True)
+
+
+def finish(future):
+    # done callbacks (which record the state) run after result() returns; shutdown waits for them
+    future.result()
+    main.render_executor.shutdown(wait=True)
+
+
+def queued_elsewhere(client_id, submitted_at=None):
+    # a render another web worker has in its pool
+    with main.db_conn() as conn:
+        conn.cursor().execute(
+            "INSERT INTO render_jobs (client_id, state, submitted_at) VALUES (?, 'queued', ?)",
+            (client_id, submitted_at or datetime.now(timezone.utc)),
+        )
+        conn.commit()
+
+
+def test_state_is_kept_in_the_database(renders):
+    client_id = make_client()
+    finish(main.submit_render(client_id))
+    assert main.render_job_state(client_id) == ("done", None)
+    assert main.render_metrics()["jobs"] == {"done": 1}
+
+
+def test_a_job_queued_by_another_worker_is_not_rendered_twice(renders):
+    client_id = make_client()
+    queued_elsewhere(client_id)
+    assert main.submit_render(client_id) is None
+    assert main.render_job_state(client_id) == ("queued", None)
+    assert renders == []
+
+
+def test_pending_cap_counts_every_worker(renders, monkeypatch):
+    monkeypatch.setattr(main, "RENDER_MAX_PENDING", 2)
+    for i in range(2):
+        queued_elsewhere(make_client(phone=f"90000020{i:02d}"))
+
+    client_id = make_client()
+    with pytest.raises(main.RenderQueueFull):
+        main.submit_render(client_id)
+    assert main.render_job_state(client_id) == (None, None)
+
+
+def test_a_job_lost_with_its_worker_can_be_resubmitted(renders):
+    client_id = make_client()
+    queued_elsewhere(client_id, datetime.now(timezone.utc) - timedelta(seconds=main.RENDER_JOB_TTL + 60))
+    assert main.render_job_state(client_id) == ("failed", "render worker stopped")
+
+    finish(main.submit_render(client_id))
+    assert main.render_job_state(client_id) == ("done", None)
+    assert renders == [client_id]
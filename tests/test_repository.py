@@ -0,0 +1,109 @@
+import main
+from conftest import make_client, ready_for_review
+
+
+def test_create_and_get(db):
+    client_id = make_client(name="Sita", phone="+91 98765-43210")
+    row = main.clients.get(client_id)
+    assert row[2] == "Sita"
+    assert row[11] == "Pending"                 # status
+    assert row[12] == "Pending"                 # payment_status
+    assert main.clients.status(client_id) == "Pending"
+    assert main.clients.client_code(client_id) == row[1]
+
+
+def test_idempotency_key_is_recorded_once(db):
+    first = main.clients.create("AVV-1", "A", "9000000001", "1990-01-01", None, None, "₹51", "q", [], "Website",
+                                idempotency_key="k1")
+    second = main.clients.create("AVV-2", "A", "9000000001", "1990-01-01", None, None, "₹51", "q", [], "Website",
+                                 idempotency_key="k1")
+    assert first is not None and second is None
+    assert main.clients.idempotent_code("k1") == "AVV-1"
+
+
+def test_mark_paid_sets_priority_and_queues_draft(db):
+    ids = [make_client(phone=f"90000000{i:02d}") for i in range(3)]
+    assert sorted(main.clients.mark_paid(ids)) == sorted(ids)
+
+    for client_id in ids:
+        row = main.clients.get(client_id)
+        assert row[12] == "Paid"
+        assert row[17] == main.plan_for_label("₹51").priority
+
+    with main.db_conn() as conn:
+        c = conn.cursor()
+        c.execute("SELECT client_id FROM jobs WHERE kind='ai_draft' AND state='queued'")
+        assert sorted(r[0] for r in c.fetchall()) == sorted(ids)
+
+
+def test_set_payment_back_to_pending(db):
+    client_id = make_client()
+    main.clients.mark_paid([client_id])
+    main.clients.set_payment(client_id, "Pending", None)
+    row = main.clients.get(client_id)
+    assert row[12] == "Pending" and row[17] == main.UNPAID_PRIORITY
+
+
+def test_dashboard_page_keyset(db):
+    ids = [make_client(phone=f"90000001{i:02d}") for i in range(5)]
+    rows, has_more = main.clients.dashboard_page({}, 2)
+    assert [r[0] for r in rows] == ids[::-1][:2] and has_more
+
+    cursor = (rows[-1][9], rows[-1][0])
+    rows, has_more = main.clients.dashboard_page({}, 2, after_key=cursor)
+    assert [r[0] for r in rows] == ids[::-1][2:4] and has_more
+
+
+def test_filters_and_count(db):
+    make_client(name="Rahul Sharma", phone="9811111111")
+    make_client(name="Priya", phone="9822222222", source="Website")
+    assert main.clients.count({"source": "Website"}) == 1
+    rows, _ = main.clients.dashboard_page({"q": "rahul"}, 10)
+    assert [r[2] for r in rows] == ["Rahul Sharma"]
+
+
+def test_rollups_follow_every_write(db):
+    ids = [make_client(phone=f"90000002{i:02d}") for i in range(4)]
+    main.clients.mark_paid(ids[:2])
+    main.clients.update_review(ids[0], "ok", "Reviewed")
+    main.clients.complete_for_whatsapp(ids[0])
+
+    stats, revenue = main.clients.rollups("2000-01-01")
+    stats = {(d, v): n for d, v, n in stats}
+    assert stats[("payment_status", "Paid")] == 2
+    assert stats[("status", "Completed")] == 1
+    assert stats[("status", "Pending")] == 3
+    assert sum(r[1] for r in revenue) == 2
+    assert main.reconcile_rollups() == 0
+
+
+def test_reconcile_repairs_drift(db):
+    make_client()
+    with main.db_conn() as conn:
+        c = conn.cursor()
+        c.execute("UPDATE client_stats SET total = total + 5")
+        conn.commit()
+    assert main.reconcile_rollups() > 0
+    assert main.reconcile_rollups() == 0
+
+
+def test_claims_do_not_overlap(db):
+    ids = [make_client(phone=f"90000003{i:02d}") for i in range(3)]
+    for client_id in ids:
+        ready_for_review(client_id)
+
+    claimed = {main.clients.claim_next(f"r{i}")[0][0] for i in range(3)}
+    assert claimed == set(ids)
+    assert main.clients.claim_next("r9")[0] is None
+
+    # asking again renews the same claim instead of taking another client
+    first = main.clients.claim_next("r0")[0][0]
+    assert main.clients.claim_next("r0")[0][0] == first
+
+
+def test_stream_rows_yields_every_row_in_chunks(db):
+    for i in range(7):
+        make_client(phone=f"90000004{i:02d}")
+    sql, params = main.clients.dashboard_query({}, None)
+    chunks = list(main.clients.stream_rows(sql, params, 3))
+    assert [len(rows) for rows in chunks] == [3, 3, 1]
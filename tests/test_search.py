@@ -0,0 +1,56 @@
+import pytest
+
+import main
+from conftest import make_client
+
+
+@pytest.mark.parametrize("typed, expected", [
+    ("+91 98765", "98765"),
+    ("+91-98765", "98765"),
+    ("0091 98765", "98765"),
+    ("91 98765", "98765"),
+    ("098765", "98765"),
+    ("98765-43210", "9876543210"),
+    ("+919876543210", "9876543210"),
+    ("919876543210", "9876543210"),
+    ("9198765", "9198765"),          # could be the start of a 91… mobile number
+])
+def test_normalize_phone(typed, expected):
+    assert main.normalize_phone(typed) == expected
+
+
+@pytest.mark.parametrize("typed", ["+91 98765", "098765", "98765-43210", "+91 98765 43210"])
+def test_partial_phone_finds_client(db, typed):
+    client_id = make_client(name="Meera", phone="9876543210")
+    make_client(name="Other", phone="9123456789")
+    rows, _ = main.clients.dashboard_page({"q": typed}, 10)
+    assert [r[0] for r in rows] == [client_id]
+
+
+def test_name_search_is_case_and_form_insensitive(db):
+    client_id = make_client(name="सीता Sharma")
+    rows, _ = main.clients.dashboard_page({"q": "SHARMA"}, 10)
+    assert [r[0] for r in rows] == [client_id]
+
+
+def test_search_pages_walk_every_match(client):
+    ids = [make_client(name=f"Sharma {i}" if i % 2 else f"Anil Sharma {i}", phone=f"90000030{i:02d}") for i in range(7)]
+    ranked, _ = main.clients.dashboard_page({"q": "sharma"}, 50)
+
+    pages, after = [], None
+    while True:
+        rows, has_more = main.clients.dashboard_page({"q": "sharma"}, 3, after_key=after)
+        pages.append(rows)
+        if not has_more:
+            break
+        after = main.parse_page_cursor(main.page_cursor(rows[-1]), 3)
+    assert [r[0] for page in pages for r in page] == [r[0] for r in ranked]
+    assert sorted(r[0] for r in ranked) == sorted(ids)
+
+    back, _ = main.clients.dashboard_page(
+        {"q": "sharma"}, 3, before_key=main.parse_page_cursor(main.page_cursor(pages[1][0]), 3)
+    )
+    assert back == pages[0]
+
+    html = client.get("/admin/dashboard?q=sharma&page_size=3").text
+    assert "Next ➡" in html
@@ -0,0 +1,50 @@
+import io
+
+import pytest
+
+import main
+
+moto = pytest.importorskip("moto")
+boto3 = pytest.importorskip("boto3")
+
+
+@pytest.fixture
+def s3(tmp_path, monkeypatch):
+    # moto's in-process stand-in for S3; the same calls go to MinIO or AWS with STORAGE_URL=s3://…
+    for name, value in [("AWS_ACCESS_KEY_ID", "test"), ("AWS_SECRET_ACCESS_KEY", "test"),
+                        ("AWS_DEFAULT_REGION", "us-east-1")]:
+        monkeypatch.setenv(name, value)
+    with moto.mock_aws():
+        boto3.client("s3").create_bucket(Bucket="jyotish-test")
+        yield lambda: main.S3Storage("jyotish-test", "prod", cache_dir=str(tmp_path / "cache"))
+
+
+def test_put_get_list_delete(s3):
+    storage = s3()
+    key = main.upload_key("blobs/ab/cd/abcd.png")
+
+    storage.put_stream(key, io.BytesIO(b"palm bytes"))
+    assert storage.exists(key)
+    with open(storage.get_file(key), "rb") as f:
+        assert f.read() == b"palm bytes"
+    assert [k for k, _ in storage.list(main.upload_key("blobs/"))] == [key]
+
+    storage.put_text(main.report_key("AVV-1"), "report")
+    assert storage.read_text(main.report_key("AVV-1")) == "report"
+
+    storage.delete(key)
+    assert not storage.exists(key)
+    with pytest.raises(FileNotFoundError):
+        storage.get_file(key)
+    with pytest.raises(FileNotFoundError):
+        storage.read_text(main.report_key("AVV-2"))
+
+
+def test_upload_deleted_by_another_process_is_not_reported_as_present(s3):
+    web, gc = s3(), s3()
+    key = main.upload_key("blobs/ef/01/ef01.jpg")
+
+    web.put_stream(key, io.BytesIO(b"jpeg"))
+    assert web.exists(key)
+    gc.delete(key)              # `blobs gc` runs in its own process with its own S3Storage
+    assert not web.exists(key)